@@ -28,6 +28,7 @@ from decimal import Decimal
 
 # Devices
 from hp3478a_async import HP_3478A, FunctionType, Range, TriggerType
+from hp3478a_async.srq_dispatcher import SrqDispatcher
 
 if typing.TYPE_CHECKING:
     from async_gpib import AsyncGpib
@@ -46,17 +47,15 @@ if "prologix_gpib_async" in sys.modules:
     IP_ADDRESS = "127.0.0.1"
     # pylint: disable=used-before-assignment  # false positive
     gpib_device = AsyncPrologixGpibEthernetController(IP_ADDRESS, pad=27, timeout=1, eos_mode=EosMode.APPEND_NONE)
+    srq_dispatcher = None  # pylint: disable=invalid-name
 elif "async_gpib" in sys.modules:
     # Create the gpib device. We need a timeout of > 10 PLC (20 ms), because the DMM might reply to a conversion request
     # and unable to reply to a status request during conversion (maximum time 10 PLC)
     # Set the timeout to 1 second (T1s=11)
     # NI GPIB adapter
     gpib_device = AsyncGpib(name=0, pad=27, timeout=11)  # pylint: disable=used-before-assignment  # false positive
-    from gpib_ctypes.Gpib import Gpib
-
-    gpib_board = Gpib(name=0)
-    gpib_board.config(0x7, True)  # enable wait for SRQs to speed up waiting for state changes
-    gpib_board.close()
+    # The dispatcher configures the board and waits for the SRQs of all devices on the board using a single thread
+    srq_dispatcher = SrqDispatcher(board=0)
 else:
     raise ImportWarning("No GPIB module loaded. Please check your imports")
 
@@ -66,6 +65,9 @@ async def main():
     """Read the temperature of the thermistor."""
     try:
         async with HP_3478A(connection=gpib_device) as hp3478a:
+            if srq_dispatcher is not None:
+                await srq_dispatcher.open()
+                srq_dispatcher.register(hp3478a, pad=27)
             await hp3478a.clear()  # flush all buffers
             await asyncio.gather(
                 hp3478a.set_function(FunctionType.NTC),  # Set to 2-wire ohm
@@ -79,7 +81,7 @@ async def main():
             # The NTC paramter are the (normalized) Steinhart-hart coefficients.
             # The formula used to calculate the temperature from the resistance is the following:
             # 1/T=a+b*Log(Rt/R25)+c*Log(Rt/R25)**2+d*Log(Rt/R25)**3
-            # For more details on determining those values see the examples/thermistor folder
+            # The values can be fitted to reference data using hp3478a_async.steinhart_hart.fit_steinhart_hart()
             hp3478a.set_ntc_parameters(
                 a=3.35318065e-03,
                 b=2.93792361e-04,
@@ -97,6 +99,9 @@ async def main():
         logging.getLogger(__name__).exception(
             "Could not connect to remote target. Connection refused. Is the device connected?"
         )
+    finally:
+        if srq_dispatcher is not None:
+            await srq_dispatcher.close()
 
 
 # Report all mistakes managing asynchronous resources.
@@ -5,6 +5,16 @@ function to read the non-volatile RAM and calibration constants of the device.
 
 from ._version import __version__
 from .enums import FrontRearSwitchPosition, FunctionType, Range, TriggerType
-from .hp_3478a import HP_3478A, DmmStatus, NtcParameters
+from .hp_3478a import HP_3478A, DmmConfiguration, DmmStatus, NtcParameters, ReadingTiming
 
-__all__ = ["HP_3478A", "NtcParameters", "DmmStatus", "FrontRearSwitchPosition", "FunctionType", "Range", "TriggerType"]
+__all__ = [
+    "HP_3478A",
+    "NtcParameters",
+    "DmmConfiguration",
+    "DmmStatus",
+    "ReadingTiming",
+    "FrontRearSwitchPosition",
+    "FunctionType",
+    "Range",
+    "TriggerType",
+]
@@ -0,0 +1,211 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Copyright (C) 2021 Patrick Baus
+# This file is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+"""
+A bounded queue, that decouples the acquisition of readings from their consumption.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from decimal import Decimal
+from enum import Enum
+from types import TracebackType
+from typing import TYPE_CHECKING, Any
+
+try:
+    from typing import Self  # type: ignore # Python 3.11
+except ImportError:
+    from typing_extensions import Self
+
+if TYPE_CHECKING:
+    from hp3478a_async.hp_3478a import HP_3478A
+
+
+class OverflowPolicy(Enum):
+    """
+    What to do with a new reading, if the queue is full.
+    """
+
+    BLOCK = 1  # Stop reading from the DMM until there is space. Readings are lost inside the DMM and timing drifts.
+    DROP_OLDEST = 2  # Discard the oldest reading in the queue
+    DROP_NEWEST = 3  # Discard the new reading
+
+
+@dataclass(frozen=True)
+class AcquiredReading:
+    """A reading and the time it was read from the DMM."""
+
+    value: Decimal | bytes
+    timestamp: float  # The time of the readout as returned by time.time()
+    sequence: int  # The number of the reading. Gaps show dropped readings.
+
+
+class AcquisitionQueue:  # pylint: disable=too-many-instance-attributes
+    """
+    Read from the DMM in a background task and buffer up to `maxsize` readings. A slow consumer does not delay the
+    readout of the DMM, instead readings are dropped according to the overflow policy and counted.
+    """
+
+    def __init__(
+        self,
+        dmm: HP_3478A,
+        maxsize: int = 1000,
+        policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+        **kwargs: Any,
+    ) -> None:
+        """
+        Create a queue. The acquisition is started using :func:`start` or the context manager.
+
+        Parameters
+        ----------
+        dmm: HP_3478A
+            The DMM. It must be configured.
+        maxsize: int, default=1000
+            The maximum number of readings buffered.
+        policy: OverflowPolicy, default=OverflowPolicy.DROP_OLDEST
+            The behaviour, if the queue is full.
+        **kwargs:
+            Additional parameters passed to :func:`HP_3478A.read_all() <hp3478a_async.HP_3478A.read_all>`.
+        """
+        if maxsize < 1:
+            raise ValueError("The queue must hold at least one reading.")
+        self.__dmm = dmm
+        self.__maxsize = maxsize
+        self.__policy = policy
+        self.__kwargs = kwargs
+        self.__buffer: deque[AcquiredReading] = deque()
+        self.__task: asyncio.Task | None = None
+        self.__events: tuple[asyncio.Event, asyncio.Event] | None = None  # not empty, not full
+        self.__dropped_oldest = 0
+        self.__dropped_newest = 0
+
+    async def __aenter__(self) -> Self:
+        self.start()
+        return self
+
+    async def __aexit__(
+        self, exc_type: type[BaseException] | None, exc: BaseException | None, traceback: TracebackType | None
+    ) -> None:
+        await self.stop()
+
+    def __len__(self) -> int:
+        return len(self.__buffer)
+
+    @property
+    def maxsize(self) -> int:
+        """
+        The maximum number of readings buffered.
+        """
+        return self.__maxsize
+
+    @property
+    def policy(self) -> OverflowPolicy:
+        """
+        The overflow policy.
+        """
+        return self.__policy
+
+    @property
+    def dropped_samples(self) -> int:
+        """
+        The total number of readings dropped, because the queue was full.
+        """
+        return self.__dropped_oldest + self.__dropped_newest
+
+    @property
+    def dropped_oldest(self) -> int:
+        """
+        The number of queued readings dropped in favour of newer readings.
+        """
+        return self.__dropped_oldest
+
+    @property
+    def dropped_newest(self) -> int:
+        """
+        The number of new readings dropped, because the queue was full.
+        """
+        return self.__dropped_newest
+
+    def start(self) -> None:
+        """
+        Start reading from the DMM.
+        """
+        if self.__task is None:
+            self.__events = (asyncio.Event(), asyncio.Event())
+            self.__task = asyncio.create_task(self.__acquire())
+
+    async def stop(self) -> None:
+        """
+        Stop reading from the DMM. Readings already queued can still be retrieved.
+        """
+        task, self.__task = self.__task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def __acquire(self) -> None:
+        assert self.__events is not None
+        not_empty, not_full = self.__events
+        sequence = 0
+        try:
+            async for value in self.__dmm.read_all(**self.__kwargs):
+                reading = AcquiredReading(value=value, timestamp=time.time(), sequence=sequence)
+                sequence += 1
+                if len(self.__buffer) >= self.__maxsize:
+                    if self.__policy is OverflowPolicy.DROP_NEWEST:
+                        self.__dropped_newest += 1
+                        continue
+                    if self.__policy is OverflowPolicy.DROP_OLDEST:
+                        self.__buffer.popleft()
+                        self.__dropped_oldest += 1
+                    else:
+                        while len(self.__buffer) >= self.__maxsize:
+                            not_full.clear()
+                            await not_full.wait()
+                self.__buffer.append(reading)
+                not_empty.set()
+        finally:
+            # Wake up the consumer, so it can see, that the acquisition has ended
+            not_empty.set()
+
+    def __aiter__(self) -> AcquisitionQueue:
+        return self
+
+    async def __anext__(self) -> AcquiredReading:
+        """
+        Return the next reading. Once the queue is drained after the acquisition has ended, the exception raised by
+        :func:`HP_3478A.read_all() <hp3478a_async.HP_3478A.read_all>` is re-raised or the iteration ends.
+        """
+        if self.__events is None:
+            raise RuntimeError("The acquisition was not started.")
+        not_empty, not_full = self.__events
+        while not self.__buffer:
+            task = self.__task
+            if task is None:  # The acquisition was stopped
+                raise StopAsyncIteration
+            if task.done():
+                if not task.cancelled() and task.exception() is not None:
+                    raise task.exception()  # type: ignore[misc]
+                raise StopAsyncIteration
+            not_empty.clear()
+            await not_empty.wait()
+        reading = self.__buffer.popleft()
+        not_full.set()
+        return reading
@@ -0,0 +1,259 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Copyright (C) 2021 Patrick Baus
+# This file is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+"""
+A driver-side autorange, that selects the range ahead of time using the trend of the readings.
+"""
+from __future__ import annotations
+
+from decimal import Decimal
+from typing import TYPE_CHECKING, AsyncGenerator
+
+from hp3478a_async.enums import FunctionType, Range
+
+if TYPE_CHECKING:
+    from hp3478a_async.hp_3478a import HP_3478A
+
+# The ranges available for each function. See page 20 of the manual for details.
+FUNCTION_RANGES: dict[FunctionType, tuple[Range, ...]] = {
+    FunctionType.DCV: (Range.RANGE_30M, Range.RANGE_300M, Range.RANGE_3, Range.RANGE_30, Range.RANGE_300),
+    FunctionType.ACV: (Range.RANGE_300M, Range.RANGE_3, Range.RANGE_30, Range.RANGE_300),
+    FunctionType.OHM: (
+        Range.RANGE_30,
+        Range.RANGE_300,
+        Range.RANGE_3k,
+        Range.RANGE_30k,
+        Range.RANGE_300k,
+        Range.RANGE_3MEG,
+        Range.RANGE_30MEG,
+    ),
+    FunctionType.DCI: (Range.RANGE_300M, Range.RANGE_3),
+    FunctionType.ACI: (Range.RANGE_300M, Range.RANGE_3),
+}
+FUNCTION_RANGES[FunctionType.OHMF] = FUNCTION_RANGES[FunctionType.OHM]
+
+# The hardware autorange switches to the next higher range above 303000 counts and to the next lower range below
+# 28000 counts. A full scale reading is 300000 counts.
+HARDWARE_UPPER_THRESHOLD = 1.01
+HARDWARE_LOWER_THRESHOLD = 28000 / 300000
+
+
+def full_scale(value: Range) -> float:
+    """
+    Return the full scale value of a range.
+
+    Parameters
+    ----------
+    value: Range
+        The measurement range. Must not be :attr:`Range.RANGE_AUTO <hp3478a_async.enums.Range.RANGE_AUTO>`.
+
+    Returns
+    -------
+    float
+        The full scale value in V, A or Ω.
+    """
+    return 3 * 10 ** float(value.value)
+
+
+def select_range(
+    ranges: tuple[Range, ...], current: Range, magnitude: float, upper_threshold: float, lower_threshold: float
+) -> Range:
+    """
+    Select the range for the next measurement. The range is increased, if the magnitude exceeds `upper_threshold`
+    times the full scale value of the current range. It is decreased, if the magnitude is less than `lower_threshold`
+    times the full scale of the next lower range. Choosing `lower_threshold` < `upper_threshold` creates a hysteresis.
+
+    Parameters
+    ----------
+    ranges: tuple of Range
+        The ranges available sorted in ascending order.
+    current: Range
+        The current range.
+    magnitude: float
+        The expected magnitude of the next reading.
+    upper_threshold: float
+        The fraction of the full scale value, that triggers an uprange.
+    lower_threshold: float
+        The fraction of the full scale value of a lower range, that triggers a downrange.
+
+    Returns
+    -------
+    Range
+        The new range
+    """
+    index = ranges.index(current)
+    if magnitude > upper_threshold * full_scale(current):
+        for candidate in ranges[index + 1 :]:
+            if magnitude <= upper_threshold * full_scale(candidate):
+                return candidate
+        return ranges[-1]
+    for candidate in ranges[:index]:
+        if magnitude < lower_threshold * full_scale(candidate):
+            return candidate
+    return current
+
+
+class SoftwareAutorange:
+    """
+    A driver-side autorange. Unlike the hardware autorange, which needs additional conversions to find the range after
+    the input has changed, it extrapolates the next reading from the last two readings and switches the range before
+    the reading is out of range. Only the DC/AC voltage, current and 2-wire/4-wire resistance functions are supported.
+    """
+
+    def __init__(self, dmm: HP_3478A, upper_threshold: float = 0.9, lower_threshold: float = 0.8) -> None:
+        """
+        Create a software autorange for the DMM given.
+
+        Parameters
+        ----------
+        dmm: HP_3478A
+            The DMM. The function must be set before reading.
+        upper_threshold: float, default=0.9
+            Switch to a higher range, if the predicted reading exceeds this fraction of the full scale value.
+        lower_threshold: float, default=0.8
+            Switch to a lower range, if the predicted reading is less than this fraction of the full scale value of the
+            lower range.
+        """
+        if not 0 < lower_threshold < upper_threshold <= HARDWARE_UPPER_THRESHOLD:
+            raise ValueError("The thresholds must satisfy 0 < lower_threshold < upper_threshold <= 1.01.")
+        self.__dmm = dmm
+        self.__upper_threshold = upper_threshold
+        self.__lower_threshold = lower_threshold
+        self.__range_changes = 0
+        self.__hardware_range_changes = 0
+        self.__discarded_readings = 0
+
+    @property
+    def range_changes(self) -> int:
+        """
+        The number of range changes made.
+        """
+        return self.__range_changes
+
+    @property
+    def hardware_range_changes(self) -> int:
+        """
+        The estimated number of range changes the hardware autorange would have made for the same readings.
+        """
+        return self.__hardware_range_changes
+
+    @property
+    def saved_range_changes(self) -> int:
+        """
+        The number of range changes saved compared with the hardware autorange.
+        """
+        return self.__hardware_range_changes - self.__range_changes
+
+    @property
+    def discarded_readings(self) -> int:
+        """
+        The number of readings discarded after a range change.
+        """
+        return self.__discarded_readings
+
+    async def __get_initial_range(self, function: FunctionType) -> Range:
+        current_range = self.__dmm.configuration.range
+        if current_range is None or current_range is Range.RANGE_AUTO:
+            # Use the range selected by the hardware autorange as a starting point
+            current_range = (await self.__dmm.get_status()).range
+        if current_range not in FUNCTION_RANGES[function]:
+            current_range = FUNCTION_RANGES[function][-1]
+        await self.__dmm.set_range(current_range)  # disable the hardware autorange
+        return current_range
+
+    def __simulate_hardware_autorange(self, ranges: tuple[Range, ...], current: Range, magnitude: float) -> Range:
+        """
+        Estimate the range changes of the hardware autorange. It only changes the range after the reading is out of
+        range and then steps through the ranges, one per conversion.
+        """
+        index = ranges.index(current)
+        while index < len(ranges) - 1 and magnitude > HARDWARE_UPPER_THRESHOLD * full_scale(ranges[index]):
+            index += 1
+            self.__hardware_range_changes += 1
+        while index > 0 and magnitude < HARDWARE_LOWER_THRESHOLD * full_scale(ranges[index]):
+            index -= 1
+            self.__hardware_range_changes += 1
+        return ranges[index]
+
+    async def read_all(self, **kwargs) -> AsyncGenerator[Decimal]:
+        """
+        Read all values from the device and adjust the range as needed. The first reading after a range change is
+        discarded, if it is an overload or if a resistance is measured, because the current source needs to settle.
+
+        Parameters
+        ----------
+        **kwargs:
+            Additional parameters passed to :func:`HP_3478A.read_all() <hp3478a_async.HP_3478A.read_all>`.
+
+        Returns
+        -------
+        Iterator[Decimal]
+            The readings. An overload on the highest range is returned as ``Decimal("NaN")``.
+
+        Raises
+        ------
+        ValueError
+            If the function of the DMM is not supported.
+        """
+        function = self.__dmm.configuration.function
+        if function is None:
+            function = (await self.__dmm.get_status()).function
+        if function not in FUNCTION_RANGES:
+            raise ValueError(f"The software autorange does not support {function}.")
+        ranges = FUNCTION_RANGES[function]
+        settle_after_change = function in (FunctionType.OHM, FunctionType.OHMF)
+        current_range = await self.__get_initial_range(function)
+        hardware_range = current_range
+        previous_magnitude: float | None = None
+        is_settling = False
+
+        kwargs["nan_on_overload"] = True
+        async for result in self.__dmm.read_all(**kwargs):
+            assert isinstance(result, Decimal)
+            is_overload = result.is_nan()
+            if is_settling:
+                is_settling = False
+                if settle_after_change and not is_overload:
+                    self.__discarded_readings += 1
+                    continue
+            if is_overload:
+                # The value is unknown, so assume it is just out of range
+                magnitude = HARDWARE_UPPER_THRESHOLD * full_scale(current_range) * 1.001
+            else:
+                magnitude = abs(float(result))
+            hardware_range = self.__simulate_hardware_autorange(ranges, hardware_range, magnitude)
+
+            # Extrapolate the next reading linearly
+            predicted_magnitude = magnitude
+            if previous_magnitude is not None:
+                predicted_magnitude = max(magnitude, 2 * magnitude - previous_magnitude)
+            previous_magnitude = None if is_overload else magnitude
+
+            new_range = select_range(
+                ranges, current_range, predicted_magnitude, self.__upper_threshold, self.__lower_threshold
+            )
+            if new_range is not current_range:
+                await self.__dmm.set_range(new_range)
+                current_range = new_range
+                self.__range_changes += 1
+                is_settling = True
+                previous_magnitude = None
+                if is_overload:
+                    # Do not return the overload, because it will be measured again on the new range
+                    self.__discarded_readings += 1
+                    continue
+            yield result
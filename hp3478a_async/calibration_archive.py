@@ -0,0 +1,269 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Copyright (C) 2021 Patrick Baus
+# This file is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+"""
+A local archive for calibration memory dumps of several instruments. Identical dumps are only stored once and the
+decoded calibration constants are indexed to allow fast queries across all instruments.
+"""
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from types import TracebackType
+
+from hp3478a_async.hp_3478a_helper import decode_cal_data, format_cal_string
+
+try:
+    from typing import Self  # type: ignore # Python 3.11
+except ImportError:
+    from typing_extensions import Self
+
+
+@dataclass(frozen=True)
+class CalibrationSnapshot:
+    """A calibration memory dump of an instrument taken at a certain time."""
+
+    instrument: str
+    timestamp: datetime
+    content_hash: str
+    is_cal_enabled: bool
+
+
+@dataclass(frozen=True)
+class CalibrationRecord:
+    """The calibration constants of a single calibration memory entry taken from a snapshot."""
+
+    instrument: str
+    timestamp: datetime
+    entry: int
+    offset: int
+    gain: float
+    is_valid: bool
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dumps (
+    content_hash TEXT PRIMARY KEY,
+    is_cal_enabled INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    instrument TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    content_hash TEXT NOT NULL REFERENCES dumps(content_hash),
+    PRIMARY KEY (instrument, timestamp)
+);
+CREATE TABLE IF NOT EXISTS entries (
+    content_hash TEXT NOT NULL REFERENCES dumps(content_hash),
+    entry INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    gain REAL NOT NULL,
+    is_valid INTEGER NOT NULL,
+    PRIMARY KEY (content_hash, entry)
+);
+CREATE INDEX IF NOT EXISTS entries_by_entry ON entries (entry);
+"""
+
+
+def _normalize_dump(data: bytes | str) -> bytes:
+    """
+    Return the raw calibration memory dump as returned by
+    :func:`HP_3478A.get_cal_ram() <hp3478a_async.HP_3478A.get_cal_ram>`. Line breaks inserted by
+    :func:`format_cal_string() <hp3478a_async.hp_3478a_helper.format_cal_string>` are removed. This is safe, because
+    the dump consists of printable characters only.
+    """
+    if isinstance(data, str):
+        data = data.encode("ascii")
+    data = data.replace(b"\r", b"").replace(b"\n", b"")
+    if len(data) != 256:
+        raise ValueError(f"Invalid calibration memory dump. Expected 256 bytes, got {len(data)}.")
+    return data
+
+
+class CalibrationArchive:
+    """
+    A directory containing calibration memory dumps. Each dump is stored as a file named after the SHA-256 hash of its
+    content, so identical dumps of an instrument, that was not recalibrated, are stored only once. The snapshots and the
+    decoded calibration constants are indexed in an SQLite database within the same directory.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        """
+        Open or create a calibration archive.
+
+        Parameters
+        ----------
+        path: str or Path
+            The directory of the archive. It will be created if it does not exist.
+        """
+        self.__path = Path(path)
+        (self.__path / "dumps").mkdir(parents=True, exist_ok=True)
+        self.__database = sqlite3.connect(self.__path / "index.sqlite")
+        self.__database.executescript(_SCHEMA)
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self, exc_type: type[BaseException] | None, exc: BaseException | None, traceback: TracebackType | None
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Close the index database.
+        """
+        self.__database.close()
+
+    def __dump_path(self, content_hash: str) -> Path:
+        return self.__path / "dumps" / f"{content_hash}.bin"
+
+    def add(self, instrument: str, data: bytes | str, timestamp: datetime | None = None) -> str:
+        """
+        Add a calibration memory dump to the archive. The dump is only decoded and stored, if it is not already part
+        of the archive.
+
+        Parameters
+        ----------
+        instrument: str
+            A unique identifier of the instrument like its serial number.
+        data: bytes or str
+            The calibration memory as returned by :func:`HP_3478A.get_cal_ram()
+            <hp3478a_async.HP_3478A.get_cal_ram>` or formatted by :func:`format_cal_string()
+            <hp3478a_async.hp_3478a_helper.format_cal_string>`.
+        timestamp: datetime, optional
+            The time the dump was taken. Defaults to now.
+
+        Returns
+        -------
+        str
+            The content hash of the dump.
+        """
+        data = _normalize_dump(data)
+        timestamp = datetime.now() if timestamp is None else timestamp
+        content_hash = hashlib.sha256(data).hexdigest()
+        with self.__database:
+            is_known = self.__database.execute("SELECT 1 FROM dumps WHERE content_hash = ?", (content_hash,)).fetchone()
+            if is_known is None:
+                is_cal_enabled, entries = decode_cal_data(data)
+                self.__dump_path(content_hash).write_text(format_cal_string(data), encoding="ascii")
+                self.__database.execute("INSERT INTO dumps VALUES (?, ?)", (content_hash, is_cal_enabled))
+                self.__database.executemany(
+                    "INSERT INTO entries VALUES (?, ?, ?, ?, ?)",
+                    (
+                        (content_hash, idx, entry.offset, entry.gain, entry.is_valid)
+                        for idx, entry in enumerate(entries)
+                    ),
+                )
+            self.__database.execute(
+                "INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?)", (instrument, timestamp.isoformat(), content_hash)
+            )
+        return content_hash
+
+    def get(self, content_hash: str) -> bytes:
+        """
+        Get a calibration memory dump from the archive.
+
+        Parameters
+        ----------
+        content_hash: str
+            The content hash as returned by :func:`add` or :func:`snapshots`.
+
+        Returns
+        -------
+        bytes
+            The calibration memory, that can be written back using :func:`HP_3478A.set_cal_ram()
+            <hp3478a_async.HP_3478A.set_cal_ram>`.
+
+        Raises
+        ------
+        KeyError
+            If the dump is not part of the archive.
+        """
+        try:
+            return _normalize_dump(self.__dump_path(content_hash).read_bytes())
+        except FileNotFoundError:
+            raise KeyError(content_hash) from None
+
+    def snapshots(self, instrument: str | None = None) -> list[CalibrationSnapshot]:
+        """
+        List the snapshots in the archive sorted by instrument and time.
+
+        Parameters
+        ----------
+        instrument: str, optional
+            Only list the snapshots of this instrument.
+
+        Returns
+        -------
+        list of CalibrationSnapshot
+            The snapshots
+        """
+        query = (
+            "SELECT instrument, timestamp, snapshots.content_hash, is_cal_enabled FROM snapshots "
+            "JOIN dumps USING (content_hash) WHERE ? IS NULL OR instrument = ? ORDER BY instrument, timestamp"
+        )
+        return [
+            CalibrationSnapshot(
+                instrument=name,
+                timestamp=datetime.fromisoformat(timestamp),
+                content_hash=content_hash,
+                is_cal_enabled=bool(is_cal_enabled),
+            )
+            for name, timestamp, content_hash, is_cal_enabled in self.__database.execute(
+                query, (instrument, instrument)
+            )
+        ]
+
+    def history(self, entry: int, instrument: str | None = None) -> list[CalibrationRecord]:
+        """
+        Query the calibration constants of an entry across all snapshots, e.g. to track the gain drift of a range. The
+        result is taken from the index and the dumps are not decoded again.
+
+        Parameters
+        ----------
+        entry: int
+            The index of the calibration memory entry. There are 19 entries, one per range.
+        instrument: str, optional
+            Only query the snapshots of this instrument.
+
+        Returns
+        -------
+        list of CalibrationRecord
+            The calibration constants sorted by instrument and time.
+        """
+        if not 0 <= entry < 19:
+            raise ValueError(f"Invalid calibration memory entry: {entry}. There are 19 entries.")
+        query = (
+            "SELECT instrument, timestamp, offset, gain, is_valid FROM snapshots JOIN entries USING (content_hash) "
+            "WHERE entry = ? AND (? IS NULL OR instrument = ?) ORDER BY instrument, timestamp"
+        )
+        return [
+            CalibrationRecord(
+                instrument=name,
+                timestamp=datetime.fromisoformat(timestamp),
+                entry=entry,
+                offset=offset,
+                gain=gain,
+                is_valid=bool(is_valid),
+            )
+            for name, timestamp, offset, gain, is_valid in self.__database.execute(
+                query, (entry, instrument, instrument)
+            )
+        ]
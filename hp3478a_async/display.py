@@ -0,0 +1,150 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Copyright (C) 2021 Patrick Baus
+# This file is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+"""
+A rate limited display, that only sends the latest text to the DMM.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from types import TracebackType
+from typing import TYPE_CHECKING
+
+from hp3478a_async.enums import DisplayType
+
+try:
+    from typing import Self  # type: ignore # Python 3.11
+except ImportError:
+    from typing_extensions import Self
+
+if TYPE_CHECKING:
+    from hp3478a_async.hp_3478a import HP_3478A
+
+
+class DisplayUpdater:  # pylint: disable=too-many-instance-attributes
+    """
+    Show text on the front panel without slowing down the measurements. Only the latest text is kept, older text, that
+    was not sent yet, is dropped. Updates are sent at most at the rate given with the lowest priority on the bus, so
+    they are scheduled between the readout of conversions.
+    """
+
+    def __init__(self, dmm: HP_3478A, max_rate: float = 2.0, freeze: bool = False) -> None:
+        """
+        Create a display updater. It must be started using :func:`start` or the context manager.
+
+        Parameters
+        ----------
+        dmm: HP_3478A
+            The DMM
+        max_rate: float, default=2.0
+            The maximum number of updates per second.
+        freeze: bool, default=False
+            Use :attr:`DisplayType.SHOW_TEXT_AND_FREEZE <hp3478a_async.enums.DisplayType.SHOW_TEXT_AND_FREEZE>`
+            instead of :attr:`DisplayType.SHOW_TEXT <hp3478a_async.enums.DisplayType.SHOW_TEXT>`.
+        """
+        if max_rate <= 0:
+            raise ValueError("The maximum rate must be positive.")
+        self.__dmm = dmm
+        self.__interval = 1 / max_rate
+        self.__display_type = DisplayType.SHOW_TEXT_AND_FREEZE if freeze else DisplayType.SHOW_TEXT
+        self.__pending_text: str | None = None
+        self.__last_text: str | None = None
+        self.__has_update: asyncio.Event | None = None
+        self.__task: asyncio.Task | None = None
+        self.__sent_updates = 0
+        self.__dropped_updates = 0
+
+    async def __aenter__(self) -> Self:
+        self.start()
+        return self
+
+    async def __aexit__(
+        self, exc_type: type[BaseException] | None, exc: BaseException | None, traceback: TracebackType | None
+    ) -> None:
+        await self.stop()
+
+    @property
+    def sent_updates(self) -> int:
+        """
+        The number of texts sent to the DMM.
+        """
+        return self.__sent_updates
+
+    @property
+    def dropped_updates(self) -> int:
+        """
+        The number of texts replaced by a newer text before they were sent.
+        """
+        return self.__dropped_updates
+
+    def start(self) -> None:
+        """
+        Start sending updates to the DMM.
+        """
+        if self.__task is None:
+            self.__has_update = asyncio.Event()
+            if self.__pending_text is not None:
+                self.__has_update.set()
+            self.__task = asyncio.create_task(self.__run())
+
+    async def stop(self, restore: bool = True) -> None:
+        """
+        Stop sending updates. Pending text is dropped.
+
+        Parameters
+        ----------
+        restore: bool, default=True
+            Return the display to :attr:`DisplayType.NORMAL <hp3478a_async.enums.DisplayType.NORMAL>`.
+        """
+        if self.__task is not None:
+            self.__task.cancel()
+            await asyncio.gather(self.__task, return_exceptions=True)
+            self.__task = None
+        if restore:
+            await self.__dmm.set_display(DisplayType.NORMAL)
+            self.__last_text = None
+
+    def update(self, text: str) -> None:
+        """
+        Set the text to be shown. This function does not block. The text is sent with the next update.
+
+        Parameters
+        ----------
+        text: str
+            The text to display.
+        """
+        if self.__pending_text is not None:
+            self.__dropped_updates += 1
+        self.__pending_text = text
+        if self.__has_update is not None:
+            self.__has_update.set()
+
+    async def __run(self) -> None:
+        assert self.__has_update is not None
+        while "not cancelled":
+            await self.__has_update.wait()
+            self.__has_update.clear()
+            text, self.__pending_text = self.__pending_text, None
+            if text is None or text == self.__last_text:
+                continue
+            started = time.monotonic()
+            await self.__dmm.set_display(self.__display_type, text)
+            self.__last_text = text
+            self.__sent_updates += 1
+            # Updates arriving in the meantime are coalesced
+            await asyncio.sleep(max(0.0, self.__interval - (time.monotonic() - started)))
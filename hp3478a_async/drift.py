@@ -0,0 +1,228 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Copyright (C) 2021 Patrick Baus
+# This file is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+"""
+Detect changes made on the front panel, while the DMM is taking measurements, by comparing the status of the DMM to the
+configuration set by the driver.
+"""
+from __future__ import annotations
+
+import math
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import TYPE_CHECKING, Any, AsyncGenerator
+
+from hp3478a_async.enums import Range, TriggerType
+from hp3478a_async.flags import StatusFlags
+
+if TYPE_CHECKING:
+    from hp3478a_async.hp_3478a import HP_3478A, DmmConfiguration, DmmStatus
+
+
+@dataclass(frozen=True)
+class SettingDrift:
+    """A setting of the DMM, that differs from the configuration set by the driver."""
+
+    setting: str  # The name of the setting, e.g. range
+    expected: Any
+    actual: Any
+
+
+@dataclass(frozen=True)
+class CheckedReading:
+    """A reading and the settings, that differed from the expected configuration at the last status check."""
+
+    value: Decimal | bytes
+    drift: tuple[SettingDrift, ...]  # Empty, if the configuration was as expected
+    checked: bool  # True, if the status was checked right after this reading
+
+    @property
+    def is_valid(self) -> bool:
+        """
+        `True` if no drift was detected.
+        """
+        return not self.drift
+
+
+def diff_configuration(expected: DmmConfiguration, status: DmmStatus) -> list[SettingDrift]:
+    """
+    Compare the status of the DMM to the configuration. Settings, that were not set by the driver, are not compared.
+
+    Parameters
+    ----------
+    expected: DmmConfiguration
+        The configuration set by the driver.
+    status: DmmStatus
+        The status returned by :func:`HP_3478A.get_status() <hp3478a_async.HP_3478A.get_status>`.
+
+    Returns
+    -------
+    list of SettingDrift
+        The settings, that differ.
+    """
+    drift = []
+    # The DMM reports the thermistor functions as the resistance functions used to measure them
+    if expected.function is not None and status.function.device_function is not expected.function.device_function:
+        drift.append(SettingDrift("function", expected.function, status.function))
+    if expected.range is not None:
+        # With autorange enabled, the status contains the range selected by the DMM
+        is_autorange = StatusFlags.AUTO_RANGE_ENABLED in status.status
+        if (expected.range is Range.RANGE_AUTO) != is_autorange or (
+            not is_autorange and status.range is not expected.range
+        ):
+            drift.append(SettingDrift("range", expected.range, Range.RANGE_AUTO if is_autorange else status.range))
+    if expected.ndigits is not None and status.ndigits != expected.ndigits:
+        drift.append(SettingDrift("ndigits", expected.ndigits, status.ndigits))
+    if expected.autozero is not None and (StatusFlags.AUTO_ZERO_ENABLED in status.status) != expected.autozero:
+        drift.append(SettingDrift("autozero", expected.autozero, not expected.autozero))
+    # The status only tells, whether the internal or external trigger is enabled
+    if expected.trigger in (TriggerType.INTERNAL, TriggerType.EXTERNAL):
+        flag = (
+            StatusFlags.INTERNAL_TRIGGER_ENABLED
+            if expected.trigger is TriggerType.INTERNAL
+            else StatusFlags.EXTERNAL_TRIGGER_ENABLED
+        )
+        if flag not in status.status:
+            drift.append(SettingDrift("trigger", expected.trigger, None))
+    if expected.srq_mask is not None and status.srq_flags.value != expected.srq_mask.value:
+        drift.append(SettingDrift("srq_mask", expected.srq_mask, status.srq_flags))
+    return drift
+
+
+class DriftDetector:  # pylint: disable=too-many-instance-attributes
+    """
+    Read from the DMM and check its status every few readings. The readings are tagged with the settings, that differ
+    from the configuration set by the driver, e.g. because someone turned the range knob or flipped the front/rear
+    switch. The position of the front/rear switch is compared to the position found at the first check.
+
+    The check interval is adapted, so that the time spent on the checks stays below the given fraction of the time
+    between readings.
+    """
+
+    def __init__(self, dmm: HP_3478A, interval: int = 10, max_overhead: float | None = 0.01) -> None:
+        """
+        Create a drift detector.
+
+        Parameters
+        ----------
+        dmm: HP_3478A
+            The DMM. It must be configured using the driver.
+        interval: int, default=10
+            The number of readings between two status checks. This is the shortest interval used.
+        max_overhead: float or None, default=0.01
+            The maximum time spent on the checks relative to the time between readings. The interval is increased, if
+            the checks take longer. Use `None` to keep the interval fixed.
+        """
+        if interval < 1:
+            raise ValueError("The interval must be at least 1.")
+        if max_overhead is not None and max_overhead <= 0:
+            raise ValueError("The overhead must be positive.")
+        self.__dmm = dmm
+        self.__min_interval = interval
+        self.__interval = interval
+        self.__max_overhead = max_overhead
+        self.__check_requested = True  # Check after the first reading to learn the front/rear switch position
+        self.__drift: tuple[SettingDrift, ...] = ()
+        self.__front_terminals: bool | None = None
+        self.__check_duration: float | None = None
+        self.__reading_period: float | None = None
+        self.__checks = 0
+
+    @property
+    def interval(self) -> int:
+        """
+        The current number of readings between two status checks.
+        """
+        return self.__interval
+
+    @property
+    def drift(self) -> tuple[SettingDrift, ...]:
+        """
+        The settings, that differed from the expected configuration at the last check.
+        """
+        return self.__drift
+
+    @property
+    def checks(self) -> int:
+        """
+        The number of status checks done.
+        """
+        return self.__checks
+
+    def request_check(self) -> None:
+        """
+        Check the status after the next reading, e.g. after the operator pressed the SRQ button on the front panel. To
+        check on the button, pass ``events=SrqMask.FRONT_PANEL_SRQ`` and an `on_event` callback calling this function
+        to :func:`read_all`.
+        """
+        self.__check_requested = True
+
+    @staticmethod
+    def __average(average: float | None, value: float) -> float:
+        return value if average is None else 0.8 * average + 0.2 * value
+
+    def __adapt_interval(self) -> None:
+        if self.__max_overhead is None or self.__check_duration is None or not self.__reading_period:
+            return
+        interval = math.ceil(self.__check_duration / (self.__max_overhead * self.__reading_period))
+        self.__interval = max(self.__min_interval, interval)
+
+    async def __check(self) -> None:
+        started = time.monotonic()
+        status = await self.__dmm.get_status()
+        self.__check_duration = self.__average(self.__check_duration, time.monotonic() - started)
+        self.__checks += 1
+        drift = diff_configuration(self.__dmm.configuration, status)
+        front_terminals = StatusFlags.FRONT_SWITCH_ENABLED in status.status
+        if self.__front_terminals is None:
+            self.__front_terminals = front_terminals
+        elif front_terminals != self.__front_terminals:
+            drift.append(SettingDrift("front_terminals", self.__front_terminals, front_terminals))
+        self.__drift = tuple(drift)
+        self.__adapt_interval()
+
+    async def read_all(self, **kwargs: Any) -> AsyncGenerator[CheckedReading]:
+        """
+        Read all values from the device and check the status in between.
+
+        Parameters
+        ----------
+        **kwargs:
+            Additional parameters passed to :func:`HP_3478A.read_all() <hp3478a_async.HP_3478A.read_all>`.
+
+        Returns
+        -------
+        Iterator[CheckedReading]
+            The readings and the drift detected.
+        """
+        since_check = 0
+        last_reading: float | None = None
+        async for value in self.__dmm.read_all(**kwargs):
+            now = time.monotonic()
+            if last_reading is not None:
+                self.__reading_period = self.__average(self.__reading_period, now - last_reading)
+            since_check += 1
+            checked = self.__check_requested or since_check >= self.__interval
+            if checked:
+                # The DMM is already converting the next value, so the check runs in parallel
+                self.__check_requested = False
+                since_check = 0
+                await self.__check()
+            # The time spent on the check is not part of the reading period
+            last_reading = time.monotonic()
+            yield CheckedReading(value=value, drift=self.__drift, checked=checked)
@@ -39,6 +39,18 @@ class FunctionType(Enum):
     NTC = 8
     NTCF = 9
 
+    @property
+    def device_function(self) -> FunctionType:
+        """
+        The function set on the device. The thermistor functions measure the resistance using the 2-wire or 4-wire
+        ohms function.
+        """
+        if self is FunctionType.NTC:
+            return FunctionType.OHM
+        if self is FunctionType.NTCF:
+            return FunctionType.OHMF
+        return self
+
 
 class Range(Enum):
     """
@@ -0,0 +1,139 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Copyright (C) 2021 Patrick Baus
+# This file is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+"""
+Receive the front panel SRQ button and error service requests of the DMM as events, while taking measurements.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+from enum import Enum
+from typing import TYPE_CHECKING, Any, AsyncGenerator
+
+from hp3478a_async.flags import SerialPollFlags, SrqMask
+
+if TYPE_CHECKING:
+    from hp3478a_async.hp_3478a import HP_3478A
+
+ALL_EVENTS = SrqMask.SYNTAX_ERROR | SrqMask.HARDWARE_ERROR | SrqMask.FRONT_PANEL_SRQ | SrqMask.CALIBRATION_FAILURE
+
+
+class DmmEventType(Enum):
+    """
+    The reason for a service request other than a finished conversion. The values are the bits of the serial poll
+    register.
+    """
+
+    SYNTAX_ERROR = SerialPollFlags.SRQ_ON_SYNTAX_ERROR.value
+    HARDWARE_ERROR = SerialPollFlags.SRQ_ON_HARDWARE_ERROR.value
+    FRONT_PANEL_SRQ = SerialPollFlags.SRQ_ON_SRQ_BUTTON.value
+    CALIBRATION_FAILURE = SerialPollFlags.SRQ_ON_CAL_FAILURE.value
+
+
+@dataclass(frozen=True)
+class DmmEvent:
+    """A service request, that was not caused by a finished conversion."""
+
+    kind: DmmEventType
+    status: SerialPollFlags  # The event flags of the serial poll register
+    timestamp: float  # The time the event was received as returned by time.time()
+
+
+class EventStream:
+    """
+    Read from the DMM with a service request mask, that includes the front panel SRQ button and errors. Each serial
+    poll is split into the readings returned by :func:`read_all` and the events returned by :func:`events`. Events do
+    not interrupt the measurements.
+    """
+
+    def __init__(self, dmm: HP_3478A, events: SrqMask = ALL_EVENTS, maxsize: int = 100) -> None:
+        """
+        Create an event stream.
+
+        Parameters
+        ----------
+        dmm: HP_3478A
+            The DMM
+        events: SrqMask, default=ALL_EVENTS
+            The reasons for a service request reported as events.
+        maxsize: int, default=100
+            The maximum number of events kept, if they are not consumed. The oldest events are dropped.
+        """
+        if maxsize < 1:
+            raise ValueError("The queue size must be at least 1.")
+        self.__dmm = dmm
+        self.__mask = events & ~SrqMask.DATA_READY
+        self.__events: asyncio.Queue[DmmEvent] | None = None
+        self.__maxsize = maxsize
+        self.__dropped_events = 0
+
+    @property
+    def dropped_events(self) -> int:
+        """
+        The number of events dropped, because they were not consumed.
+        """
+        return self.__dropped_events
+
+    def __queue(self) -> asyncio.Queue[DmmEvent]:
+        # The queue is created lazily, because it must be created inside the event loop on Python < 3.10
+        if self.__events is None:
+            self.__events = asyncio.Queue(maxsize=self.__maxsize)
+        return self.__events
+
+    def __on_event(self, flags: SerialPollFlags) -> None:
+        events = self.__queue()
+        timestamp = time.time()
+        for kind in DmmEventType:
+            if flags.value & kind.value:
+                if events.full():
+                    events.get_nowait()
+                    self.__dropped_events += 1
+                events.put_nowait(DmmEvent(kind=kind, status=flags, timestamp=timestamp))
+
+    async def read_all(self, **kwargs: Any) -> AsyncGenerator[Decimal | bytes]:
+        """
+        Read all values from the device, while collecting the events.
+
+        Parameters
+        ----------
+        **kwargs:
+            Additional parameters passed to :func:`HP_3478A.read_all() <hp3478a_async.HP_3478A.read_all>`.
+
+        Returns
+        -------
+        Iterator[Decimal or bytes]
+            The readings
+        """
+        self.__queue()
+        async for value in self.__dmm.read_all(events=self.__mask, on_event=self.__on_event, **kwargs):
+            yield value
+
+    async def events(self) -> AsyncGenerator[DmmEvent]:
+        """
+        Wait for events. The events are only received, while :func:`read_all` is running.
+
+        Returns
+        -------
+        Iterator[DmmEvent]
+            The events in the order they were received.
+        """
+        events = self.__queue()
+        while "not cancelled":
+            yield await events.get()
@@ -0,0 +1,216 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Copyright (C) 2021 Patrick Baus
+# This file is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+"""
+Trigger several DMMs at once and collect their readings as aligned rows.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import TYPE_CHECKING, AsyncGenerator, Awaitable, Callable, Sequence
+
+from hp3478a_async.enums import TriggerType
+from hp3478a_async.flags import SrqMask
+
+if TYPE_CHECKING:
+    from hp3478a_async.hp_3478a import HP_3478A
+
+
+@dataclass(frozen=True)
+class GroupReading:
+    """One reading of each DMM taken on the same trigger."""
+
+    index: int  # The sample index, starting at 0
+    values: tuple[Decimal | bytes, ...]  # The readings in the order of the DMMs
+    timestamps: tuple[float, ...]  # The detection of the data ready SRQ of each DMM as returned by time.time()
+    trigger_time: float  # The time the trigger was fired as returned by time.time()
+
+    @property
+    def skew(self) -> float:
+        """
+        The time in seconds between the data ready SRQ of the first and the last DMM being detected. This is not the
+        difference of the conversion times. It includes the latency of the SRQ detection, which is up to one poll
+        interval, if the SRQs are polled, e.g. using a Prologix adapter.
+        """
+        return max(self.timestamps) - min(self.timestamps)
+
+
+@dataclass(frozen=True)
+class SkewStatistics:
+    """The skew of all rows acquired so far in s."""
+
+    count: int
+    mean: float
+    max: float
+
+
+class GroupAcquisition:  # pylint: disable=too-many-instance-attributes
+    """
+    Take simultaneous readings with several DMMs. The DMMs are put on hold and then triggered together, either by a
+    Group Execute Trigger (GET) on the bus or by an external trigger. Each DMM signals the end of its conversion using
+    the data ready SRQ, so the readings are only read out, once all DMMs have finished.
+
+    A GET sent to each DMM in turn does not trigger them together, so the trigger must be passed in. The driver cannot
+    send a single GET to all DMMs, because the connections do not expose the adapter they share. A GET addressed to
+    several DMMs is sent using the connection to their adapter, e.g. for DMMs at the addresses 22 and 23:
+
+    - Prologix: ``partial(controller.trigger, devices=(22, 23))``
+    - linux-gpib: ``partial(board.command, bytes([0x3F, 0x20 + 22, 0x20 + 23, 0x08]))``, i.e. unlisten, listen
+      addresses and GET sent by the board.
+    """
+
+    def __init__(
+        self,
+        dmms: Sequence[HP_3478A],
+        trigger: Callable[[], Awaitable[None]] | None = None,
+        external: bool = False,
+        nan_on_overload: bool = True,
+    ) -> None:
+        """
+        Create a group of DMMs. The DMMs must be configured except for the trigger and the SRQ mask.
+
+        Parameters
+        ----------
+        dmms: Sequence of HP_3478A
+            The DMMs. The readings are returned in this order.
+        trigger: Callable, optional
+            A coroutine function firing the trigger, i.e. a GET addressed to all DMMs at once or a pulse on the external
+            trigger inputs. It can only be omitted, if `external` is set, to wait for an external trigger source.
+        external: bool, default=False
+            If `True`, the DMMs are set to :attr:`TriggerType.EXTERNAL <hp3478a_async.enums.TriggerType.EXTERNAL>`,
+            else to :attr:`TriggerType.HOLD <hp3478a_async.enums.TriggerType.HOLD>` and triggered via the bus.
+        nan_on_overload: bool, default=True
+            If `True`, an overloaded input returns ``Decimal("NaN")`` instead of raising an :class:`OverflowError`, so
+            the row is kept.
+        """
+        if not dmms:
+            raise ValueError("The group must contain at least one DMM.")
+        if trigger is None and not external:
+            raise ValueError("A trigger is required to trigger the DMMs via the bus.")
+        self.__dmms = tuple(dmms)
+        self.__trigger = trigger
+        self.__external = external
+        self.__nan_on_overload = nan_on_overload
+        self.__armed = False
+        self.__index = 0
+        self.__skew_sum = 0.0
+        self.__skew_max = 0.0
+
+    @property
+    def dmms(self) -> tuple[HP_3478A, ...]:
+        """
+        The DMMs of the group.
+        """
+        return self.__dmms
+
+    @property
+    def skew_statistics(self) -> SkewStatistics:
+        """
+        The mean and maximum skew of the rows acquired so far.
+        """
+        mean = self.__skew_sum / self.__index if self.__index else 0.0
+        return SkewStatistics(count=self.__index, mean=mean, max=self.__skew_max)
+
+    async def arm(self) -> None:
+        """
+        Set the trigger and the SRQ mask of all DMMs and clear pending service requests. This is done automatically
+        before the first row is acquired.
+        """
+        trigger_type = TriggerType.EXTERNAL if self.__external else TriggerType.HOLD
+        for dmm in self.__dmms:
+            await dmm.set_trigger(trigger_type)
+            await dmm.set_srq_mask(SrqMask.DATA_READY)
+            await dmm.clear()
+        self.__armed = True
+
+    async def __fire(self) -> None:
+        if self.__trigger is not None:
+            await self.__trigger()
+
+    async def __read(self, dmm: HP_3478A) -> Decimal | bytes:
+        try:
+            return await dmm.read()
+        except OverflowError:
+            if not self.__nan_on_overload:
+                raise
+            return Decimal("NaN")
+
+    async def acquire(self) -> GroupReading:
+        """
+        Trigger all DMMs and read one value from each.
+
+        Returns
+        -------
+        GroupReading
+            The readings and the time the data ready SRQ of each DMM was detected.
+
+        Raises
+        ------
+        OverflowError
+            If the input of a DMM is overloaded and `nan_on_overload` is not set.
+        DeviceError
+            If a DMM requested service for a different reason.
+        """
+        if not self.__armed:
+            await self.arm()
+
+        async def wait_for_data_ready(dmm: HP_3478A) -> float:
+            await dmm.wait_for_data_ready()
+            return time.time()
+
+        # Start listening for the SRQs first, so that no SRQ is missed
+        waits = [asyncio.create_task(wait_for_data_ready(dmm)) for dmm in self.__dmms]
+        try:
+            await asyncio.sleep(0)
+            trigger_time = time.time()
+            await self.__fire()
+            timestamps = await asyncio.gather(*waits)
+        finally:
+            for wait in waits:
+                wait.cancel()
+            await asyncio.gather(*waits, return_exceptions=True)
+        values = [await self.__read(dmm) for dmm in self.__dmms]
+
+        row = GroupReading(
+            index=self.__index, values=tuple(values), timestamps=tuple(timestamps), trigger_time=trigger_time
+        )
+        self.__index += 1
+        self.__skew_sum += row.skew
+        self.__skew_max = max(self.__skew_max, row.skew)
+        return row
+
+    async def acquire_all(self, count: int | None = None) -> AsyncGenerator[GroupReading]:
+        """
+        Acquire rows continuously.
+
+        Parameters
+        ----------
+        count: int, optional
+            The number of rows to acquire. Omit to acquire rows until the generator is closed.
+
+        Returns
+        -------
+        Iterator[GroupReading]
+            The rows in the order they were taken.
+        """
+        acquired = 0
+        while count is None or acquired < count:
+            yield await self.acquire()
+            acquired += 1
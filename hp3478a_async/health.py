@@ -0,0 +1,226 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Copyright (C) 2021 Patrick Baus
+# This file is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+"""
+Monitor the health of the DMM in the background, while it is taking measurements.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from enum import Enum
+from types import TracebackType
+from typing import TYPE_CHECKING, AsyncGenerator, Awaitable, Callable, Union
+
+from hp3478a_async.enums import FrontRearSwitchPosition
+from hp3478a_async.errors import DeviceError
+from hp3478a_async.flags import ErrorFlags, StatusFlags
+from hp3478a_async.priority_lock import Priority
+
+try:
+    from typing import Self  # type: ignore # Python 3.11
+except ImportError:
+    from typing_extensions import Self
+
+if TYPE_CHECKING:
+    from hp3478a_async.hp_3478a import HP_3478A
+
+HealthValue = Union[ErrorFlags, bool, FrontRearSwitchPosition]
+
+
+class HealthEventType(Enum):
+    """
+    The state, that changed.
+    """
+
+    ERROR_FLAGS = 1  # The error register
+    CAL_RAM_ENABLED = 2  # The calibration enable switch on the front panel
+    FRONT_REAR_SWITCH = 3  # The input terminal switch
+
+
+@dataclass(frozen=True)
+class HealthEvent:
+    """A change of the state of the DMM."""
+
+    kind: HealthEventType
+    previous: HealthValue
+    current: HealthValue
+    timestamp: float  # The time the change was detected as returned by time.time()
+
+
+class HealthMonitor:  # pylint: disable=too-many-instance-attributes
+    """
+    Query the error register, the status and the front/rear switch of the DMM one after another in the background. The
+    queries are sent with the lowest priority on the bus, so they are scheduled between the readout of conversions.
+    The monitor limits itself to a fraction of the bus time and reports changes as :class:`HealthEvent`.
+    """
+
+    def __init__(self, dmm: HP_3478A, interval: float = 10.0, max_bus_fraction: float = 0.01) -> None:
+        """
+        Create a health monitor. It must be started using :func:`start` or the context manager.
+
+        Parameters
+        ----------
+        dmm: HP_3478A
+            The DMM
+        interval: float, default=10.0
+            The time in seconds, after which all checks have been run once.
+        max_bus_fraction: float, default=0.01
+            The maximum fraction of time the monitor may spend on the bus. If the queries take longer than expected,
+            e.g. because the DMM only answers after its current conversion, the interval is stretched.
+        """
+        if interval <= 0:
+            raise ValueError("The interval must be positive.")
+        if not 0 < max_bus_fraction <= 1:
+            raise ValueError("The bus fraction must be in the range (0, 1].")
+        self.__dmm = dmm
+        self.__interval = interval
+        self.__max_bus_fraction = max_bus_fraction
+        self.__checks: tuple[tuple[HealthEventType, Callable[[], Awaitable[HealthValue]]], ...] = (
+            (HealthEventType.ERROR_FLAGS, self.__get_error_flags),
+            (HealthEventType.CAL_RAM_ENABLED, self.__get_cal_ram_enabled),
+            (HealthEventType.FRONT_REAR_SWITCH, self.__get_front_rear_switch),
+        )
+        self.__state: dict[HealthEventType, HealthValue] = {}
+        self.__events: asyncio.Queue[HealthEvent] | None = None
+        self.__task: asyncio.Task | None = None
+        self.__bus_time = 0.0
+        self.__started: float | None = None
+        self.__failed_checks = 0
+        self.__logger = logging.getLogger(__name__)
+
+    async def __aenter__(self) -> Self:
+        self.start()
+        return self
+
+    async def __aexit__(
+        self, exc_type: type[BaseException] | None, exc: BaseException | None, traceback: TracebackType | None
+    ) -> None:
+        await self.stop()
+
+    @property
+    def error_flags(self) -> ErrorFlags | None:
+        """
+        The last error register read. `None` if it was not read yet.
+        """
+        value = self.__state.get(HealthEventType.ERROR_FLAGS)
+        assert value is None or isinstance(value, ErrorFlags)
+        return value
+
+    @property
+    def cal_ram_enabled(self) -> bool | None:
+        """
+        `True` if the calibration memory is write enabled. `None` if it was not read yet.
+        """
+        value = self.__state.get(HealthEventType.CAL_RAM_ENABLED)
+        assert value is None or isinstance(value, bool)
+        return value
+
+    @property
+    def front_rear_switch(self) -> FrontRearSwitchPosition | None:
+        """
+        The last position of the front/rear switch read. `None` if it was not read yet.
+        """
+        value = self.__state.get(HealthEventType.FRONT_REAR_SWITCH)
+        assert value is None or isinstance(value, FrontRearSwitchPosition)
+        return value
+
+    @property
+    def bus_fraction(self) -> float:
+        """
+        The fraction of time spent on the checks since the monitor was started.
+        """
+        if self.__started is None:
+            return 0.0
+        elapsed = time.monotonic() - self.__started
+        return self.__bus_time / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def failed_checks(self) -> int:
+        """
+        The number of checks, that failed, because the DMM did not respond.
+        """
+        return self.__failed_checks
+
+    def start(self) -> None:
+        """
+        Start monitoring the DMM.
+        """
+        if self.__task is None:
+            if self.__events is None:
+                self.__events = asyncio.Queue()
+            self.__started = time.monotonic()
+            self.__task = asyncio.create_task(self.__run())
+
+    async def stop(self) -> None:
+        """
+        Stop monitoring the DMM. Events, that were not consumed yet, are kept.
+        """
+        task, self.__task = self.__task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def events(self) -> AsyncGenerator[HealthEvent]:
+        """
+        Wait for changes of the state of the DMM. The first reading of each state is not reported.
+
+        Returns
+        -------
+        Iterator[HealthEvent]
+            The changes in the order they were detected.
+        """
+        if self.__events is None:
+            self.__events = asyncio.Queue()
+        while "not cancelled":
+            yield await self.__events.get()
+
+    async def __get_error_flags(self) -> HealthValue:
+        return await self.__dmm.get_error_register(priority=Priority.LOW)
+
+    async def __get_cal_ram_enabled(self) -> HealthValue:
+        status = await self.__dmm.get_status(priority=Priority.LOW)
+        return StatusFlags.CAL_RAM_ENABLED in status.status
+
+    async def __get_front_rear_switch(self) -> HealthValue:
+        return await self.__dmm.get_front_rear_switch_position(priority=Priority.LOW)
+
+    def __update(self, kind: HealthEventType, value: HealthValue) -> None:
+        previous = self.__state.get(kind)
+        self.__state[kind] = value
+        if previous is not None and previous != value:
+            assert self.__events is not None
+            self.__events.put_nowait(HealthEvent(kind=kind, previous=previous, current=value, timestamp=time.time()))
+
+    async def __run(self) -> None:
+        # The checks are spread over the interval, so only one query is pending at a time
+        period = self.__interval / len(self.__checks)
+        while "not cancelled":
+            for kind, check in self.__checks:
+                started = time.monotonic()
+                try:
+                    value = await check()
+                except (asyncio.TimeoutError, ConnectionError, DeviceError, ValueError) as exc:
+                    self.__failed_checks += 1
+                    self.__logger.warning("Health check of %s failed: %s", kind.name, exc)
+                else:
+                    self.__update(kind, value)
+                duration = time.monotonic() - started
+                self.__bus_time += duration
+                await asyncio.sleep(max(period, duration / self.__max_bus_fraction) - duration)
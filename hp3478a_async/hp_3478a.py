@@ -18,19 +18,24 @@
 """
 This is an asyncIO driver for the HP 3478A DMM to abstract away the GPIB interface.
 """
+# pylint: disable=too-many-lines
 from __future__ import annotations
 
 import asyncio
+import logging
 import re  # Used to test for numerical return values
-from dataclasses import dataclass
+import time
+from dataclasses import dataclass, field, replace
 from decimal import Decimal
-from math import log
 from types import TracebackType
-from typing import TYPE_CHECKING, AsyncGenerator
+from typing import TYPE_CHECKING, Any, AsyncGenerator, Awaitable, Callable
 
 from hp3478a_async.enums import DisplayType, FrontRearSwitchPosition, FunctionType, Range, TriggerType
 from hp3478a_async.errors import DeviceError
 from hp3478a_async.flags import ErrorFlags, SerialPollFlags, SrqMask, StatusFlags
+from hp3478a_async.planner import DEFAULT_OVERHEAD, INTEGRATION_TIME_PLC
+from hp3478a_async.priority_lock import Priority, PriorityLock
+from hp3478a_async.transforms import NtcTransform, Transform, TransformLike, TransformPipeline
 
 try:
     from typing import Self  # type: ignore # Python 3.11
@@ -41,6 +46,8 @@ if TYPE_CHECKING:
     from async_gpib import AsyncGpib
     from prologix_gpib_async import AsyncPrologixGpibController
 
+    from hp3478a_async.metrics import InstrumentMetrics
+
 
 @dataclass
 class DmmStatus:
@@ -55,6 +62,33 @@ class DmmStatus:
     dac_value: int
 
 
+@dataclass
+class DmmConfiguration:
+    """
+    The configuration of the DMM as set by the driver. Settings, that were not set by the driver, are `None`. The
+    configuration is used to restore the DMM after a connection loss.
+    """
+
+    function: FunctionType | None = None
+    range: Range | None = None
+    ndigits: int | None = None
+    trigger: TriggerType | None = None
+    autozero: bool | None = None
+    srq_mask: SrqMask | None = None
+
+
+@dataclass(frozen=True)
+class ReadingTiming:
+    """
+    The times recorded while reading a value from the DMM as returned by :func:`time.time`. The conversion ended
+    before the service request arrived or, if no service request was used, before the read completed.
+    """
+
+    srq: float | None  # The arrival of the data ready service request, None if the read did not wait for it
+    read_started: float  # The bus was acquired and the read was issued
+    read_completed: float  # The data was received
+
+
 @dataclass
 class NtcParameters:
     """
@@ -77,11 +111,46 @@ class NtcParameters:
         assert all([self.rt25 > 0, self.a > 0, self.b > 0, self.c > 0, self.d > 0])
 
 
+@dataclass
+class _CommandBatch:
+    """
+    Write-only commands, that are queued while the bus is busy and sent back-to-back in the order they were issued.
+    Program codes are joined into a single message, unless they end with a line terminator or must be sent on their
+    own.
+    """
+
+    messages: list[bytes] = field(default_factory=list)
+    is_closed: bool = True  # The last message does not accept more program codes
+    is_sent: bool = False
+    error: Exception | None = None
+
+    def add(self, command: bytes, separate: bool) -> None:
+        """
+        Queue a command.
+
+        Parameters
+        ----------
+        command: bytes
+            The program code.
+        separate: bool
+            Send the command as a message on its own.
+        """
+        if separate or self.is_closed:
+            self.messages.append(command)
+        else:
+            self.messages[-1] += command
+        self.is_closed = separate or command.endswith((b"\r", b"\n"))
+
+
 # Used to test for numerical return values of the read() command
 numerical_test_pattern = re.compile(rb"^[+-]\d+\.\d+E[+-]\d")
+# The value returned by the DMM, if the input is overloaded
+OVERLOAD_VALUE = b"+9.99999E+9"
+# The default time in seconds between two serial polls, when waiting for a service request using a Prologix adapter
+PROLOGIX_SRQ_POLL_INTERVAL = 0.1
 
 
-class HP_3478A:  # noqa pylint: disable=too-many-public-methods,invalid-name
+class HP_3478A:  # noqa pylint: disable=too-many-public-methods,too-many-instance-attributes,invalid-name
     """
     The driver for the HP 3478A 5.5 digit multimeter. It supports both linux-gpib and the Prologix
     GPIB adapters.
@@ -94,7 +163,83 @@ class HP_3478A:  # noqa pylint: disable=too-many-public-methods,invalid-name
         """
         return self.__conn
 
-    def __init__(self, connection: AsyncGpib | AsyncPrologixGpibController) -> None:
+    @property
+    def overload_count(self) -> int:
+        """
+        The number of overloaded readings, i.e. `+9.99999E+9`, returned by the DMM since the driver was created.
+        """
+        return self.__overload_count
+
+    @property
+    def configuration(self) -> DmmConfiguration:
+        """
+        A copy of the configuration last set by the driver.
+        """
+        return replace(self.__configuration)
+
+    @property
+    def reconnect_count(self) -> int:
+        """
+        The number of times the connection was reestablished by :func:`read_all`.
+        """
+        return self.__reconnect_count
+
+    @property
+    def metrics(self) -> InstrumentMetrics | None:
+        """
+        The metrics recording the bus transactions or `None`. See :func:`set_metrics`.
+        """
+        return self.__metrics
+
+    @property
+    def last_reconnect_gap(self) -> float | None:
+        """
+        The time in seconds between the last reading before the connection was lost and the reconnect by
+        :func:`read_all`. `None` if the connection was never reestablished.
+        """
+        return self.__last_reconnect_gap
+
+    @property
+    def post_processor(self) -> Callable[[Decimal], Decimal] | None:
+        """
+        The post-processing applied to the readings, i.e. the special function selected using :func:`set_function`
+        followed by the transforms set using :func:`set_transforms`. The function can be pickled, so it can be run in a
+        process pool. `None` if there is no post-processing.
+        """
+        if self.__pipeline is None:
+            return None
+        return self.__pipeline.decimal
+
+    @property
+    def transforms(self) -> tuple[Transform, ...]:
+        """
+        The transforms set using :func:`set_transforms`.
+        """
+        return self.__transforms
+
+    @property
+    def srq_poll_interval(self) -> float | None:
+        """
+        The time in seconds between two serial polls, if the service requests are detected by polling the device, i.e.
+        when using a Prologix adapter. `None` if the service requests are signalled by the controller.
+        """
+        if self.__srq_waiter is None and hasattr(self.__conn, "set_eot"):
+            return self.__srq_poll_interval
+        return None
+
+    @property
+    def last_timing(self) -> ReadingTiming | None:
+        """
+        The times recorded during the last read. `None` if nothing was read yet.
+        """
+        return self.__last_timing
+
+    def __init__(
+        self,
+        connection: AsyncGpib | AsyncPrologixGpibController,
+        warm_connect: bool = False,
+        srq_poll_interval: float = PROLOGIX_SRQ_POLL_INTERVAL,
+    ) -> None:
         """
         Create an HP 3478A with the GPIB connection given.
 
@@ -102,8 +247,22 @@ class HP_3478A:  # noqa pylint: disable=too-many-public-methods,invalid-name
         ----------
         connection: AsyncGpib or AsyncPrologixGpibController
             The GPIB connection
+        warm_connect: bool, default=False
+            If `True`, :func:`connect` reads the status of the DMM and settings, that are already set on the DMM, are
+            not written again. Use it for short sessions with a DMM, that is not touched by anyone else.
+        srq_poll_interval: float, default=0.1
+            The time in seconds between the start of two serial polls, when waiting for a service request using a
+            Prologix adapter. The adapters cannot signal the SRQ line, so this limits the rate of readings.
         """
+        if srq_poll_interval < 0:
+            raise ValueError("The SRQ poll interval must not be negative.")
         self.__conn = connection
+        self.__warm_connect = warm_connect
+        self.__srq_poll_interval = srq_poll_interval
+        # The settings of the configuration, that are known to be set on the device, so writing them can be skipped
+        self.__verified_settings: set[str] = set()
+        self.__line_frequency: float | None = None
+        self.__conversion_pending = False  # A triggered conversion was not read yet
         self.__special_function: FunctionType | None = None
         # Default constants taken from Amphenol DC95 (Material Type 10kY)
         # https://www.amphenol-sensors.com/hubfs/Documents/AAS-913-318C-Temperature-resistance-curves-071816-web.pdf
@@ -114,6 +273,20 @@ class HP_3478A:  # noqa pylint: disable=too-many-public-methods,invalid-name
             c=4.0006637 * 10**-6,
             d=1.5575628 * 10**-7,
         )
+        self.__transforms: tuple[Transform, ...] = ()
+        self.__pipeline: TransformPipeline | None = None  # The special function and the transforms fused
+        self.__overload_count = 0
+        self.__configuration = DmmConfiguration()
+        self.__reconnect_count = 0
+        self.__last_reconnect_gap: float | None = None
+        self.__last_timing: ReadingTiming | None = None
+        self.__srq_waiter: Callable[[], Awaitable[int]] | None = None
+        self.__metrics: InstrumentMetrics | None = None
+        self.__logger = logging.getLogger(__name__)
+        # Serializes all bus transactions. The readout of a conversion has the highest priority, followed by status
+        # requests and control commands, while bulk transfers like the calibration memory have the lowest priority.
+        self.__lock = PriorityLock()
+        self.__pending_commands: _CommandBatch | None = None
 
     def __str__(self) -> str:
         return f"HEWLETT-PACKARD 3478A at {str(self.connection)}"
@@ -144,13 +317,17 @@ class HP_3478A:  # noqa pylint: disable=too-many-public-methods,invalid-name
     async def connect(self) -> None:
         """
         Connect the GPIB connection and configure the GPIB device for the DMM. This function must be called from the
-        loop and takes care of connecting the GPIB adapter.
+        loop and takes care of connecting the GPIB adapter. If `warm_connect` is set, the configuration is read from
+        the device first.
         """
         await self.__conn.connect()
         if hasattr(self.__conn, "set_eot"):
             # Used by the Prologix adapters
             await self.__conn.set_eot(False)
 
+        self.__verified_settings.clear()
+        if self.__warm_connect:
+            self.__load_configuration(await self.get_status())
         await asyncio.gather(
             # Default display mode
             self.set_display(DisplayType.NORMAL),
@@ -158,15 +335,54 @@ class HP_3478A:  # noqa pylint: disable=too-many-public-methods,invalid-name
             self.set_srq_mask(SrqMask.NONE),
         )
 
+    def __load_configuration(self, status: DmmStatus) -> None:
+        """
+        Take the configuration from the status of the device and mark the settings as set on the device.
+        """
+        flags = status.status
+        trigger = None
+        if StatusFlags.INTERNAL_TRIGGER_ENABLED in flags:
+            trigger = TriggerType.INTERNAL
+        elif StatusFlags.EXTERNAL_TRIGGER_ENABLED in flags:
+            trigger = TriggerType.EXTERNAL
+        self.__configuration = DmmConfiguration(
+            function=status.function,
+            range=Range.RANGE_AUTO if StatusFlags.AUTO_RANGE_ENABLED in flags else status.range,
+            ndigits=status.ndigits,
+            trigger=trigger,
+            autozero=StatusFlags.AUTO_ZERO_ENABLED in flags,
+            srq_mask=SrqMask(status.srq_flags.value & 0b111101),  # Bits 6 and 7 are not part of the mask
+        )
+        self.__verified_settings = {"function", "range", "ndigits", "autozero", "srq_mask"}
+        if trigger is not None:
+            self.__verified_settings.add("trigger")
+        self.__line_frequency = 50.0 if StatusFlags.LINE_FREQUENCY_50_HZ in flags else 60.0
+
+    def __shutdown_delay(self) -> float:
+        """
+        The time the DMM may need to finish the current conversion, before it accepts the local() command.
+        """
+        configuration = self.__configuration
+        if configuration.trigger in (TriggerType.HOLD, TriggerType.SINGLE) and not self.__conversion_pending:
+            return 0.0
+        if configuration.ndigits is None or configuration.autozero is None:
+            # The slowest reading rate is 1.9 readings/s
+            return 0.5
+        # Without knowing the line frequency, assume the longer integration time at 50 Hz
+        integration_time = INTEGRATION_TIME_PLC[configuration.ndigits] / (self.__line_frequency or 50.0)
+        return integration_time * (2 if configuration.autozero else 1) + DEFAULT_OVERHEAD
+
     async def disconnect(self) -> None:
         """
-        Disconnect the GPIB device and release any lock on the front panel of the device if held.
+        Disconnect the GPIB device and release any lock on the front panel of the device if held. The device is given
+        the time to finish the current conversion, which is calculated from the configuration.
         """
         try:
             await self.local()
-            # Wait 0.5 seconds for the DMM to finish reading and accepting the local() command
-            # The slowest reading rate is 1.9 readings/s
-            await asyncio.sleep(0.5)
+            # Wait for the DMM to finish the current conversion and accept the local() command
+            delay = self.__shutdown_delay()
+            if delay > 0:
+                await asyncio.sleep(delay)
         except ConnectionError:
             pass
         finally:
@@ -199,39 +415,68 @@ class HP_3478A:  # noqa pylint: disable=too-many-public-methods,invalid-name
             The resistance of the NTC at 25 °C
         """
         self.__ntc_parameters = NtcParameters(a, b, c, d, rt25)
+        self.__update_pipeline()
 
-    @staticmethod
-    def __convert_thermistor_to_temperature(value: Decimal, ntc_parameters: NtcParameters) -> Decimal:
+    def set_transforms(self, *transforms: TransformLike) -> None:
         """
-        Convert a resistance to temperature using the formula 1/T=a+b*Log(Rt/R25)+c*Log(Rt/R25)**2+d*Log(Rt/R25)**3.
+        Set the transforms applied to every reading, e.g. to convert the resistance of an RTD to a temperature or to
+        scale the voltage across a shunt to a current. The transforms are applied after the special function selected
+        using :func:`set_function` and are fused into a single function. Call it without arguments to remove all
+        transforms.
 
         Parameters
         ----------
-        value: Decimal or float
-            The resistance of the NTC
-        ntc_parameters: NtcParameters
+        *transforms: Transform or Callable
+            The transforms in the order they are applied. See :mod:`hp3478a_async.transforms`.
+        """
+        self.__transforms = TransformPipeline(*transforms).transforms
+        self.__update_pipeline()
 
-        Returns
-        -------
-        Decimal or float
-            The temperature in K
-        """
-        # Note: float precision is good enough for thermistors, so we convert the value to float and finally back to
-        # Decimal
-        return Decimal(
-            1
-            / (
-                ntc_parameters.a
-                + ntc_parameters.b * log(float(value) / ntc_parameters.rt25)
-                + ntc_parameters.c * log(float(value) / ntc_parameters.rt25) ** 2
-                + ntc_parameters.d * log(float(value) / ntc_parameters.rt25) ** 3
-            )
-        )
+    def set_srq_waiter(self, waiter: Callable[[], Awaitable[int]] | None) -> None:
+        """
+        Replace the wait for a service request of the connection, e.g. by an
+        :class:`SrqDispatcher <hp3478a_async.srq_dispatcher.SrqDispatcher>`, that waits for the service requests of
+        all devices on a board.
+
+        Parameters
+        ----------
+        waiter: Callable or None
+            A coroutine function returning the status byte of the device, once it requested service. Use `None` to
+            wait using the connection.
+        """
+        self.__srq_waiter = waiter
+
+    def set_metrics(self, metrics: InstrumentMetrics | None) -> None:
+        """
+        Record the latency of all bus transactions, the time spent waiting for service requests and the number of
+        readings. Usually called by :func:`MetricsExporter.add_instrument()
+        <hp3478a_async.metrics.MetricsExporter.add_instrument>`.
+
+        Parameters
+        ----------
+        metrics: InstrumentMetrics or None
+            The metrics to record to. Use `None` to stop recording.
+        """
+        self.__metrics = metrics
+
+    def __record_latency(self, command: str, started: float) -> None:
+        if self.__metrics is not None:
+            self.__metrics.record_latency(command, time.monotonic() - started)
+
+    def __update_pipeline(self) -> None:
+        """
+        Fuse the special function and the transforms. This is done, when the configuration changes, so the readings
+        are converted using a single function call.
+        """
+        transforms: list[Transform] = list(self.__transforms)
+        if self.__special_function is not None:
+            transforms.insert(0, NtcTransform(replace(self.__ntc_parameters)))
+        self.__pipeline = TransformPipeline(*transforms) if transforms else None
 
     def __post_process(self, value: Decimal) -> Decimal:
         """
-        Post-process the DMM value, if a special function was selected using :func:`set_function`. Returns the
-        unmodified value if no special function was selected.
+        Post-process the DMM value, if a special function was selected using :func:`set_function` or transforms were
+        set using :func:`set_transforms`. Returns the unmodified value if there is no post-processing.
 
         Parameters
         ----------
@@ -241,15 +486,52 @@ class HP_3478A:  # noqa pylint: disable=too-many-public-methods,invalid-name
         Returns
         -------
         Decimal
-            the post-processed value. The value is unmodified if no special function was selected.
+            the post-processed value. The value is unmodified if there is no post-processing.
         """
-        if self.__special_function is not None:
-            try:
-                return self.__convert_thermistor_to_temperature(value, self.__ntc_parameters)
-            except ValueError:
-                raise ValueError(f"Cannot convert resistance to temperature. Measurement was: {value}.") from None
+        if self.__pipeline is not None:
+            return self.__pipeline.decimal(value)
         return value
 
+    def __parse_result(self, result: bytes, post_process: bool = True) -> Decimal | bytes | None:
+        """
+        Convert the raw bytes returned by the DMM to a Decimal, if the result is a number. This function does not raise
+        on an overloaded input, but returns `None` instead and increments the overload counter.
+
+        Parameters
+        ----------
+        result: bytes
+            The raw result with the EOT characters stripped.
+        post_process: bool, default=True
+            Apply the post-processing of the special function selected.
+
+        Returns
+        -------
+        Decimal or bytes or None
+            Either a Decimal value, the raw bytes if the result is not a number or `None` if the input is overloaded.
+        """
+        match = numerical_test_pattern.match(result)
+        if match is not None:
+            if match[0] == OVERLOAD_VALUE:
+                self.__overload_count += 1
+                return None
+            value = Decimal(match[0].decode("ascii"))
+            return self.__post_process(value) if post_process else value
+        return result  # else return the bytes
+
+    async def __read_raw(self, length: int | None = None, srq_time: float | None = None) -> bytes:
+        async with self.__lock(Priority.URGENT):
+            read_started = time.time()
+            if length is None:
+                result = (await self.__conn.read())[:-2]  # strip the EOT characters (\r\n)
+            else:
+                result = await self.__conn.read(length=length)
+            self.__last_timing = ReadingTiming(srq=srq_time, read_started=read_started, read_completed=time.time())
+            self.__conversion_pending = False
+            if self.__metrics is not None:
+                self.__metrics.record_latency("read", self.__last_timing.read_completed - read_started)
+                self.__metrics.record_reading()
+            return result
+
     async def read(self, length: int | None = None) -> Decimal | bytes:
         """
         Read a single value from the device. If `length' is given, read `length` bytes, else read until a line break
@@ -270,27 +552,63 @@ class HP_3478A:  # noqa pylint: disable=too-many-public-methods,invalid-name
         OverflowError
             If the instrument input is overloaded, i.e. returns `+9.99999E+9`.
         """
-        if length is None:
-            result = (await self.__conn.read())[:-2]  # strip the EOT characters (\r\n)
-        else:
-            result = await self.__conn.read(length=length)
-
-        match = numerical_test_pattern.match(result)
-        if match is not None:
-            if match[0] == b"+9.99999E+9":
-                raise OverflowError("DMM input overloaded")
-            return self.__post_process(Decimal(match[0].decode("ascii")))
-        return result  # else return the bytes
-
-    async def read_all(self, length: int | None = None) -> AsyncGenerator[Decimal | bytes]:
+        result = self.__parse_result(await self.__read_raw(length))
+        if result is None:
+            raise OverflowError("DMM input overloaded")
+        return result
+
+    async def read_all(  # pylint: disable=too-many-arguments,too-many-locals
+        self,
+        length: int | None = None,
+        nan_on_overload: bool = False,
+        reconnect: bool = False,
+        reconnect_interval: float = 1.0,
+        wait_for_srq: bool = True,
+        *,
+        post_process: bool = True,
+        events: SrqMask = SrqMask.NONE,
+        on_event: Callable[[SerialPollFlags], None] | None = None,
+        reconnect_attempts: int | None = None,
+    ) -> AsyncGenerator[Decimal | bytes]:
         """
         Read all values from the device. If `length' is given, read `length` bytes, else read until a line break
         ``b"\\n"``, then yield the result.
 
+        The bus is only held while reading out a finished conversion, so other commands like :func:`get_status` are
+        executed while the DMM converts the next value.
+
         Parameters
         ----------
         length: int, optional
             The number of bytes to read. Omit to read a line.
+        nan_on_overload: bool, default=False
+            If `True`, an overloaded input will yield ``Decimal("NaN")`` instead of raising an :class:`OverflowError`,
+            which would end the generator. The number of overloads can be queried using :attr:`overload_count`.
+        reconnect: bool, default=False
+            If `True`, a connection loss or timeout will not end the generator. Instead, the connection is
+            reestablished, the last known :attr:`configuration` is restored and the generator resumes. The length of
+            the gap is logged and can be queried using :attr:`last_reconnect_gap`.
+        reconnect_interval: float, default=1.0
+            The time in seconds to wait between reconnection attempts.
+        wait_for_srq: bool, default=True
+            If `True`, wait for the data ready service request before reading. If `False`, read right away and let the
+            DMM hold off the bus until the conversion is done. This saves the serial poll per reading, but holds the
+            bus during the conversion and requires a GPIB timeout longer than the conversion time. Use it for short
+            conversion times only.
+        post_process: bool, default=True
+            If `False`, the post-processing of special functions like :attr:`FunctionType.NTC
+            <hp3478a_async.enums.FunctionType.NTC>` is skipped and the raw resistance is returned. Use
+            :attr:`post_processor` to apply it later, for example in an executor.
+        events: SrqMask, default=SrqMask.NONE
+            Additional reasons for a service request, e.g. :attr:`SrqMask.FRONT_PANEL_SRQ
+            <hp3478a_async.flags.SrqMask.FRONT_PANEL_SRQ>`. These service requests are passed to `on_event` and do not
+            end the generator. Requires `wait_for_srq`.
+        on_event: Callable, optional
+            Called with the flags of the events, that caused a service request. The serial poll register is cleared
+            afterwards.
+        reconnect_attempts: int, optional
+            The number of attempts to reestablish a lost connection, before the error is raised. Omit to retry until
+            the generator is cancelled.
 
         Returns
         -------
@@ -300,27 +618,246 @@ class HP_3478A:  # noqa pylint: disable=too-many-public-methods,invalid-name
         Raises
         ------
         OverflowError
-            If the instrument input is overloaded, i.e. returns `+9.99999E+9`.
+            If the instrument input is overloaded, i.e. returns `+9.99999E+9`, and `nan_on_overload` is not set.
         DeviceError
-            If the device is not ready for read.
+            If the device is not ready for read and did not request service for one of the `events`.
         asyncio.TimeoutError
-            If the GPIB controller does not respond in time.
+            If the GPIB controller does not respond in time and `reconnect` is not set.
+        OSError
+            If the connection cannot be reestablished within `reconnect_attempts`.
         """
-        await self.set_srq_mask(SrqMask.DATA_READY)  # Enable a GPIB interrupt when the conversion is done
+        if wait_for_srq:
+            # Enable a GPIB interrupt when the conversion is done
+            await self.set_srq_mask(SrqMask.DATA_READY | events)
+        last_reading = time.monotonic()
         while "loop not cancelled":
             try:
-                status_byte = SerialPollFlags(await self.connection.wait((1 << 11) | (1 << 14)))
-                if SerialPollFlags.SRQ_ON_DATA_READY in status_byte:
-                    result = await self.read(length)
-                    yield result
-                else:
-                    raise DeviceError(f"Device did not signal ready for read. Status was: {status_byte}")
-            except asyncio.TimeoutError:
-                raise asyncio.TimeoutError("The GPIB controller did not respond in time.") from None
-
-    async def __query(self, command: bytes, length: int | None = None) -> bytes:
-        await self.write(command)
-        return await self.__conn.read(length=length)
+                srq_time = None
+                event_flags = SerialPollFlags.NONE
+                if wait_for_srq:
+                    status_byte = await self.wait_for_srq()
+                    srq_time = time.time()
+                    event_flags = SerialPollFlags(status_byte.value & events.value)
+                    if SerialPollFlags.SRQ_ON_DATA_READY not in status_byte:
+                        if not event_flags:
+                            raise DeviceError(f"Device did not signal ready for read. Status was: {status_byte}")
+                        await self.__handle_events(event_flags, on_event)
+                        continue
+                result = self.__parse_result(await self.__read_raw(length, srq_time), post_process)
+                if event_flags:
+                    # The result is read first, because clearing the events clears the data ready flag as well
+                    await self.__handle_events(event_flags, on_event)
+            except (asyncio.TimeoutError, ConnectionError) as exc:
+                if not reconnect:
+                    if isinstance(exc, ConnectionError):
+                        raise
+                    raise asyncio.TimeoutError("The GPIB controller did not respond in time.") from None
+                await self.__reconnect(last_reading, reconnect_interval, reconnect_attempts)
+                continue
+            if result is None:
+                if not nan_on_overload:
+                    raise OverflowError("DMM input overloaded")
+                result = Decimal("NaN")
+            last_reading = time.monotonic()
+            yield result
+
+    async def __handle_events(
+        self, event_flags: SerialPollFlags, on_event: Callable[[SerialPollFlags], None] | None
+    ) -> None:
+        await self.clear()  # Clear the serial poll register, so the event is only reported once
+        if on_event is not None:
+            on_event(event_flags)
+
+    async def wait_for_srq(self) -> SerialPollFlags:
+        """
+        Wait for a service request of the device. The reasons for a service request are selected using
+        :func:`set_srq_mask`.
+
+        Returns
+        -------
+        SerialPollFlags
+            The status register of the device
+        """
+        started = time.monotonic()
+        if self.__srq_waiter is not None:
+            status_byte = await self.__srq_waiter()
+        elif hasattr(self.__conn, "set_eot"):
+            # Used by the Prologix adapters
+            status_byte = await asyncio.wait_for(self.__poll_srq(), timeout=self.__conn.get_connection_timeout())
+        else:
+            status_byte = await self.connection.wait((1 << 11) | (1 << 14))
+        if self.__metrics is not None:
+            self.__metrics.record_srq_wait(time.monotonic() - started)
+        return SerialPollFlags(status_byte)
+
+    async def __poll_srq(self) -> int:
+        """
+        Wait for a service request by polling the adapter. The Prologix adapters poll over the same link used for the
+        queries, so each poll holds the bus. This keeps the polls from getting between the command and the reply of a
+        query. The bus is released between the polls, so other commands can be sent during the conversion. The time
+        taken by a poll is part of the poll interval.
+
+        Returns
+        -------
+        int
+            The status byte of the device
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            async with self.__lock(Priority.URGENT):
+                if await self.__conn.test_srq():
+                    status_byte = await self.__conn.serial_poll()
+                    if status_byte & SerialPollFlags.SRQ_ON_HAS_SRQ.value:
+                        return status_byte
+            await asyncio.sleep(max(self.__srq_poll_interval - (loop.time() - started), 0))
+
+    async def wait_for_data_ready(self) -> None:
+        """
+        Wait for the service request signalling the end of a conversion. The SRQ mask must be set to
+        :attr:`SrqMask.DATA_READY <hp3478a_async.flags.SrqMask.DATA_READY>`. The input of the DMM may be changed,
+        once this function returns, while the result is read.
+
+        Raises
+        ------
+        DeviceError
+            If the device requested service for a different reason.
+        """
+        status_byte = await self.wait_for_srq()
+        if SerialPollFlags.SRQ_ON_DATA_READY not in status_byte:
+            raise DeviceError(f"Device did not signal ready for read. Status was: {status_byte}")
+
+    async def __reconnect(self, last_reading: float, retry_interval: float, max_attempts: int | None) -> None:
+        """
+        Reestablish the connection and restore the configuration. Retries until successful, the number of attempts is
+        exceeded or the task is cancelled.
+
+        Parameters
+        ----------
+        last_reading: float
+            The timestamp (:func:`time.monotonic`) of the last successful reading.
+        retry_interval: float
+            The time in seconds to wait between attempts.
+        max_attempts: int or None
+            The maximum number of attempts or `None` to retry forever.
+        """
+        self.__logger.warning("Connection to %s lost. Reconnecting.", self)
+        configuration = replace(self.__configuration)
+        attempt = 0
+        while "not connected":
+            attempt += 1
+            try:
+                await self.__conn.disconnect()
+            except (OSError, asyncio.TimeoutError):
+                pass  # The connection is already broken
+            try:
+                await self.connect()
+                # The device might have been reset, so all settings are written again
+                self.__configuration = replace(configuration)
+                self.__verified_settings.clear()
+                await self.__restore_configuration()
+                break
+            except (OSError, asyncio.TimeoutError) as exc:
+                if max_attempts is not None and attempt >= max_attempts:
+                    self.__logger.error("Giving up reconnecting to %s after %d attempts.", self, attempt)
+                    raise
+                self.__logger.warning(
+                    "Reconnect attempt %d to %s failed: %r. Retrying in %.1f s.", attempt, self, exc, retry_interval
+                )
+                await asyncio.sleep(retry_interval)
+        self.__reconnect_count += 1
+        self.__last_reconnect_gap = time.monotonic() - last_reading
+        self.__logger.warning("Reconnected to %s. Data gap: %.3f s.", self, self.__last_reconnect_gap)
+
+    async def __restore_configuration(self) -> None:
+        """
+        Reapply all settings recorded in the configuration.
+        """
+        configuration = replace(self.__configuration)
+        if configuration.function is not None:
+            await self.set_function(configuration.function)
+        if configuration.range is not None:
+            await self.set_range(configuration.range)
+        if configuration.ndigits is not None:
+            await self.set_number_of_digits(configuration.ndigits)
+        if configuration.autozero is not None:
+            await self.set_autozero(configuration.autozero)
+        if configuration.trigger is not None:
+            await self.set_trigger(configuration.trigger)
+        if configuration.srq_mask is not None:
+            await self.set_srq_mask(configuration.srq_mask)
+
+    async def __query(self, command: bytes, length: int | None = None, priority: Priority = Priority.HIGH) -> bytes:
+        async with self.__lock(priority):
+            started = time.monotonic()
+            await self.__conn.write(command)
+            result = await self.__conn.read(length=length)
+            self.__record_latency(command[:1].decode("ascii", "replace"), started)
+            return result
+
+    async def __command(self, command: bytes, priority: Priority = Priority.NORMAL, separate: bool = False) -> None:
+        """
+        Send a write-only program code to the device. The HP 3478A accepts several program codes in a single message, so
+        commands issued concurrently, or while the bus is busy, are queued and sent back-to-back in a single write. All
+        writes go through this queue, so they reach the device in the order they were issued.
+
+        Parameters
+        ----------
+        command: bytes
+            The program code. A line terminator, e.g. of the display text, ends the message.
+        priority: Priority, default=Priority.NORMAL
+            The priority of the command on the bus.
+        separate: bool, default=False
+            Send the command as a message on its own, e.g. if it is binary data or was passed to :func:`write`.
+        """
+        batch = self.__pending_commands
+        if batch is None:
+            batch = self.__pending_commands = _CommandBatch()
+        batch.add(command, separate)
+        # Give other tasks, that were scheduled at the same time, e.g. by asyncio.gather(), the chance to join
+        await asyncio.sleep(0)
+        async with self.__lock(priority):
+            # The first task of the batch acquiring the lock sends the commands of all others
+            if not batch.is_sent:
+                batch.is_sent = True
+                if self.__pending_commands is batch:
+                    self.__pending_commands = None
+                try:
+                    for message in batch.messages:
+                        started = time.monotonic()
+                        await self.__conn.write(message)
+                        self.__record_latency("command", started)
+                except Exception as exc:
+                    batch.error = exc
+                    raise
+                except BaseException as exc:
+                    # The sending task was cancelled, so the other tasks of the batch must not report success
+                    batch.error = ConnectionError("Sending the commands was cancelled.")
+                    batch.error.__cause__ = exc
+                    raise
+        if batch.error is not None:
+            raise batch.error
+
+    async def __apply_setting(self, setting: str, value: Any, command: bytes) -> None:
+        """
+        Send the command and record the setting in the configuration. The command is skipped, if the setting is known
+        to be set on the device.
+
+        Parameters
+        ----------
+        setting: str
+            The name of the setting in the :class:`DmmConfiguration`.
+        value: Any
+            The new value of the setting.
+        command: bytes
+            The program code.
+        """
+        if setting in self.__verified_settings and getattr(self.__configuration, setting) == value:
+            return
+        await self.__command(command)
+        setattr(self.__configuration, setting, value)
+        if self.__warm_connect:
+            self.__verified_settings.add(setting)
 
     async def set_display(self, value: DisplayType, text: str = "") -> None:
         """
@@ -336,13 +873,14 @@ class HP_3478A:  # noqa pylint: disable=too-many-public-methods,invalid-name
             :attr:`DisplayType.NORMAL <hp3478a_async.enums.DisplayType.NORMAL>`. There is no need to terminate the
             string with ``"\\r"`` or ``"\\n"``.
         """
+        # Display updates have the lowest priority on the bus, so they do not delay readings
         value = DisplayType(value)
         if value == DisplayType.NORMAL:
             # Do not allow text in normal display mode
-            await self.write(f"D{value.value:d}".encode("ascii"))
+            await self.__command(f"D{value.value:d}".encode("ascii"), Priority.LOW)
         else:
             # The text must be terminated by a control character like \r or \n
-            await self.write(f"D{value.value:d}{text.rstrip()}\n".encode("ascii"))
+            await self.__command(f"D{value.value:d}{text.rstrip()}\n".encode("ascii"), Priority.LOW)
 
     async def set_trigger(self, value: TriggerType) -> None:
         """
@@ -354,7 +892,11 @@ class HP_3478A:  # noqa pylint: disable=too-many-public-methods,invalid-name
             The trigger type used when taking measurements.
         """
         value = TriggerType(value)
-        await self.write(f"T{value.value:d}".encode("ascii"))
+        if value is TriggerType.SINGLE:
+            # Each single trigger command takes a reading, so it is never skipped
+            self.__verified_settings.discard("trigger")
+            self.__conversion_pending = True
+        await self.__apply_setting("trigger", value, f"T{value.value:d}".encode("ascii"))
 
     async def write(self, msg: bytes) -> None:
         """
@@ -366,7 +908,7 @@ class HP_3478A:  # noqa pylint: disable=too-many-public-methods,invalid-name
         msg: bytes
             The string to be sent to the device.
         """
-        await self.__conn.write(msg)
+        await self.__command(msg, Priority.NORMAL, separate=True)
 
     async def set_srq_mask(self, value: SrqMask) -> None:
         """
@@ -380,44 +922,65 @@ class HP_3478A:  # noqa pylint: disable=too-many-public-methods,invalid-name
             The service request register setting.
         """
         value = SrqMask(value)
-        await self.write(f"M{value.value:02o}".encode("ascii"))
+        await self.__apply_setting("srq_mask", value, f"M{value.value:02o}".encode("ascii"))
 
-    async def get_front_rear_switch_position(self) -> FrontRearSwitchPosition:
+    async def get_front_rear_switch_position(self, priority: Priority = Priority.HIGH) -> FrontRearSwitchPosition:
         """
         Check whether the front or rear panel binding posts are active.
 
+        Parameters
+        ----------
+        priority: Priority, default=Priority.HIGH
+            The priority of the query on the bus.
+
         Returns
         ----------
         FrontRearSwitchPosition
             The position of the front/rear switch
         """
-        return FrontRearSwitchPosition(int(await self.__query(b"S")))
+        return FrontRearSwitchPosition(int(await self.__query(b"S", priority=priority)))
 
     async def device_clear(self) -> None:
         """
         Send the Selected Device Clear (SDC) event. This will trigger the self-test routine and  reset the device to
         its power on state.
         """
-        await self.__conn.clear()
+        async with self.__lock(Priority.HIGH):
+            await self.__conn.clear()
+        self.__configuration = DmmConfiguration()
+        self.__verified_settings.clear()
 
     async def clear(self) -> None:
         """
         Clear serial poll register
         """
-        await self.write(b"K")
+        await self.__command(b"K", Priority.HIGH)
 
     async def reset(self) -> None:
         """
         Place the device in DCV, autorange, autozero, single trigger, 4.5 digits mode and erase any output stored in
         the buffers.
         """
-        await self.write(b"H0")
+        await self.__command(b"H0")
+        self.__configuration = DmmConfiguration()
+        self.__verified_settings.clear()
 
     async def local(self) -> None:
         """
         Disable the front panel and allow only GPIB commands.
         """
-        await self.__conn.ibloc()
+        async with self.__lock(Priority.HIGH):
+            await self.__conn.ibloc()
+
+    async def trigger(self) -> None:
+        """
+        Send a Group Execute Trigger (GET) to the device. This starts a single conversion, if the trigger is set to
+        :attr:`TriggerType.HOLD <hp3478a_async.enums.TriggerType.HOLD>` or
+        :attr:`TriggerType.SINGLE <hp3478a_async.enums.TriggerType.SINGLE>`.
+        """
+        async with self.__lock(Priority.HIGH):
+            await self.__conn.trigger()
+        self.__conversion_pending = True
 
     async def set_function(self, value: FunctionType) -> None:
         """
@@ -430,13 +993,17 @@ class HP_3478A:  # noqa pylint: disable=too-many-public-methods,invalid-name
             The function type to be measured.
         """
         value = FunctionType(value)
-        if value in (FunctionType.NTC, FunctionType.NTCF):
-            self.__special_function = value
-            # Convert to OHM/OHMF
-            value = FunctionType(((value.value - 8) % 2) + 3)
-        else:
-            self.__special_function = None
-        await self.write(f"F{value.value:d}".encode("ascii"))
+        device_function = value.device_function
+        self.__special_function = value if value is not device_function else None
+        self.__update_pipeline()
+        current_function = self.__configuration.function
+        if current_function is None or current_function.device_function is not device_function:
+            # The range depends on the function
+            self.__verified_settings.discard("range")
+        elif "function" in self.__verified_settings:
+            # Switching between a resistance function and its thermistor function only changes the post-processing
+            self.__configuration.function = value
+        await self.__apply_setting("function", value, f"F{device_function.value:d}".encode("ascii"))
 
     async def set_autozero(self, enable: bool) -> None:
         """
@@ -448,7 +1015,7 @@ class HP_3478A:  # noqa pylint: disable=too-many-public-methods,invalid-name
             `True` to enable auto-zeroing.
         """
         enable = bool(enable)
-        await self.write(f"Z{enable:d}".encode("ascii"))
+        await self.__apply_setting("autozero", enable, f"Z{enable:d}".encode("ascii"))
 
     async def set_number_of_digits(self, value: int) -> None:
         """
@@ -462,19 +1029,24 @@ class HP_3478A:  # noqa pylint: disable=too-many-public-methods,invalid-name
         """
         value = int(value)
         assert 4 <= value <= 6
-        await self.write(f"N{(value-1):d}".encode("ascii"))
+        await self.__apply_setting("ndigits", value, f"N{(value-1):d}".encode("ascii"))
 
-    async def get_error_register(self) -> ErrorFlags:
+    async def get_error_register(self, priority: Priority = Priority.HIGH) -> ErrorFlags:
         """
         Get the contents of the error register, which is the result of the power on self-test. See page 62 of the manual
         for details.
 
+        Parameters
+        ----------
+        priority: Priority, default=Priority.HIGH
+            The priority of the query on the bus.
+
         Returns
         ----------
         ErrorFlags
             The error register
         """
-        result = int(await self.__query(b"E"), base=8)  # Convert the octal result to int
+        result = int(await self.__query(b"E", priority=priority), base=8)  # Convert the octal result to int
         return ErrorFlags(result)
 
     async def set_range(self, value: Range) -> None:
@@ -487,7 +1059,7 @@ class HP_3478A:  # noqa pylint: disable=too-many-public-methods,invalid-name
             The measurement range.
         """
         value = Range(value)
-        await self.write(f"R{value.value}".encode("ascii"))
+        await self.__apply_setting("range", value, f"R{value.value}".encode("ascii"))
 
     @staticmethod
     def __calculate_range(function: FunctionType, range_value: int) -> Range:
@@ -532,7 +1104,7 @@ class HP_3478A:  # noqa pylint: disable=too-many-public-methods,invalid-name
         """
         result = bytearray()
         for addr in range(256):
-            result.append(ord(await self.__query(command=bytes([ord("W"), addr]), length=1)))
+            result.append(ord(await self.__query(command=bytes([ord("W"), addr]), length=1, priority=Priority.LOW)))
         return bytes(result)
 
     async def set_cal_ram(self, data: bytes) -> None:
@@ -546,12 +1118,17 @@ class HP_3478A:  # noqa pylint: disable=too-many-public-methods,invalid-name
             The data to be written to the calibration memory.
         """
         for addr, data_block in enumerate(data):
-            await self.write(bytes([ord("X"), addr, data_block]))
+            await self.__command(bytes([ord("X"), addr, data_block]), Priority.LOW, separate=True)
 
-    async def get_status(self) -> DmmStatus:
+    async def get_status(self, priority: Priority = Priority.HIGH) -> DmmStatus:
         """
         Read the binary status register of the device. See page 61 of the manual for details.
 
+        Parameters
+        ----------
+        priority: Priority, default=Priority.HIGH
+            The priority of the query on the bus.
+
         Returns
         -------
         DmmStatus
@@ -560,11 +1137,12 @@ class HP_3478A:  # noqa pylint: disable=too-many-public-methods,invalid-name
         # The "B" command is special. It does not contain a line terminator, the
         # device will output exactly 5 bytes and no more. So we need to read exactly
         # 5 bytes.
-        result = await self.__query(command=b"B", length=5)
+        result = await self.__query(command=b"B", length=5, priority=priority)
         function = FunctionType((result[0] >> 5) & 0b111)
-        if self.__special_function is not None and function is FunctionType(
-            ((self.__special_function.value - 8) % 2) + 3
-        ):
+        # The range bits depend on the function set on the device, so decode them before substituting the special
+        # function
+        range_value = self.__calculate_range(function, (result[0] >> 2) & 0b111)
+        if self.__special_function is not None and function is self.__special_function.device_function:
             # If a special function is enabled in the driver, and the instrument is set to
             # the correct function, we will return the special function instead
             function = self.__special_function
@@ -572,9 +1150,10 @@ class HP_3478A:  # noqa pylint: disable=too-many-public-methods,invalid-name
             # If the correct function is not set on the device, we will disable the special function
             # in the driver
             self.__special_function = None
+            self.__update_pipeline()
         return DmmStatus(
             function=function,
-            range=self.__calculate_range(function, (result[0] >> 2) & 0b111),
+            range=range_value,
             ndigits=6 - (result[0] & 0b11),
             status=StatusFlags(result[1]),
             srq_flags=SerialPollFlags(result[2]),
@@ -582,14 +1161,20 @@ class HP_3478A:  # noqa pylint: disable=too-many-public-methods,invalid-name
             dac_value=result[4],
         )
 
-    async def serial_poll(self) -> SerialPollFlags:
+    async def serial_poll(self, priority: Priority = Priority.HIGH) -> SerialPollFlags:
         """
         Serial poll the device/GPIB controller. Use this in combination with the SRQ mask to determine, if the
         instrument triggered the SRQ and requests service.
 
+        Parameters
+        ----------
+        priority: Priority, default=Priority.HIGH
+            The priority of the poll on the bus.
+
         Returns
         -------
         SerialPollFlags
             The status register of the device
         """
-        return SerialPollFlags(await self.__conn.serial_poll())
+        async with self.__lock(priority):
+            return SerialPollFlags(await self.__conn.serial_poll())
@@ -20,7 +20,13 @@ Helper functions to encode and decode data formats used by the HP 3478A.
 """
 from __future__ import annotations
 
+import hashlib
+import os
 from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from statistics import median_low
+from typing import Iterable
 
 
 @dataclass
@@ -49,7 +55,7 @@ class CalramEntry:
         bytes
             The bytestring which can be written to the HP 3478A.
         """
-        result = _encode_offset_data(self.offset) + _encode_gain_data(self.gain)
+        result = _encode_offset_data(self.offset) + _lookup_gain_data(self.gain)
         checksum = _calculate_cal_checksum(result)
         result += [(checksum >> 4) & 0xF, (checksum >> 0) & 0xF]
 
@@ -73,7 +79,7 @@ def format_cal_string(data: bytes) -> str:
     return "\n".join([(data[i : i + 16]).decode() for i in range(0, len(data), 16)])
 
 
-def _decode_bcd_8421(data: list[int] | tuple[int, ...]) -> int:
+def _decode_bcd_8421(data: list[int] | tuple[int, ...] | bytes) -> int:
     result = 0
     for i, value in enumerate(reversed(data)):
         result += 10**i * value
@@ -172,7 +178,58 @@ def _encode_gain_data(value: float) -> list[int]:
     return result
 
 
-def _calculate_cal_checksum(data: list[int] | tuple[int, ...]) -> int:
+# The gain is stored as the deviation from 1 in ppm. The encodable range is 0.955556 to 1.055555.
+_GAIN_MIN_PPM = -44444
+_GAIN_MAX_PPM = 55555
+_GAIN_TABLE_VERSION = 1
+
+
+def _generate_gain_table() -> bytes:
+    # Encode every representable gain. Each gain is encoded as 5 bytes, one per nibble.
+    return b"".join(bytes(_encode_gain_data(1.0 + ppm / 10**6)) for ppm in range(_GAIN_MIN_PPM, _GAIN_MAX_PPM + 1))
+
+
+def _gain_table_path() -> Path:
+    cache_dir = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_dir) / "hp3478a_async" / f"gain_table_v{_GAIN_TABLE_VERSION}.bin"
+
+
+@lru_cache(maxsize=None)
+def _get_gain_table() -> bytes:
+    """
+    Return the encoded gains of all representable gains. Generating the table takes about half a second, so it is
+    cached on disk. The file contains the SHA-256 hash of the table followed by the table itself. A cache file, that
+    does not match its hash, is regenerated, because writing a corrupted gain to the DMM invalidates its calibration.
+    """
+    path = _gain_table_path()
+    try:
+        content = path.read_bytes()
+        digest, table = content[:32], content[32:]
+        if len(table) == 5 * (_GAIN_MAX_PPM - _GAIN_MIN_PPM + 1) and hashlib.sha256(table).digest() == digest:
+            return table
+    except OSError:
+        pass  # The table is not cached yet
+
+    table = _generate_gain_table()
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = path.with_suffix(f".{os.getpid()}.tmp")
+        temporary_path.write_bytes(hashlib.sha256(table).digest() + table)
+        temporary_path.replace(path)  # Atomically replace the cache, because there might be several processes
+    except OSError:
+        pass  # The cache directory is not writable, so we only keep the table in memory
+    return table
+
+
+def _lookup_gain_data(value: float) -> list[int]:
+    # This returns the same result as _encode_gain_data(), but uses the precomputed table
+    if not 0.955556 <= value <= 1.055555:
+        raise OverflowError()
+    index = 5 * (int(round((value - 1.0) * 10**6)) - _GAIN_MIN_PPM)
+    return list(_get_gain_table()[index : index + 5])
+
+
+def _calculate_cal_checksum(data: list[int] | tuple[int, ...] | bytes) -> int:
     # The checksum is 0xFF minus the sum over the 11 data bytes
     calculated_checksum = 0xFF - (sum(data[:11]) & 0xFF)  # We need to truncate to uin8_t
 
@@ -238,3 +295,167 @@ def encode_cal_data(cal_enable: bool, data_blocks: tuple[CalramEntry, ...] | lis
     # Finally, pad with the cal_enable byte at the beginning and 8 0 bytes at the end
     result = bytes([0xF * bool(not cal_enable) + 0x40]) + encoded_data_blocks + bytes([0 + 0x40] * 8)
     return result
+
+
+@dataclass(frozen=True)
+class CalramDelta:
+    """The difference of a calibration memory entry with respect to a reference."""
+
+    entry: int
+    offset: int
+    gain_ppm: int
+    is_valid: bool
+
+    @property
+    def is_changed(self) -> bool:
+        """`True` if the offset or the gain differs from the reference."""
+        return self.offset != 0 or self.gain_ppm != 0
+
+
+@dataclass(frozen=True)
+class CalramTable:
+    """
+    The calibration constants of several calibration memory dumps. Each row contains the 19 entries of a dump.
+    """
+
+    is_cal_enabled: tuple[bool, ...]
+    offset: tuple[tuple[int, ...], ...]
+    gain: tuple[tuple[float, ...], ...]
+    checksum: tuple[tuple[int, ...], ...]
+    is_valid: tuple[tuple[bool, ...], ...]
+
+    def __len__(self) -> int:
+        return len(self.is_cal_enabled)
+
+    def baseline(self) -> tuple[tuple[int, ...], tuple[float, ...]]:
+        """
+        Calculate the fleet baseline, which is the median of the offset and gain of each entry over all dumps. If the
+        number of dumps is even, the lower of the two middle values is used, so the baseline consists of values, that
+        can be encoded.
+
+        Returns
+        -------
+        tuple of tuple[int] and tuple[float]
+            The offsets and gains of the 19 entries.
+        """
+        return (
+            tuple(median_low(column) for column in zip(*self.offset)),
+            tuple(median_low(column) for column in zip(*self.gain)),
+        )
+
+    def diff(self, reference: int | None = None) -> tuple[tuple[CalramDelta, ...], ...]:
+        """
+        Compare each dump against a reference.
+
+        Parameters
+        ----------
+        reference: int, optional
+            The index of the dump used as a reference. If omitted, the fleet :func:`baseline` is used.
+
+        Returns
+        -------
+        tuple of tuple[CalramDelta]
+            The 19 deltas for each dump.
+        """
+        if reference is None:
+            reference_offset, reference_gain = self.baseline()
+        else:
+            reference_offset, reference_gain = self.offset[reference], self.gain[reference]
+        return tuple(
+            tuple(
+                CalramDelta(
+                    entry=entry,
+                    offset=offset - offset_ref,
+                    gain_ppm=int(round((gain - gain_ref) * 10**6)),
+                    is_valid=is_valid,
+                )
+                for entry, (offset, offset_ref, gain, gain_ref, is_valid) in enumerate(
+                    zip(offsets, reference_offset, gains, reference_gain, valid_flags)
+                )
+            )
+            for offsets, gains, valid_flags in zip(self.offset, self.gain, self.is_valid)
+        )
+
+
+# Lookup tables for the batch decoder. Subtracting 0x40 from each character returns the nibbles, subtracting 0x10
+# returns the ASCII digits "0" to "9" for BCD encoded nibbles.
+_NIBBLE_TABLE = bytes((value - 0x40) & 0xFF for value in range(256))
+_DIGIT_TABLE = bytes((value - 0x10) & 0xFF for value in range(256))
+# The value of each nibble of the gain depending on its position. Each nibble is a 4-bit two's complement number.
+_GAIN_DIGIT_TABLE = tuple(
+    tuple((value - 0x10 if value & 0x08 else value) * 10 ** (4 - position) for value in range(256))
+    for position in range(5)
+)
+
+
+def _decode_cal_data_fast(
+    encoded_data: str | bytes,
+) -> tuple[bool, tuple[int, ...], tuple[float, ...], tuple[int, ...], tuple[bool, ...]]:
+    if isinstance(encoded_data, str):
+        encoded_data = encoded_data.encode("ascii")
+    nibbles = encoded_data.translate(_NIBBLE_TABLE)
+    digits = encoded_data.translate(_DIGIT_TABLE)
+    offsets, gains, checksums, valid_flags = [], [], [], []
+    # See decode_cal_data() for details on the format. There are 19 blocks of 13 bytes starting at byte 1.
+    for start in range(1, 248, 13):
+        offset_digits = digits[start : start + 6]
+        if offset_digits.isdigit():
+            offset = int(offset_digits)
+        else:
+            # Invalid BCD data, fall back to the slow decoder
+            offset = _decode_bcd_8421(nibbles[start : start + 6])
+        offsets.append(offset if offset < 900000 else offset - 1000000)
+        gain = sum(gain_table[value] for gain_table, value in zip(_GAIN_DIGIT_TABLE, nibbles[start + 6 : start + 11]))
+        gains.append(1.0 + gain / 10**6)
+        checksum = (nibbles[start + 11] << 4) + nibbles[start + 12]
+        checksums.append(checksum)
+        valid_flags.append(_calculate_cal_checksum(nibbles[start : start + 11]) == checksum)
+    return nibbles[0] == 0x0, tuple(offsets), tuple(gains), tuple(checksums), tuple(valid_flags)
+
+
+def decode_cal_data_batch(dumps: Iterable[str | bytes]) -> CalramTable:
+    """
+    Decode many calibration memory dumps at once. This function returns the same constants as
+    :func:`decode_cal_data`, but converts all characters of a dump in one go and decodes the entries using lookup
+    tables instead of creating :class:`CalramEntry` objects.
+
+    Parameters
+    ----------
+    dumps: Iterable of str or bytes
+        The contents of the calibration ram.
+
+    Returns
+    ----------
+    CalramTable
+        The calibration constants of all dumps.
+    """
+    columns = tuple(zip(*(_decode_cal_data_fast(encoded_data) for encoded_data in dumps)))
+    if not columns:
+        columns = ((),) * 5
+    is_cal_enabled, offsets, gains, checksums, valid_flags = columns
+    return CalramTable(
+        is_cal_enabled=is_cal_enabled,
+        offset=offsets,
+        gain=gains,
+        checksum=checksums,
+        is_valid=valid_flags,
+    )
+
+
+def diff_cal_data(reference: str | bytes, encoded_data: str | bytes) -> tuple[CalramDelta, ...]:
+    """
+    Compare two calibration memory dumps entry by entry.
+
+    Parameters
+    ----------
+    reference: str or bytes
+        The calibration memory used as a reference.
+    encoded_data: str or bytes
+        The calibration memory to compare.
+
+    Returns
+    ----------
+    tuple of CalramDelta
+        The differences of the 19 entries of `encoded_data` with respect to `reference`.
+    """
+    return decode_cal_data_batch((reference, encoded_data)).diff(reference=0)[1]
@@ -0,0 +1,481 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Copyright (C) 2021 Patrick Baus
+# This file is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+"""
+A measurement logger, that records the readings of one or more DMMs to a CSV or binary file. It is installed as the
+``hp3478a-logger`` command.
+"""
+from __future__ import annotations
+
+import abc
+import argparse
+import asyncio
+import logging
+import struct
+import sys
+import time
+from contextlib import AsyncExitStack
+from dataclasses import dataclass, replace
+from decimal import Decimal
+from typing import TYPE_CHECKING, BinaryIO, Sequence
+
+from hp3478a_async.enums import FunctionType, Range, TriggerType
+from hp3478a_async.hp_3478a import HP_3478A
+from hp3478a_async.srq_dispatcher import SrqDispatcher
+from hp3478a_async.transforms import NtcTransform, RtdTransform, Transform, create_transform
+
+if TYPE_CHECKING:
+    from async_gpib import AsyncGpib
+    from prologix_gpib_async import AsyncPrologixGpibController
+
+# A binary record: the index of the DMM (uint16), the unix timestamp (float64) and the value (float64), little-endian
+BINARY_RECORD = struct.Struct("<Hdd")
+ZERO_CELSIUS = Decimal("273.15")
+
+
+@dataclass(frozen=True)
+class Reading:
+    """A reading taken by the logger."""
+
+    device: int  # The index of the DMM
+    timestamp: float  # The time of the reading as returned by time.time()
+    value: Decimal
+    received: float  # The time of the reading as returned by time.monotonic(), used for latency statistics
+
+
+class Sink(abc.ABC):
+    """
+    A file sink, that buffers readings and writes them in batches. The file is written from a worker thread, so the
+    event loop is not blocked by the file system.
+    """
+
+    def __init__(self, file: BinaryIO, batch_size: int = 1000) -> None:
+        """
+        Create a sink writing to `file`.
+
+        Parameters
+        ----------
+        file: BinaryIO
+            The file opened in binary mode. It is not closed by the sink.
+        batch_size: int, default=1000
+            The number of readings buffered before they are written.
+        """
+        self.__file = file
+        self.__batch_size = batch_size
+        self.__buffer: list[Reading] = []
+
+    def __len__(self) -> int:
+        return len(self.__buffer)
+
+    @property
+    def is_full(self) -> bool:
+        """
+        `True` if the buffer holds a full batch.
+        """
+        return len(self.__buffer) >= self.__batch_size
+
+    def append(self, reading: Reading) -> None:
+        """
+        Add a reading to the buffer.
+
+        Parameters
+        ----------
+        reading: Reading
+            The reading to write.
+        """
+        self.__buffer.append(reading)
+
+    @abc.abstractmethod
+    def encode(self, readings: Sequence[Reading]) -> bytes:
+        """
+        Serialize the readings. Implemented by the subclasses.
+
+        Parameters
+        ----------
+        readings: Sequence of Reading
+            The readings to encode.
+
+        Returns
+        -------
+        bytes
+            The serialized readings.
+        """
+
+    def __write(self, data: bytes) -> None:
+        self.__file.write(data)
+        self.__file.flush()
+
+    async def flush(self) -> list[Reading]:
+        """
+        Write the buffered readings to the file.
+
+        Returns
+        -------
+        list of Reading
+            The readings written.
+        """
+        readings, self.__buffer = self.__buffer, []
+        if readings:
+            await asyncio.get_running_loop().run_in_executor(None, self.__write, self.encode(readings))
+        return readings
+
+    def close(self) -> None:
+        """
+        Write the remaining readings synchronously. Use it when the event loop is shutting down.
+        """
+        readings, self.__buffer = self.__buffer, []
+        if readings:
+            self.__write(self.encode(readings))
+
+
+class CsvSink(Sink):
+    """
+    Write the readings as comma separated values with the columns `device`, `timestamp` and `value`.
+    """
+
+    def __init__(self, file: BinaryIO, batch_size: int = 1000) -> None:
+        super().__init__(file, batch_size)
+        if file.tell() == 0:
+            file.write(b"device,timestamp,value\n")
+
+    def encode(self, readings: Sequence[Reading]) -> bytes:
+        return "".join(f"{reading.device:d},{reading.timestamp:.6f},{reading.value}\n" for reading in readings).encode(
+            "ascii"
+        )
+
+
+class BinarySink(Sink):
+    """
+    Write the readings as fixed size records. See :data:`BINARY_RECORD` for the format.
+    """
+
+    def encode(self, readings: Sequence[Reading]) -> bytes:
+        return b"".join(
+            BINARY_RECORD.pack(reading.device, reading.timestamp, float(reading.value)) for reading in readings
+        )
+
+
+class LoggerStatistics:
+    """
+    The throughput and the latency of the logger. The latency is the time from taking a reading until it was written
+    to the file.
+    """
+
+    def __init__(self, number_of_devices: int) -> None:
+        self.__readings = [0] * number_of_devices
+        self.__latencies: list[float] = []
+        self.__interval_started = time.monotonic()
+
+    @property
+    def readings(self) -> tuple[int, ...]:
+        """
+        The number of readings written per device in the current interval.
+        """
+        return tuple(self.__readings)
+
+    def add(self, readings: Sequence[Reading]) -> None:
+        """
+        Account for readings, that were written to the file.
+
+        Parameters
+        ----------
+        readings: Sequence of Reading
+            The readings written.
+        """
+        now = time.monotonic()
+        for reading in readings:
+            self.__readings[reading.device] += 1
+            self.__latencies.append(now - reading.received)
+
+    def report(self) -> str:
+        """
+        Summarize the current interval and start a new one.
+
+        Returns
+        -------
+        str
+            A human-readable summary.
+        """
+        now = time.monotonic()
+        duration = max(now - self.__interval_started, 1e-9)
+        rates = ", ".join(f"{count / duration:.1f}" for count in self.__readings)
+        if self.__latencies:
+            latency = (
+                f"latency mean {sum(self.__latencies) / len(self.__latencies) * 1000:.1f} ms, "
+                f"max {max(self.__latencies) * 1000:.1f} ms"
+            )
+        else:
+            latency = "no readings"
+        self.__readings = [0] * len(self.__readings)
+        self.__latencies = []
+        self.__interval_started = now
+        return f"readings/s per device: {rates}; {latency}"
+
+
+async def _acquire(device: int, dmm: HP_3478A, queue: asyncio.Queue[Reading | None], count: int | None) -> None:
+    """Only read from the bus and hand the readings over, so slow file writes do not delay the readout."""
+    number_of_readings = 0
+    async for value in dmm.read_all(nan_on_overload=True, reconnect=True):
+        assert isinstance(value, Decimal)
+        queue.put_nowait(Reading(device=device, timestamp=time.time(), value=value, received=time.monotonic()))
+        number_of_readings += 1
+        if count is not None and number_of_readings >= count:
+            break
+
+
+async def _consume(
+    queue: asyncio.Queue[Reading | None], sink: Sink, statistics: LoggerStatistics, flush_interval: float, celsius: bool
+) -> None:
+    """Write the readings until `None` is received. The sink is flushed, when a batch is full or it is due."""
+    next_flush = time.monotonic() + flush_interval
+    is_done = False
+    while not is_done:
+        try:
+            reading = await asyncio.wait_for(queue.get(), timeout=max(next_flush - time.monotonic(), 0))
+        except asyncio.TimeoutError:
+            pass
+        else:
+            if reading is None:
+                is_done = True
+            else:
+                if celsius:
+                    reading = replace(reading, value=reading.value - ZERO_CELSIUS)
+                sink.append(reading)
+        if is_done or sink.is_full or time.monotonic() >= next_flush:
+            statistics.add(await sink.flush())
+            next_flush = time.monotonic() + flush_interval
+
+
+async def _report(statistics: LoggerStatistics, interval: float) -> None:
+    while "not cancelled":
+        await asyncio.sleep(interval)
+        logging.getLogger(__name__).info(statistics.report())
+
+
+async def log_readings(  # pylint: disable=too-many-arguments
+    dmms: Sequence[HP_3478A],
+    sink: Sink,
+    *,
+    flush_interval: float = 1.0,
+    stats_interval: float = 10.0,
+    count: int | None = None,
+    celsius: bool = False,
+) -> LoggerStatistics:
+    """
+    Record the readings of the DMMs. The DMMs must be connected and configured.
+
+    Parameters
+    ----------
+    dmms: Sequence of HP_3478A
+        The DMMs. The index in the sequence is recorded with each reading.
+    sink: Sink
+        The sink used to write the readings.
+    flush_interval: float, default=1.0
+        The maximum time in seconds readings are buffered.
+    stats_interval: float, default=10.0
+        The time in seconds between two statistics reports, that are logged at level INFO.
+    count: int, optional
+        The number of readings per DMM. Omit to log until cancelled.
+    celsius: bool, default=False
+        Convert temperatures from K to °C. Only use it, if the DMMs return temperatures in K.
+
+    Returns
+    -------
+    LoggerStatistics
+        The statistics of the last interval.
+    """
+    queue: asyncio.Queue[Reading | None] = asyncio.Queue()
+    statistics = LoggerStatistics(len(dmms))
+    consumer = asyncio.create_task(_consume(queue, sink, statistics, flush_interval, celsius))
+    reporter = asyncio.create_task(_report(statistics, stats_interval))
+    try:
+        await asyncio.gather(*(_acquire(device, dmm, queue, count) for device, dmm in enumerate(dmms)))
+        queue.put_nowait(None)
+        await consumer
+    finally:
+        for task in (consumer, reporter):
+            task.cancel()
+        await asyncio.gather(consumer, reporter, return_exceptions=True)
+        sink.close()
+    return statistics
+
+
+def _create_connection(meter: str) -> AsyncGpib | AsyncPrologixGpibController:
+    """
+    Create the GPIB connection from a string like ``prologix:192.168.1.10:27`` or ``linux-gpib:0:27``.
+    """
+    try:
+        adapter, address = meter.split(":", maxsplit=1)
+        host, pad = address.rsplit(":", maxsplit=1)
+        primary_address = int(pad)
+    except ValueError:
+        raise ValueError(f"Invalid meter '{meter}'. Use prologix:HOST:PAD or linux-gpib:BOARD:PAD.") from None
+    if adapter == "prologix":
+        # pylint: disable=import-outside-toplevel,import-error
+        from prologix_gpib_async import AsyncPrologixGpibEthernetController, EosMode
+
+        return AsyncPrologixGpibEthernetController(host, pad=primary_address, timeout=1, eos_mode=EosMode.APPEND_NONE)
+    if adapter == "linux-gpib":
+        # pylint: disable=import-outside-toplevel,import-error
+        from async_gpib import AsyncGpib
+
+        # The board is configured by the SRQ dispatcher. Set the timeout to 1 second (T1s=11)
+        return AsyncGpib(name=int(host), pad=primary_address, timeout=11)
+    raise ValueError(f"Unknown GPIB adapter '{adapter}'. Use prologix or linux-gpib.")
+
+
+def _parse_transform(value: str) -> Transform:
+    """
+    Create a transform from a string like ``linear:scale=10,offset=0.5``.
+    """
+    name, _, parameters = value.partition(":")
+    try:
+        kwargs = {key: float(argument) for key, argument in (item.split("=") for item in parameters.split(",") if item)}
+        return create_transform(name, **kwargs)
+    except (ValueError, TypeError) as exc:
+        raise argparse.ArgumentTypeError(f"Invalid transform '{value}': {exc}") from None
+
+
+def _parse_args(argv: Sequence[str] | None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="hp3478a-logger", description="Record the readings of HP 3478A DMMs.")
+    parser.add_argument(
+        "meters", nargs="+", metavar="METER", help="The DMM address as prologix:HOST:PAD or linux-gpib:BOARD:PAD"
+    )
+    parser.add_argument("-o", "--output", required=True, help="The output file. Readings are appended.")
+    parser.add_argument("--format", choices=("csv", "binary"), default="csv", help="The file format")
+    parser.add_argument(
+        "--function", choices=[function.name for function in FunctionType], default=FunctionType.DCV.name
+    )
+    parser.add_argument("--range", choices=[value.name for value in Range], default=Range.RANGE_AUTO.name)
+    parser.add_argument("--digits", type=int, choices=(4, 5, 6), default=6, help="The number of digits")
+    parser.add_argument("--no-autozero", action="store_true", help="Disable autozero")
+    parser.add_argument(
+        "--ntc",
+        nargs=5,
+        type=float,
+        metavar=("A", "B", "C", "D", "RT25"),
+        help="The Steinhart-Hart coefficients of the thermistor used with the NTC and NTCF functions",
+    )
+    parser.add_argument(
+        "--transform",
+        action="append",
+        type=_parse_transform,
+        default=[],
+        metavar="NAME[:KEY=VALUE,...]",
+        help="Apply a transform to the readings, e.g. rtd:r0=1000 or linear:scale=10. Can be given multiple times.",
+    )
+    parser.add_argument(
+        "--celsius",
+        action="store_true",
+        help="Record temperatures in °C instead of K. Requires the NTC or NTCF function or the rtd transform.",
+    )
+    parser.add_argument("--batch-size", type=int, default=1000, help="The number of readings written at once")
+    parser.add_argument("--flush-interval", type=float, default=1.0, help="The maximum time readings are buffered")
+    parser.add_argument("--stats-interval", type=float, default=10.0, help="The time between statistics reports")
+    parser.add_argument("--count", type=int, help="Stop after COUNT readings per DMM")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Enable debug output")
+    args = parser.parse_args(argv)
+    if FunctionType[args.function] in (FunctionType.NTC, FunctionType.NTCF) and args.ntc is None:
+        parser.error(f"--ntc is required with --function {args.function}")
+    # Only the thermistor functions and the temperature transforms return K
+    returns_kelvin = FunctionType[args.function] in (FunctionType.NTC, FunctionType.NTCF) or any(
+        isinstance(transform, (NtcTransform, RtdTransform)) for transform in args.transform
+    )
+    if args.celsius and not returns_kelvin:
+        parser.error("--celsius requires a temperature in K, i.e. --function NTC or NTCF or --transform rtd")
+    return args
+
+
+async def _configure(dmm: HP_3478A, args: argparse.Namespace) -> None:
+    await dmm.clear()  # flush all buffers
+    if args.ntc is not None:
+        dmm.set_ntc_parameters(*args.ntc)
+    dmm.set_transforms(*args.transform)
+    await asyncio.gather(
+        dmm.set_function(FunctionType[args.function]),
+        dmm.set_range(Range[args.range]),
+        dmm.set_trigger(TriggerType.INTERNAL),
+        dmm.set_autozero(not args.no_autozero),
+        dmm.set_number_of_digits(args.digits),
+    )
+
+
+async def _register_srq_dispatchers(dmms: Sequence[HP_3478A], meters: Sequence[str], stack: AsyncExitStack) -> None:
+    """
+    Wait for the SRQs of all linux-gpib meters on a board using a single dispatcher per board.
+    """
+    dispatchers: dict[int, SrqDispatcher] = {}
+    for dmm, meter in zip(dmms, meters):
+        if not meter.startswith("linux-gpib:"):
+            continue
+        _, board, pad = meter.split(":")
+        if int(board) not in dispatchers:
+            dispatchers[int(board)] = await stack.enter_async_context(SrqDispatcher(int(board)))
+        dispatchers[int(board)].register(dmm, int(pad))
+
+
+async def _run(args: argparse.Namespace) -> None:
+    dmms = [HP_3478A(connection=_create_connection(meter)) for meter in args.meters]
+    with open(args.output, "ab") as file:
+        sink = CsvSink(file, args.batch_size) if args.format == "csv" else BinarySink(file, args.batch_size)
+        async with AsyncExitStack() as stack:
+            await _register_srq_dispatchers(dmms, args.meters, stack)
+            for dmm in dmms:
+                await stack.enter_async_context(dmm)
+            await asyncio.gather(*(_configure(dmm, args) for dmm in dmms))
+            await log_readings(
+                dmms,
+                sink,
+                flush_interval=args.flush_interval,
+                stats_interval=args.stats_interval,
+                count=args.count,
+                celsius=args.celsius,
+            )
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """
+    The entry point of the ``hp3478a-logger`` command.
+
+    Parameters
+    ----------
+    argv: Sequence of str, optional
+        The command line arguments. Omit to use :data:`sys.argv`.
+
+    Returns
+    -------
+    int
+        The exit code
+    """
+    args = _parse_args(argv)
+    logging.basicConfig(
+        format="%(asctime)s.%(msecs)03d %(levelname)-8s %(message)s",
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    try:
+        asyncio.run(_run(args))
+    except KeyboardInterrupt:
+        pass
+    except (ConnectionError, OSError, ValueError, ImportError) as exc:
+        logging.getLogger(__name__).error("%s", exc)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
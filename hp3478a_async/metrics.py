@@ -0,0 +1,400 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Copyright (C) 2021 Patrick Baus
+# This file is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+"""
+Collect performance metrics of the DMMs and export them in the Prometheus text format via HTTP or to a file.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from types import TracebackType
+from typing import TYPE_CHECKING, Callable, Iterable
+
+try:
+    from typing import Self  # type: ignore # Python 3.11
+except ImportError:
+    from typing_extensions import Self
+
+if TYPE_CHECKING:
+    from hp3478a_async.hp_3478a import HP_3478A
+
+QUANTILES = (0.5, 0.9, 0.99)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Summary:
+    """The count and sum of all observations and the most recent observations used to calculate the quantiles."""
+
+    def __init__(self, window: int) -> None:
+        """
+        Parameters
+        ----------
+        window: int
+            The number of recent observations kept.
+        """
+        self.count = 0
+        self.sum = 0.0
+        self.recent: deque[float] = deque(maxlen=window)
+
+    def observe(self, value: float) -> None:
+        """
+        Add an observation.
+
+        Parameters
+        ----------
+        value: float
+            The observed value.
+        """
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+
+    def quantiles(self) -> list[tuple[float, float]]:
+        """
+        Returns
+        -------
+        list of tuple of float
+            The quantiles and their values calculated from the recent observations.
+        """
+        values = sorted(self.recent)
+        if not values:
+            return []
+        return [(quantile, values[min(int(quantile * len(values)), len(values) - 1)]) for quantile in QUANTILES]
+
+
+class InstrumentMetrics:
+    """
+    The metrics of a single DMM. The DMM records the bus transactions using :func:`HP_3478A.set_metrics()
+    <hp3478a_async.HP_3478A.set_metrics>`.
+    """
+
+    def __init__(self, window: int = 1000, rate_interval: float = 10.0) -> None:
+        """
+        Parameters
+        ----------
+        window: int, default=1000
+            The number of recent observations used to calculate the latency quantiles.
+        rate_interval: float, default=10.0
+            The time in seconds over which the reading rate is averaged.
+        """
+        self.__window = window
+        self.__rate_interval = rate_interval
+        self.__latencies: dict[str, Summary] = {}
+        self.__srq_wait = Summary(window)
+        self.__readings = 0
+        self.__reading_times: deque[float] = deque()
+
+    @property
+    def readings(self) -> int:
+        """
+        The number of readings taken.
+        """
+        return self.__readings
+
+    @property
+    def reading_rate(self) -> float:
+        """
+        The number of readings per second averaged over the rate interval.
+        """
+        self.__expire_readings(time.monotonic())
+        return len(self.__reading_times) / self.__rate_interval
+
+    @property
+    def commands(self) -> tuple[str, ...]:
+        """
+        The commands, that were recorded.
+        """
+        return tuple(self.__latencies)
+
+    def __expire_readings(self, now: float) -> None:
+        while self.__reading_times and self.__reading_times[0] < now - self.__rate_interval:
+            self.__reading_times.popleft()
+
+    def record_latency(self, command: str, duration: float) -> None:
+        """
+        Record the time the bus transaction of a command took.
+
+        Parameters
+        ----------
+        command: str
+            The command, e.g. the program code of a query.
+        duration: float
+            The duration in seconds.
+        """
+        summary = self.__latencies.get(command)
+        if summary is None:
+            summary = self.__latencies[command] = Summary(self.__window)
+        summary.observe(duration)
+
+    def record_srq_wait(self, duration: float) -> None:
+        """
+        Record the time spent waiting for a service request.
+
+        Parameters
+        ----------
+        duration: float
+            The duration in seconds.
+        """
+        self.__srq_wait.observe(duration)
+
+    def record_reading(self) -> None:
+        """
+        Count a reading.
+        """
+        now = time.monotonic()
+        self.__readings += 1
+        self.__reading_times.append(now)
+        self.__expire_readings(now)
+
+    def latency_quantiles(self, command: str) -> list[tuple[float, float]]:
+        """
+        Parameters
+        ----------
+        command: str
+            The command.
+
+        Returns
+        -------
+        list of tuple of float
+            The quantiles and the latency in seconds of the recent transactions of the command.
+        """
+        summary = self.__latencies.get(command)
+        return [] if summary is None else summary.quantiles()
+
+    def summaries(self) -> Iterable[tuple[str, dict[str, str], Summary]]:
+        """
+        Returns
+        -------
+        Iterable of tuple
+            The name, the labels and the summary of all summaries.
+        """
+        for command, summary in self.__latencies.items():
+            yield "hp3478a_command_latency_seconds", {"command": command}, summary
+        yield "hp3478a_srq_wait_seconds", {}, self.__srq_wait
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = {
+        key: value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for key, value in labels.items()
+    }
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped.items()) + "}"
+
+
+def _format_summary(metric: str, labels: dict[str, str], summary: Summary) -> list[str]:
+    lines = [
+        f"{metric}{_format_labels({**labels, 'quantile': str(quantile)})} {value}"
+        for quantile, value in summary.quantiles()
+    ]
+    lines.append(f"{metric}_sum{_format_labels(labels)} {summary.sum}")
+    lines.append(f"{metric}_count{_format_labels(labels)} {summary.count}")
+    return lines
+
+
+class MetricsExporter:
+    """
+    Export the metrics of many DMMs in the Prometheus text format. The metrics are served using a minimal HTTP server
+    and/or written to a file periodically, e.g. for the textfile collector of the node exporter.
+    """
+
+    def __init__(self) -> None:
+        self.__instruments: dict[str, tuple[HP_3478A, InstrumentMetrics, Callable[[], int] | None]] = {}
+        self.__server: asyncio.Server | None = None
+        self.__file_task: asyncio.Task | None = None
+        self.__logger = logging.getLogger(__name__)
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(
+        self, exc_type: type[BaseException] | None, exc: BaseException | None, traceback: TracebackType | None
+    ) -> None:
+        await self.stop()
+
+    def add_instrument(
+        self, dmm: HP_3478A, name: str | None = None, dropped_samples: Callable[[], int] | None = None
+    ) -> InstrumentMetrics:
+        """
+        Start recording the metrics of a DMM.
+
+        Parameters
+        ----------
+        dmm: HP_3478A
+            The DMM
+        name: str, optional
+            The value of the `instrument` label. Omit to use the description of the connection.
+        dropped_samples: Callable, optional
+            A function returning the number of dropped samples, e.g. ``lambda: queue.dropped_samples`` of an
+            :class:`AcquisitionQueue <hp3478a_async.acquisition.AcquisitionQueue>`.
+
+        Returns
+        -------
+        InstrumentMetrics
+            The metrics recorded by the DMM.
+        """
+        metrics = InstrumentMetrics()
+        dmm.set_metrics(metrics)
+        self.__instruments[str(dmm.connection) if name is None else name] = (dmm, metrics, dropped_samples)
+        return metrics
+
+    def remove_instrument(self, name: str) -> None:
+        """
+        Stop recording the metrics of a DMM.
+
+        Parameters
+        ----------
+        name: str
+            The name of the instrument.
+        """
+        dmm, _, _ = self.__instruments.pop(name)
+        dmm.set_metrics(None)
+
+    def render(self) -> str:
+        """
+        Returns
+        -------
+        str
+            The metrics of all DMMs in the Prometheus text format.
+        """
+        samples: dict[tuple[str, str], list[str]] = {
+            ("hp3478a_readings_total", "counter"): [],
+            ("hp3478a_overloads_total", "counter"): [],
+            ("hp3478a_reconnects_total", "counter"): [],
+            ("hp3478a_dropped_samples_total", "counter"): [],
+            ("hp3478a_reading_rate", "gauge"): [],
+            ("hp3478a_command_latency_seconds", "summary"): [],
+            ("hp3478a_srq_wait_seconds", "summary"): [],
+        }
+        for name, (dmm, metrics, dropped_samples) in self.__instruments.items():
+            labels = _format_labels({"instrument": name})
+            samples["hp3478a_readings_total", "counter"].append(f"hp3478a_readings_total{labels} {metrics.readings}")
+            samples["hp3478a_overloads_total", "counter"].append(
+                f"hp3478a_overloads_total{labels} {dmm.overload_count}"
+            )
+            samples["hp3478a_reconnects_total", "counter"].append(
+                f"hp3478a_reconnects_total{labels} {dmm.reconnect_count}"
+            )
+            if dropped_samples is not None:
+                samples["hp3478a_dropped_samples_total", "counter"].append(
+                    f"hp3478a_dropped_samples_total{labels} {dropped_samples()}"
+                )
+            samples["hp3478a_reading_rate", "gauge"].append(f"hp3478a_reading_rate{labels} {metrics.reading_rate}")
+            for metric, summary_labels, summary in metrics.summaries():
+                samples[metric, "summary"].extend(
+                    _format_summary(metric, {"instrument": name, **summary_labels}, summary)
+                )
+
+        lines = []
+        for (metric, metric_type), metric_samples in samples.items():
+            if metric_samples:
+                lines.append(f"# TYPE {metric} {metric_type}")
+                lines.extend(metric_samples)
+        return "\n".join(lines) + "\n"
+
+    async def __handle_request(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()).strip():
+                pass  # Skip the headers
+            parts = request_line.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] in ("/", "/metrics"):
+                status, body = "200 OK", self.render().encode("utf-8")
+            else:
+                status, body = "404 Not Found", b"Not Found\n"
+            writer.write(
+                f"HTTP/1.0 {status}\r\nContent-Type: {CONTENT_TYPE}\r\nContent-Length: {len(body)}\r\n"
+                f"Connection: close\r\n\r\n".encode("latin-1") + body
+            )
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start_server(self, host: str = "127.0.0.1", port: int = 9478) -> int:
+        """
+        Serve the metrics via HTTP at ``/metrics``.
+
+        Parameters
+        ----------
+        host: str, default="127.0.0.1"
+            The address to listen on. The default only accepts local connections.
+        port: int, default=9478
+            The port to listen on. Use 0 to select a free port.
+
+        Returns
+        -------
+        int
+            The port the server is listening on.
+        """
+        if self.__server is None:
+            self.__server = await asyncio.start_server(self.__handle_request, host, port)
+        return self.__server.sockets[0].getsockname()[1]
+
+    def write_file(self, path: str) -> None:
+        """
+        Write the metrics to a file. The file is replaced atomically, so readers never see a partial file.
+
+        Parameters
+        ----------
+        path: str
+            The file name.
+        """
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            file.write(self.render())
+        os.replace(temporary_path, path)
+
+    async def __write_periodically(self, path: str, interval: float) -> None:
+        while "not cancelled":
+            try:
+                self.write_file(path)
+            except OSError as exc:
+                self.__logger.warning("Cannot write the metrics to '%s': %s", path, exc)
+            await asyncio.sleep(interval)
+
+    def start_file_export(self, path: str, interval: float = 10.0) -> None:
+        """
+        Write the metrics to a file periodically.
+
+        Parameters
+        ----------
+        path: str
+            The file name.
+        interval: float, default=10.0
+            The time in seconds between updates.
+        """
+        if self.__file_task is None:
+            self.__file_task = asyncio.create_task(self.__write_periodically(path, interval))
+
+    async def stop(self) -> None:
+        """
+        Stop the HTTP server and the file export.
+        """
+        server, self.__server = self.__server, None
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+        task, self.__file_task = self.__file_task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
@@ -0,0 +1,165 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Copyright (C) 2021 Patrick Baus
+# This file is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+"""
+Run the post-processing of readings in an executor, so the event loop only does the bus I/O.
+"""
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import Executor
+from decimal import Decimal
+from typing import TYPE_CHECKING, Any, AsyncGenerator, Callable, Sequence
+
+if TYPE_CHECKING:
+    from hp3478a_async.hp_3478a import HP_3478A
+
+
+def _process_batch(
+    functions: Sequence[Callable[[Decimal], Any]], batch: Sequence[Decimal | bytes]
+) -> list[Decimal | bytes | Any]:
+    """Apply the functions to the numerical readings. Overloads (NaN) and raw bytes are passed through."""
+    results = []
+    for value in batch:
+        if isinstance(value, Decimal) and not value.is_nan():
+            for function in functions:
+                value = function(value)
+        results.append(value)
+    return results
+
+
+class OffloadedReader:  # pylint: disable=too-few-public-methods
+    """
+    Read from the DMM and post-process the readings in batches using a thread or process pool. The readings are
+    returned in order. The post-processing of special functions like :attr:`FunctionType.NTC
+    <hp3478a_async.enums.FunctionType.NTC>` and an optional user function are applied in the executor.
+    """
+
+    def __init__(
+        self,
+        dmm: HP_3478A,
+        function: Callable[[Decimal], Any] | None = None,
+        executor: Executor | None = None,
+        batch_size: int = 100,
+        max_delay: float = 0.1,
+    ) -> None:
+        """
+        Create a reader. When using a process pool, `function` must be picklable, i.e. a module level function or a
+        :func:`functools.partial` of it.
+
+        Parameters
+        ----------
+        dmm: HP_3478A
+            The DMM. It must be configured.
+        function: Callable, optional
+            A function applied to each reading after the post-processing of the DMM.
+        executor: Executor, optional
+            The executor used. Omit to use the default executor of the event loop.
+        batch_size: int, default=100
+            The maximum number of readings processed in one batch.
+        max_delay: float, default=0.1
+            The maximum time in seconds a reading waits for its batch to fill up.
+        """
+        if batch_size < 1:
+            raise ValueError("The batch size must be at least 1.")
+        self.__dmm = dmm
+        self.__function = function
+        self.__executor = executor
+        self.__batch_size = batch_size
+        self.__max_delay = max_delay
+
+    def __functions(self) -> list[Callable[[Decimal], Any]]:
+        functions = []
+        if self.__dmm.post_processor is not None:
+            functions.append(self.__dmm.post_processor)
+        if self.__function is not None:
+            functions.append(self.__function)
+        return functions
+
+    async def __acquire(self, batches: asyncio.Queue[asyncio.Future | None], **kwargs: Any) -> None:
+        """
+        Read from the DMM and submit the batches to the executor. The post-processing is captured when a batch is
+        started, so configuration changes take effect with the next batch.
+        """
+        loop = asyncio.get_running_loop()
+        batch: list[Decimal | bytes] = []
+        functions: list[Callable[[Decimal], Any]] = []
+        timer: asyncio.TimerHandle | None = None
+
+        def submit() -> None:
+            nonlocal batch, timer
+            if timer is not None:
+                timer.cancel()
+                timer = None
+            if batch:
+                batches.put_nowait(loop.run_in_executor(self.__executor, _process_batch, functions, batch))
+                batch = []
+
+        try:
+            async for value in self.__dmm.read_all(post_process=False, **kwargs):
+                if not batch:
+                    functions = self.__functions()
+                    timer = loop.call_later(self.__max_delay, submit)
+                batch.append(value)
+                if len(batch) >= self.__batch_size:
+                    submit()
+        except asyncio.CancelledError:
+            # The reader was closed, so nobody will wait for the partial batch
+            if timer is not None:
+                timer.cancel()
+            raise
+        except BaseException:
+            # The readings taken before the failure are returned, before the error is raised
+            submit()
+            raise
+        else:
+            submit()
+        finally:
+            batches.put_nowait(None)
+
+    async def read_all(self, **kwargs: Any) -> AsyncGenerator[Decimal | bytes | Any]:
+        """
+        Read all values from the device and return the post-processed readings.
+
+        Parameters
+        ----------
+        **kwargs:
+            Additional parameters passed to :func:`HP_3478A.read_all() <hp3478a_async.HP_3478A.read_all>`.
+
+        Returns
+        -------
+        Iterator[Decimal or bytes or Any]
+            The post-processed readings in the order they were taken.
+        """
+        batches: asyncio.Queue[asyncio.Future | None] = asyncio.Queue()
+        acquisition = asyncio.create_task(self.__acquire(batches, **kwargs))
+        try:
+            while "not done":
+                batch = await batches.get()
+                if batch is None:
+                    break
+                for result in await batch:
+                    yield result
+            await acquisition  # Raise the errors of the acquisition
+        finally:
+            acquisition.cancel()
+            await asyncio.gather(acquisition, return_exceptions=True)
+            # Cancel the batches, that were not returned, so they are not processed, if they have not started yet
+            while not batches.empty():
+                pending = batches.get_nowait()
+                if pending is not None:
+                    pending.cancel()
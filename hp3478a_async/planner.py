@@ -0,0 +1,264 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Copyright (C) 2021 Patrick Baus
+# This file is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+"""
+A planner, that selects the measurement settings for a target reading rate or resolution.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass
+from enum import Enum
+from typing import TYPE_CHECKING
+
+from hp3478a_async.enums import TriggerType
+from hp3478a_async.flags import StatusFlags
+
+if TYPE_CHECKING:
+    from hp3478a_async.hp_3478a import HP_3478A
+
+# The integration time in power line cycles (PLC) for each number of digits. See page 15 of the manual for details.
+INTEGRATION_TIME_PLC = {4: 0.1, 5: 1, 6: 10}
+# The time required to process and output a reading in addition to the integration time. This is a rough estimate,
+# use MeasurementPlanner.measure_conversion_times() to determine it for a certain setup.
+DEFAULT_OVERHEAD = 0.01
+# Below this conversion time, polling the SRQ costs more than letting the DMM hold off the bus
+BLOCKING_READ_THRESHOLD = 0.05
+
+
+class WaitStrategy(Enum):
+    """
+    How to wait for the end of a conversion. See :func:`HP_3478A.read_all() <hp3478a_async.HP_3478A.read_all>`.
+    """
+
+    SRQ = 1
+    BLOCKING_READ = 2
+
+
+@dataclass(frozen=True)
+class MeasurementPlan:
+    """The settings chosen by the planner and the resulting performance."""
+
+    ndigits: int
+    autozero: bool
+    trigger: TriggerType
+    wait_strategy: WaitStrategy
+    readings_per_second: float
+    resolution: float  # The resolution relative to the full scale value
+
+
+def resolution(ndigits: int) -> float:
+    """
+    Return the resolution of a reading relative to the full scale value. A full scale reading has 300000 counts at
+    5.5 digits.
+
+    Parameters
+    ----------
+    ndigits: {4, 5, 6}
+        The number of digits as used by :func:`HP_3478A.set_number_of_digits()
+        <hp3478a_async.HP_3478A.set_number_of_digits>`.
+
+    Returns
+    -------
+    float
+        The resolution
+    """
+    return 1 / (3 * 10 ** (ndigits - 1))
+
+
+class MeasurementPlanner:
+    """
+    Select the number of digits, autozero and the wait strategy to meet a target reading rate or resolution. The
+    conversion times are calculated from the line frequency or can be measured using
+    :func:`measure_conversion_times`.
+    """
+
+    def __init__(self, line_frequency: float = 50.0, overhead: float = DEFAULT_OVERHEAD) -> None:
+        """
+        Create a planner.
+
+        Parameters
+        ----------
+        line_frequency: float, default=50.0
+            The line frequency in Hz.
+        overhead: float, default=0.01
+            The time in seconds required by the DMM to process a reading in addition to the integration time.
+        """
+        self.__line_frequency = line_frequency
+        self.__overhead = overhead
+        self.__measured_conversion_times: dict[tuple[int, bool], float] = {}
+
+    @classmethod
+    async def from_dmm(cls, dmm: HP_3478A) -> MeasurementPlanner:
+        """
+        Create a planner using the line frequency reported by the DMM.
+
+        Parameters
+        ----------
+        dmm: HP_3478A
+            The DMM
+
+        Returns
+        -------
+        MeasurementPlanner
+            The planner for the DMM.
+        """
+        status = await dmm.get_status()
+        return cls(line_frequency=50.0 if StatusFlags.LINE_FREQUENCY_50_HZ in status.status else 60.0)
+
+    @property
+    def line_frequency(self) -> float:
+        """
+        The line frequency in Hz.
+        """
+        return self.__line_frequency
+
+    def conversion_time(self, ndigits: int, autozero: bool) -> float:
+        """
+        Return the conversion time. If it was measured, the measured value is returned, else it is calculated from the
+        integration time. Autozero doubles the integration time, because the zero is measured for every reading.
+
+        Parameters
+        ----------
+        ndigits: {4, 5, 6}
+            The number of digits
+        autozero: bool
+            `True` if autozero is enabled.
+
+        Returns
+        -------
+        float
+            The time in seconds per reading.
+        """
+        try:
+            return self.__measured_conversion_times[(ndigits, autozero)]
+        except KeyError:
+            integration_time = INTEGRATION_TIME_PLC[ndigits] / self.__line_frequency
+            return integration_time * (2 if autozero else 1) + self.__overhead
+
+    async def measure_conversion_times(self, dmm: HP_3478A, number_of_samples: int = 5) -> None:
+        """
+        Measure the conversion time of each setting using the internal trigger. The configuration of the DMM is
+        changed by this function.
+
+        Parameters
+        ----------
+        dmm: HP_3478A
+            The DMM. The function and range must be set.
+        number_of_samples: int, default=5
+            The number of intervals measured per setting.
+        """
+        await dmm.set_trigger(TriggerType.INTERNAL)
+        for ndigits in INTEGRATION_TIME_PLC:
+            for autozero in (False, True):
+                await asyncio.gather(dmm.set_number_of_digits(ndigits), dmm.set_autozero(autozero))
+                timestamps = []
+                readings = dmm.read_all(nan_on_overload=True)
+                try:
+                    # The first reading was started before the configuration was changed
+                    async for _ in readings:
+                        timestamps.append(time.monotonic())
+                        if len(timestamps) > number_of_samples + 1:
+                            break
+                finally:
+                    await readings.aclose()
+                conversion_time = (timestamps[-1] - timestamps[1]) / number_of_samples
+                self.__measured_conversion_times[(ndigits, autozero)] = conversion_time
+
+    def candidates(self) -> list[MeasurementPlan]:
+        """
+        Return all possible settings.
+
+        Returns
+        -------
+        list of MeasurementPlan
+            The settings sorted from the finest to the coarsest resolution.
+        """
+        plans = []
+        for ndigits in sorted(INTEGRATION_TIME_PLC, reverse=True):
+            for autozero in (True, False):
+                conversion_time = self.conversion_time(ndigits, autozero)
+                plans.append(
+                    MeasurementPlan(
+                        ndigits=ndigits,
+                        autozero=autozero,
+                        trigger=TriggerType.INTERNAL,
+                        wait_strategy=(
+                            WaitStrategy.BLOCKING_READ
+                            if conversion_time < BLOCKING_READ_THRESHOLD
+                            else WaitStrategy.SRQ
+                        ),
+                        readings_per_second=1 / conversion_time,
+                        resolution=resolution(ndigits),
+                    )
+                )
+        return plans
+
+    def plan(self, target_rate: float | None = None, noise_floor: float | None = None) -> MeasurementPlan:
+        """
+        Select the settings. If a target rate is given, the finest resolution reaching that rate is chosen, preferring
+        autozero, if it can be afforded. If only a noise floor is given, the fastest setting with a resolution at or
+        below the noise floor is chosen.
+
+        Parameters
+        ----------
+        target_rate: float, optional
+            The minimum number of readings per second.
+        noise_floor: float, optional
+            The maximum resolution relative to the full scale value, e.g. `1e-5`.
+
+        Returns
+        -------
+        MeasurementPlan
+            The settings and the expected reading rate.
+
+        Raises
+        ------
+        ValueError
+            If no setting meets the targets.
+        """
+        plans = [
+            plan
+            for plan in self.candidates()
+            if (target_rate is None or plan.readings_per_second >= target_rate)
+            and (noise_floor is None or plan.resolution <= noise_floor)
+        ]
+        if not plans:
+            raise ValueError(f"No setting reaches {target_rate} readings/s with a resolution of {noise_floor}.")
+        if target_rate is None:
+            return max(plans, key=lambda plan: plan.readings_per_second)
+        return plans[0]
+
+    @staticmethod
+    async def apply(dmm: HP_3478A, plan: MeasurementPlan) -> None:
+        """
+        Configure the DMM. Pass ``wait_for_srq=plan.wait_strategy is WaitStrategy.SRQ`` to
+        :func:`HP_3478A.read_all() <hp3478a_async.HP_3478A.read_all>`.
+
+        Parameters
+        ----------
+        dmm: HP_3478A
+            The DMM
+        plan: MeasurementPlan
+            The settings to apply.
+        """
+        await asyncio.gather(
+            dmm.set_number_of_digits(plan.ndigits),
+            dmm.set_autozero(plan.autozero),
+            dmm.set_trigger(plan.trigger),
+        )
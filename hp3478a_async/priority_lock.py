@@ -0,0 +1,120 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Copyright (C) 2021 Patrick Baus
+# This file is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+"""
+A lock used to schedule the bus transactions of the instrument by priority.
+"""
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import AsyncIterator
+
+
+class Priority(IntEnum):
+    """
+    The priority of a bus transaction. Lower values are scheduled first.
+    """
+
+    URGENT = 0  # Reading out a finished conversion
+    HIGH = 1  # Status requests and control commands
+    NORMAL = 2  # Configuration
+    LOW = 3  # Bulk transfers like the calibration memory and display updates
+
+
+class PriorityLock:
+    """
+    An asyncio lock, that is handed to the waiter with the highest priority on release. Waiters of the same priority
+    are served first come, first served.
+    """
+
+    def __init__(self) -> None:
+        self.__is_locked = False
+        self.__waiters: list[tuple[int, int, asyncio.Future[None]]] = []
+        self.__counter = itertools.count()
+
+    def locked(self) -> bool:
+        """
+        Returns
+        -------
+        bool
+            `True` if the lock is held.
+        """
+        return self.__is_locked
+
+    async def acquire(self, priority: Priority = Priority.NORMAL) -> None:
+        """
+        Acquire the lock. If the lock is held, wait until it is handed over to this task.
+
+        Parameters
+        ----------
+        priority: Priority
+            The priority of the waiter.
+        """
+        if not self.__is_locked:
+            # If the lock is free, there are no waiters, because the lock is handed over directly on release
+            self.__is_locked = True
+            return
+
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.__waiters, (priority, next(self.__counter), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The lock was handed over to us, but we were cancelled before we could take it, so pass it on
+                self.release()
+            # Cancelled futures are removed lazily by release()
+            raise
+
+    def release(self) -> None:
+        """
+        Release the lock and hand it over to the waiter with the highest priority.
+
+        Raises
+        ------
+        RuntimeError
+            If the lock is not held.
+        """
+        if not self.__is_locked:
+            raise RuntimeError("Lock is not acquired.")
+        while self.__waiters:
+            _, _, future = heapq.heappop(self.__waiters)
+            if not future.done():
+                # Transfer the ownership, the lock stays locked
+                future.set_result(None)
+                return
+        self.__is_locked = False
+
+    @asynccontextmanager
+    async def __call__(self, priority: Priority = Priority.NORMAL) -> AsyncIterator[None]:
+        """
+        Acquire the lock with the given priority as a context manager.
+
+        Parameters
+        ----------
+        priority: Priority
+            The priority of the waiter.
+        """
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
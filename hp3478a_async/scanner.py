@@ -0,0 +1,186 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Copyright (C) 2021 Patrick Baus
+# This file is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+"""
+A scan engine for external multiplexers in front of the DMM.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import TYPE_CHECKING, AsyncGenerator, Awaitable, Callable, Hashable, Iterable
+
+from hp3478a_async.enums import FunctionType, Range, TriggerType
+from hp3478a_async.flags import SrqMask
+
+if TYPE_CHECKING:
+    from hp3478a_async.hp_3478a import HP_3478A
+
+
+@dataclass(frozen=True)
+class ScanChannel:
+    """A channel of the multiplexer and the DMM settings used to measure it."""
+
+    channel: Hashable
+    function: FunctionType
+    range: Range
+    ndigits: int
+    settle_time: float = 0.0  # The time in seconds to wait after switching, before triggering the DMM
+
+
+@dataclass(frozen=True)
+class ScanResult:
+    """The reading of a channel."""
+
+    channel: Hashable
+    value: Decimal
+    timestamp: float  # The end of the conversion as returned by time.time()
+
+
+class Scanner:
+    """
+    Scan a list of channels using an external multiplexer. The relays of the next channel are switched, while the
+    result of the current channel is read out and the DMM is configured for the next channel. Channels with the same
+    settings are grouped to minimize the number of configuration changes.
+    """
+
+    def __init__(
+        self,
+        dmm: HP_3478A,
+        channels: Iterable[ScanChannel],
+        switch: Callable[[ScanChannel], Awaitable[None]],
+        group_channels: bool = True,
+    ) -> None:
+        """
+        Create a scanner.
+
+        Parameters
+        ----------
+        dmm: HP_3478A
+            The DMM connected to the multiplexer.
+        channels: Iterable of ScanChannel
+            The channels to scan.
+        switch: Callable
+            A coroutine function, that connects the channel given to the DMM. It is called while the result of the
+            previous channel is read, so it must not access the DMM.
+        group_channels: bool, default=True
+            Sort the channels by function, range and number of digits to minimize configuration changes. If `False`,
+            the channels are scanned in the order given.
+        """
+        self.__dmm = dmm
+        self.__channels = tuple(channels)
+        if group_channels:
+            # Sorting is stable, so the order of channels with the same settings is retained
+            self.__channels = tuple(
+                sorted(
+                    self.__channels,
+                    key=lambda channel: (channel.function.value, str(channel.range.value), channel.ndigits),
+                )
+            )
+        self.__switch = switch
+
+    @property
+    def channels(self) -> tuple[ScanChannel, ...]:
+        """
+        The channels in the order they are scanned.
+        """
+        return self.__channels
+
+    async def __configure(self, channel: ScanChannel) -> None:
+        """
+        Change only the settings, that differ from the current configuration. The setters are issued concurrently, so
+        they are sent as a single command.
+        """
+        configuration = self.__dmm.configuration
+        commands = []
+        if configuration.function is not channel.function:
+            commands.append(self.__dmm.set_function(channel.function))
+        if configuration.range is not channel.range:
+            commands.append(self.__dmm.set_range(channel.range))
+        if configuration.ndigits != channel.ndigits:
+            commands.append(self.__dmm.set_number_of_digits(channel.ndigits))
+        if commands:
+            await asyncio.gather(*commands)
+
+    async def __switch_channel(self, channel: ScanChannel) -> float:
+        await self.__switch(channel)
+        return time.monotonic()
+
+    async def scan(self) -> list[ScanResult]:
+        """
+        Scan all channels once.
+
+        Returns
+        -------
+        list of ScanResult
+            The results in the order the channels were scanned. Overloaded inputs are returned as ``Decimal("NaN")``.
+        """
+        if not self.__channels:
+            return []
+        results = []
+        await self.__dmm.set_srq_mask(SrqMask.DATA_READY)
+        await self.__configure(self.__channels[0])
+        switched_at = await self.__switch_channel(self.__channels[0])
+        for index, channel in enumerate(self.__channels):
+            remaining_settle_time = channel.settle_time - (time.monotonic() - switched_at)
+            if remaining_settle_time > 0:
+                await asyncio.sleep(remaining_settle_time)
+            await self.__dmm.set_trigger(TriggerType.SINGLE)  # Trigger a single conversion
+            await self.__dmm.wait_for_data_ready()
+            timestamp = time.time()
+
+            # The conversion is done, so the input can be switched, while we read out the result and configure the DMM
+            next_channel = self.__channels[index + 1] if index + 1 < len(self.__channels) else None
+            switch_task = asyncio.create_task(self.__switch_channel(next_channel)) if next_channel is not None else None
+            try:
+                try:
+                    value = await self.__dmm.read()
+                except OverflowError:
+                    value = Decimal("NaN")
+                assert isinstance(value, Decimal)
+                results.append(ScanResult(channel=channel.channel, value=value, timestamp=timestamp))
+                if next_channel is not None:
+                    await self.__configure(next_channel)
+            except BaseException:
+                if switch_task is not None:
+                    switch_task.cancel()
+                    await asyncio.gather(switch_task, return_exceptions=True)
+                raise
+            if switch_task is not None:
+                switched_at = await switch_task
+        return results
+
+    async def scan_all(self, passes: int | None = None) -> AsyncGenerator[list[ScanResult]]:
+        """
+        Scan all channels repeatedly.
+
+        Parameters
+        ----------
+        passes: int, optional
+            The number of scans. Omit to scan until cancelled.
+
+        Returns
+        -------
+        Iterator[list of ScanResult]
+            The results of each scan.
+        """
+        count = 0
+        while passes is None or count < passes:
+            yield await self.scan()
+            count += 1
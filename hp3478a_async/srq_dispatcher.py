@@ -0,0 +1,301 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Copyright (C) 2021 Patrick Baus
+# This file is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+"""
+Wait for the service requests of all devices on a linux-gpib board using a single thread.
+"""
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from types import TracebackType
+from typing import TYPE_CHECKING, Any
+
+try:
+    from typing import Self  # type: ignore # Python 3.11
+except ImportError:
+    from typing_extensions import Self
+
+from hp3478a_async.flags import SerialPollFlags
+from hp3478a_async.priority_lock import Priority
+
+if TYPE_CHECKING:
+    from hp3478a_async.hp_3478a import HP_3478A
+
+# The status bits of ibsta and the board configuration options, see the linux-gpib documentation
+TIMO = 1 << 14
+SRQI = 1 << 12
+IBC_AUTOPOLL = 0x7
+T1S = 11
+# The delay in seconds before waiting again, if the SRQ line is asserted by a device, that is not registered
+UNKNOWN_SRQ_DELAY = 0.1
+
+
+class LinuxGpibBoard:
+    """
+    The blocking calls to a linux-gpib board used by the :class:`SrqDispatcher`. All methods are called from the
+    thread of the dispatcher. The automatic serial poll of the driver is disabled, so the SRQ line stays asserted until
+    the dispatcher has polled the device. The devices are polled using their own connections.
+    """
+
+    def __init__(self, name: int = 0, timeout: int = T1S) -> None:
+        """
+        Parameters
+        ----------
+        name: int, default=0
+            The board index.
+        timeout: int, default=11
+            The linux-gpib timeout constant of a single wait for the SRQ line. Closing the dispatcher waits for the
+            wait in progress, so this is the longest time closing takes. The default is 1 s.
+        """
+        self.__name = name
+        self.__timeout = timeout
+        self.__board: Any = None
+
+    def __str__(self) -> str:
+        return f"linux-gpib board {self.__name}"
+
+    def open(self) -> None:
+        """
+        Open the board and disable the automatic serial poll.
+        """
+        from gpib_ctypes.Gpib import Gpib  # pylint: disable=import-outside-toplevel,import-error
+
+        self.__board = Gpib(name=self.__name)
+        self.__board.config(IBC_AUTOPOLL, False)
+        self.__board.timeout(self.__timeout)
+
+    def close(self) -> None:
+        """
+        Close the board.
+        """
+        if self.__board is not None:
+            self.__board.close()
+            self.__board = None
+
+    def wait_for_srq(self) -> bool:
+        """
+        Wait for the SRQ line to be asserted.
+
+        Returns
+        -------
+        bool
+            True if the SRQ line is asserted or False if the wait timed out.
+        """
+        self.__board.wait(SRQI | TIMO)
+        return bool(self.__board.ibsta() & SRQI)
+
+
+class SrqDispatcher:
+    """
+    Wait for the service requests of all devices on a board using a single thread and pass the status bytes to the
+    waiting devices. Without the dispatcher each device blocks a thread of the executor, while waiting for its service
+    request.
+
+    Once the SRQ line is asserted, the registered devices are serial polled using :func:`HP_3478A.serial_poll()
+    <hp3478a_async.hp_3478a.HP_3478A.serial_poll>`, which holds the lock of the device, so a poll never gets between the
+    command and the reply of a query. A status byte is kept for the next wait, if the device is not waited for. All
+    devices on the board, that request service, must be registered, because the automatic serial poll of the board is
+    disabled.
+    """
+
+    def __init__(self, board: int | LinuxGpibBoard = 0) -> None:
+        """
+        Create a dispatcher. It must be opened, before devices can wait for service requests.
+
+        Parameters
+        ----------
+        board: int or LinuxGpibBoard, default=0
+            The board index or the board.
+        """
+        self.__board = LinuxGpibBoard(board) if isinstance(board, int) else board
+        self.__executor: ThreadPoolExecutor | None = None
+        self.__task: asyncio.Task | None = None
+        self.__has_waiters: asyncio.Event | None = None
+        self.__waiters: dict[int, list[asyncio.Future[int]]] = {}
+        self.__status_bytes: dict[int, int] = {}  # The service requests nobody has waited for yet
+        self.__devices: dict[HP_3478A, int] = {}
+
+    def __str__(self) -> str:
+        return f"SRQ dispatcher of {self.__board}"
+
+    async def __aenter__(self) -> Self:
+        await self.open()
+        return self
+
+    async def __aexit__(
+        self, exc_type: type[BaseException] | None, exc: BaseException | None, traceback: TracebackType | None
+    ) -> None:
+        await self.close()
+
+    @property
+    def devices(self) -> dict[HP_3478A, int]:
+        """
+        The registered devices and their primary addresses.
+        """
+        return dict(self.__devices)
+
+    async def open(self) -> None:
+        """
+        Open the board and start waiting for service requests.
+        """
+        if self.__task is not None:
+            return
+        self.__executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="srq-dispatcher")
+        await asyncio.get_running_loop().run_in_executor(self.__executor, self.__board.open)
+        self.__has_waiters = asyncio.Event()
+        self.__task = asyncio.create_task(self.__run())
+
+    async def close(self) -> None:
+        """
+        Stop waiting for service requests, unregister all devices and close the board. Pending waits are cancelled.
+        The board is closed, once the wait for the SRQ line in progress has timed out.
+        """
+        for dmm in list(self.__devices):
+            self.unregister(dmm)
+        if self.__task is not None:
+            self.__task.cancel()
+            await asyncio.gather(self.__task, return_exceptions=True)
+            self.__task = None
+        for futures in self.__waiters.values():
+            for future in futures:
+                future.cancel()
+        self.__waiters = {}
+        self.__status_bytes = {}
+        if self.__executor is not None:
+            # The executor has a single thread, so the board is closed after the last wait has returned
+            await asyncio.get_running_loop().run_in_executor(self.__executor, self.__board.close)
+            self.__executor.shutdown(wait=False)
+            self.__executor = None
+
+    def register(self, dmm: HP_3478A, pad: int) -> None:
+        """
+        Let the dispatcher wait for the service requests of a device.
+
+        Parameters
+        ----------
+        dmm: HP_3478A
+            The device.
+        pad: int
+            The primary address of the device.
+        """
+        dmm.set_srq_waiter(partial(self.wait, pad))
+        self.__devices[dmm] = pad
+
+    def unregister(self, dmm: HP_3478A) -> None:
+        """
+        Let the device wait for its service requests using its own connection again.
+
+        Parameters
+        ----------
+        dmm: HP_3478A
+            The device.
+        """
+        pad = self.__devices.pop(dmm, None)
+        if pad is not None:
+            dmm.set_srq_waiter(None)
+            self.__status_bytes.pop(pad, None)
+
+    async def wait(self, pad: int) -> int:
+        """
+        Wait for a service request of a device.
+
+        Parameters
+        ----------
+        pad: int
+            The primary address of a registered device.
+
+        Returns
+        -------
+        int
+            The status byte of the device.
+
+        Raises
+        ------
+        ConnectionError
+            If the dispatcher is not open.
+        ValueError
+            If no device is registered at the address.
+        """
+        if self.__has_waiters is None or self.__task is None:
+            raise ConnectionError("The SRQ dispatcher is not open.")
+        if pad not in self.__devices.values():
+            raise ValueError(f"No device registered at address {pad}.")
+        if pad in self.__status_bytes:
+            return self.__status_bytes.pop(pad)
+        future: asyncio.Future[int] = asyncio.get_running_loop().create_future()
+        self.__waiters.setdefault(pad, []).append(future)
+        self.__has_waiters.set()
+        try:
+            return await future
+        finally:
+            futures = self.__waiters.get(pad, [])
+            if future in futures:
+                futures.remove(future)
+
+    async def __run(self) -> None:
+        assert self.__has_waiters is not None
+        loop = asyncio.get_running_loop()
+        while "not closed":
+            if not any(self.__waiters.values()):
+                # Do not keep the thread busy, while nobody is waiting
+                self.__has_waiters.clear()
+                await self.__has_waiters.wait()
+                continue
+            try:
+                is_asserted = await loop.run_in_executor(self.__executor, self.__board.wait_for_srq)
+            except Exception as exc:  # pylint: disable=broad-exception-caught  # The error is passed to the waiters
+                for pad in list(self.__waiters):
+                    self.__set_exception(pad, exc)
+                continue
+            if is_asserted and not await self.__poll_devices():
+                # The SRQ line is held by a device, that is not registered. Do not spin, while it is asserted.
+                await asyncio.sleep(UNKNOWN_SRQ_DELAY)
+
+    async def __poll_devices(self) -> bool:
+        """
+        Serial poll all registered devices and pass the status bytes of the devices, that requested service, to the
+        waiters.
+
+        Returns
+        -------
+        bool
+            True if any device requested service.
+        """
+        has_srq = False
+        for dmm, pad in list(self.__devices.items()):
+            try:
+                status = await dmm.serial_poll(Priority.URGENT)
+            except Exception as exc:  # pylint: disable=broad-exception-caught  # The error is passed to the waiters
+                self.__set_exception(pad, exc)
+                continue
+            if not status & SerialPollFlags.SRQ_ON_HAS_SRQ:
+                continue
+            has_srq = True
+            futures = [future for future in self.__waiters.pop(pad, []) if not future.done()]
+            if futures:
+                for future in futures:
+                    future.set_result(status.value)
+            else:
+                self.__status_bytes[pad] = status.value
+        return has_srq
+
+    def __set_exception(self, pad: int, exc: Exception) -> None:
+        for future in self.__waiters.pop(pad, []):
+            if not future.done():
+                future.set_exception(exc)
@@ -0,0 +1,222 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Copyright (C) 2021 Patrick Baus
+# This file is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+"""
+Fit the normalized Steinhart-Hart coefficients used by :func:`HP_3478A.set_ntc_parameters()
+<hp3478a_async.HP_3478A.set_ntc_parameters>` to reference data.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from math import exp, fsum, log, sqrt
+from typing import Iterable, Sequence
+
+from hp3478a_async.hp_3478a import NtcParameters
+from hp3478a_async.transforms import steinhart_hart_temperature
+
+T25 = 298.15  # 25 °C in K
+
+
+@dataclass(frozen=True)
+class SteinhartHartFit:
+    """
+    The coefficients of the model 1/T=a+b*Log(Rt/R25)+c*Log(Rt/R25)**2+d*Log(Rt/R25)**3 and the residuals of the fit.
+    """
+
+    coefficients: tuple[float, float, float, float]  # a, b, c, d
+    rt25: float
+    residuals: tuple[float, ...]  # The fitted minus the reference temperature in K for each point
+
+    @property
+    def rms_residual(self) -> float:
+        """
+        The root mean square of the residuals in K.
+        """
+        return sqrt(fsum(residual**2 for residual in self.residuals) / len(self.residuals))
+
+    @property
+    def max_residual(self) -> float:
+        """
+        The largest absolute residual in K.
+        """
+        return max(abs(residual) for residual in self.residuals)
+
+    def temperature(self, resistance: float) -> float:
+        """
+        Calculate the temperature using the fitted model.
+
+        Parameters
+        ----------
+        resistance: float
+            The resistance of the thermistor in Ω.
+
+        Returns
+        -------
+        float
+            The temperature in K
+        """
+        return steinhart_hart_temperature(resistance, *self.coefficients, rt25=self.rt25)
+
+    def to_ntc_parameters(self) -> NtcParameters:
+        """
+        Returns
+        -------
+        NtcParameters
+            The coefficients to be used with :func:`HP_3478A.set_ntc_parameters()
+            <hp3478a_async.HP_3478A.set_ntc_parameters>`.
+
+        Raises
+        ------
+        ValueError
+            If a coefficient is not positive. The driver only accepts positive coefficients, but a fit may return a
+            negative higher order coefficient. Use :func:`temperature` or the coefficients directly in this case.
+        """
+        negative = [name for name, value in zip("abcd", self.coefficients) if value <= 0]
+        if negative:
+            raise ValueError(
+                f"The driver requires positive coefficients, but the fitted coefficients {', '.join(negative)} are "
+                f"not: {self.coefficients}."
+            )
+        return NtcParameters(*self.coefficients, rt25=self.rt25)
+
+
+def _solve(matrix: list[list[float]], vector: list[float]) -> list[float]:
+    """Solve the linear system using Gaussian elimination with partial pivoting."""
+    size = len(vector)
+    rows = [row[:] + [value] for row, value in zip(matrix, vector)]
+    for column in range(size):
+        pivot = column
+        for row in range(column + 1, size):
+            if abs(rows[row][column]) > abs(rows[pivot][column]):
+                pivot = row
+        if rows[pivot][column] == 0:
+            raise ValueError("The reference data does not determine the coefficients. Use more distinct points.")
+        rows[column], rows[pivot] = rows[pivot], rows[column]
+        for row in range(column + 1, size):
+            factor = rows[row][column] / rows[column][column]
+            for index in range(column, size + 1):
+                rows[row][index] -= factor * rows[column][index]
+    solution = [0.0] * size
+    for row in reversed(range(size)):
+        remainder = rows[row][size] - fsum(rows[row][index] * solution[index] for index in range(row + 1, size))
+        solution[row] = remainder / rows[row][row]
+    return solution
+
+
+def _fit_polynomial(xs: Sequence[float], temperatures: Sequence[float]) -> list[float]:
+    """
+    Fit 1/T=a+b*x+c*x**2+d*x**3 using the normal equations, that are accumulated in a single pass. The error of 1/T is
+    weighted by T**2 to minimize the error in K.
+    """
+    power_sums = [0.0] * 7
+    moments = [0.0] * 4
+    for x, temperature in zip(xs, temperatures):
+        power = temperature**4
+        for i in range(7):
+            if i < 4:
+                moments[i] += power / temperature
+            power_sums[i] += power
+            power *= x
+    return _solve([[power_sums[row + column] for column in range(4)] for row in range(4)], moments)
+
+
+def _shift_polynomial(coefficients: list[float], shift: float) -> list[float]:
+    """Return the coefficients of p(x + shift)."""
+    a, b, c, d = coefficients  # pylint: disable=invalid-name
+    return [a + shift * (b + shift * (c + shift * d)), b + shift * (2 * c + shift * 3 * d), c + 3 * d * shift, d]
+
+
+def _find_root(coefficients: list[float], target: float) -> float:
+    """Solve a+b*x+c*x**2+d*x**3=target using Newton's method starting at 0."""
+    a, b, c, d = coefficients  # pylint: disable=invalid-name
+    x = 0.0
+    for _ in range(50):
+        step = (a + x * (b + x * (c + x * d)) - target) / (b + x * (2 * c + x * 3 * d))
+        x -= step
+        if abs(step) < 1e-12:
+            break
+    return x
+
+
+def fit_steinhart_hart(
+    resistances: Sequence[float], temperatures: Sequence[float], rt25: float | None = None
+) -> SteinhartHartFit:
+    """
+    Fit the Steinhart-Hart coefficients to the reference data using weighted least squares. The weights are chosen,
+    such that the residuals in K are minimized instead of the residuals of 1/T.
+
+    Parameters
+    ----------
+    resistances: Sequence of float
+        The resistances in Ω.
+    temperatures: Sequence of float
+        The reference temperatures in K.
+    rt25: float, optional
+        The nominal resistance at 25 °C used to normalize the resistance. Omit to use the resistance at 25 °C of the
+        fitted model.
+
+    Returns
+    -------
+    SteinhartHartFit
+        The coefficients and residuals
+
+    Raises
+    ------
+    ValueError
+        If there are less than 4 distinct points or the sequences differ in length.
+    """
+    if len(resistances) != len(temperatures):
+        raise ValueError("The number of resistances and temperatures must be equal.")
+    if len(resistances) < 4:
+        raise ValueError("At least 4 points are required to fit the Steinhart-Hart coefficients.")
+    if rt25 is None:
+        # Normalize to the geometric mean for a well conditioned fit, then move the origin to the resistance at 25 °C
+        normalization = exp(fsum(log(value) for value in resistances) / len(resistances))
+        coefficients = _fit_polynomial([log(value / normalization) for value in resistances], temperatures)
+        shift = _find_root(coefficients, 1 / T25)
+        coefficients = _shift_polynomial(coefficients, shift)
+        rt25 = normalization * exp(shift)
+    else:
+        coefficients = _fit_polynomial([log(value / rt25) for value in resistances], temperatures)
+
+    a, b, c, d = coefficients  # pylint: disable=invalid-name
+    residuals = tuple(
+        steinhart_hart_temperature(resistance, a, b, c, d, rt25) - temperature
+        for resistance, temperature in zip(resistances, temperatures)
+    )
+    return SteinhartHartFit(coefficients=(a, b, c, d), rt25=rt25, residuals=residuals)
+
+
+def fit_steinhart_hart_batch(
+    sensors: Iterable[tuple[Sequence[float], Sequence[float]]], rt25: float | None = None
+) -> list[SteinhartHartFit]:
+    """
+    Fit many thermistors at once, for example a batch characterized in a calibration bath.
+
+    Parameters
+    ----------
+    sensors: Iterable of tuple of Sequence of float
+        The resistances in Ω and the reference temperatures in K of each sensor.
+    rt25: float, optional
+        The nominal resistance at 25 °C of all sensors. Omit to use the resistance at 25 °C of each fitted model.
+
+    Returns
+    -------
+    list of SteinhartHartFit
+        The fits in the order of the sensors.
+    """
+    return [fit_steinhart_hart(resistances, temperatures, rt25) for resistances, temperatures in sensors]
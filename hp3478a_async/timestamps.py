@@ -0,0 +1,185 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Copyright (C) 2021 Patrick Baus
+# This file is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+"""
+Estimate the time a reading was actually taken by the DMM from the times recorded on the bus.
+"""
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass
+from decimal import Decimal
+from statistics import median
+from typing import TYPE_CHECKING, Any, AsyncGenerator
+
+from hp3478a_async.flags import StatusFlags
+from hp3478a_async.hp_3478a import ReadingTiming
+from hp3478a_async.planner import DEFAULT_OVERHEAD, INTEGRATION_TIME_PLC
+
+if TYPE_CHECKING:
+    from hp3478a_async.hp_3478a import HP_3478A
+
+
+@dataclass(frozen=True)
+class TimestampedReading:
+    """A reading and the estimated midpoint of its conversion."""
+
+    value: Decimal | bytes
+    timestamp: float  # The midpoint of the signal integration as returned by time.time()
+    uncertainty: float  # The estimated uncertainty of the timestamp in s
+    timing: ReadingTiming  # The times recorded on the bus
+
+
+class ConversionTimestamper:
+    """
+    Timestamp readings with the midpoint of the conversion instead of the time the reading was received. The end of
+    the conversion is taken from the arrival of the service request or the completion of the read, corrected by the
+    read latency of the GPIB adapter, which is measured continuously. If the service requests are polled, e.g. using a
+    Prologix adapter, they arrive up to one :attr:`poll interval <hp3478a_async.HP_3478A.srq_poll_interval>` late. The
+    midpoint is then calculated from the integration time.
+    """
+
+    def __init__(
+        self,
+        dmm: HP_3478A,
+        line_frequency: float | None = None,
+        processing_time: float = DEFAULT_OVERHEAD,
+        latency_window: int = 100,
+    ) -> None:
+        """
+        Create a timestamper.
+
+        Parameters
+        ----------
+        dmm: HP_3478A
+            The DMM
+        line_frequency: float, optional
+            The line frequency in Hz. Omit to query the DMM.
+        processing_time: float, default=0.01
+            The time in seconds the DMM needs to process a reading after the integration has ended.
+        latency_window: int, default=100
+            The number of reads used to estimate the read latency.
+        """
+        self.__dmm = dmm
+        self.__line_frequency = line_frequency
+        self.__processing_time = processing_time
+        self.__latencies: deque[float] = deque(maxlen=latency_window)
+
+    @property
+    def read_latency(self) -> float | None:
+        """
+        The median time in seconds the GPIB adapter needs to read a value, that is ready. `None` if it was not
+        measured yet. It is measured using reads, that waited for the data ready service request.
+        """
+        if not self.__latencies:
+            return None
+        return median(self.__latencies)
+
+    def __latency_jitter(self) -> float:
+        return (max(self.__latencies) - min(self.__latencies)) / 2
+
+    def add_timing(self, timing: ReadingTiming) -> None:
+        """
+        Update the read latency estimate.
+
+        Parameters
+        ----------
+        timing: ReadingTiming
+            The times recorded during a read.
+        """
+        if timing.srq is not None:
+            # The data was ready, when the read started, so the duration is the latency of the adapter
+            self.__latencies.append(timing.read_completed - timing.read_started)
+
+    def estimate(self, timing: ReadingTiming, integration_time: float, autozero: bool) -> tuple[float, float]:
+        """
+        Estimate the midpoint of the signal integration. A service request signalled by the controller is assumed to
+        be detected within about the read latency. A polled service request is detected within one poll interval, so
+        half the interval is added to the delay and to the uncertainty.
+
+        Parameters
+        ----------
+        timing: ReadingTiming
+            The times recorded during the read.
+        integration_time: float
+            The integration time in seconds.
+        autozero: bool
+            `True` if autozero is enabled. The zero is measured in addition to the signal, which makes the position of
+            the signal integration within the conversion less certain.
+
+        Returns
+        -------
+        tuple of float
+            The timestamp and its uncertainty in seconds.
+        """
+        latency = self.read_latency
+        if timing.srq is not None:
+            # Detecting the SRQ takes about as long as a bus transaction plus the wait for the next poll, if polled
+            latency = 0.0 if latency is None else latency
+            poll_interval = self.__dmm.srq_poll_interval or 0.0
+            end = timing.srq - latency - poll_interval / 2
+            uncertainty = max(self.__latency_jitter(), latency / 2) if self.__latencies else 0.0
+            uncertainty += poll_interval / 2
+        elif latency is not None:
+            end = timing.read_completed - latency
+            uncertainty = self.__latency_jitter()
+        else:
+            # The conversion ended, while the read was waiting
+            end = (timing.read_started + timing.read_completed) / 2
+            uncertainty = (timing.read_completed - timing.read_started) / 2
+        midpoint = end - self.__processing_time - integration_time / 2
+        uncertainty += self.__processing_time / 2
+        if autozero:
+            midpoint -= integration_time / 2
+            uncertainty += integration_time / 2
+        return midpoint, uncertainty
+
+    async def read_all(self, **kwargs: Any) -> AsyncGenerator[TimestampedReading]:
+        """
+        Read all values from the device and timestamp them.
+
+        Parameters
+        ----------
+        **kwargs:
+            Additional parameters passed to :func:`HP_3478A.read_all() <hp3478a_async.HP_3478A.read_all>`.
+
+        Returns
+        -------
+        Iterator[TimestampedReading]
+            The readings and their timestamps.
+        """
+        configuration = self.__dmm.configuration
+        ndigits, autozero = configuration.ndigits, configuration.autozero
+        if self.__line_frequency is None or ndigits is None or autozero is None:
+            # Settings, that were not made by the driver, are read from the DMM
+            status = await self.__dmm.get_status()
+            if self.__line_frequency is None:
+                self.__line_frequency = 50.0 if StatusFlags.LINE_FREQUENCY_50_HZ in status.status else 60.0
+            ndigits = status.ndigits if ndigits is None else ndigits
+            autozero = StatusFlags.AUTO_ZERO_ENABLED in status.status if autozero is None else autozero
+        line_frequency = self.__line_frequency
+        async for value in self.__dmm.read_all(**kwargs):
+            timing = self.__dmm.last_timing
+            assert timing is not None
+            self.add_timing(timing)
+            configuration = self.__dmm.configuration  # Follow configuration changes
+            if configuration.ndigits is not None:
+                ndigits = configuration.ndigits
+            if configuration.autozero is not None:
+                autozero = configuration.autozero
+            timestamp, uncertainty = self.estimate(timing, INTEGRATION_TIME_PLC[ndigits] / line_frequency, autozero)
+            yield TimestampedReading(value=value, timestamp=timestamp, uncertainty=uncertainty, timing=timing)
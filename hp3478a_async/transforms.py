@@ -0,0 +1,379 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Copyright (C) 2021 Patrick Baus
+# This file is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+"""
+Transforms, that convert the readings of the DMM to physical quantities, e.g. the resistance of a sensor to a
+temperature. The transforms are combined in a :class:`TransformPipeline`, which fuses them into a single function.
+"""
+from __future__ import annotations
+
+import abc
+from dataclasses import dataclass
+from decimal import Decimal
+from functools import cached_property, partial
+from math import log, sqrt
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Union
+
+if TYPE_CHECKING:
+    from hp3478a_async.hp_3478a import NtcParameters
+
+ZERO_CELSIUS = 273.15  # 0 °C in K
+
+
+class Transform(abc.ABC):
+    """
+    The base class of all transforms. A transform converts a single value using the function returned by
+    :func:`compile`.
+    """
+
+    @abc.abstractmethod
+    def compile(self) -> Callable[[float], float]:
+        """
+        Returns
+        -------
+        Callable
+            A function converting a single value.
+        """
+
+    @cached_property
+    def __function(self) -> Callable[[float], float]:
+        # The transforms are immutable, so the function is only compiled once
+        return self.compile()
+
+    def __getstate__(self) -> dict[str, Any]:
+        # The compiled function may be a closure, that cannot be pickled, so it is compiled again after unpickling
+        state = self.__dict__.copy()
+        state.pop("_Transform__function", None)
+        return state
+
+    def batch(self, values: Iterable[float]) -> list[float]:
+        """
+        Transform many values at once. Subclasses may override it with a faster implementation.
+
+        Parameters
+        ----------
+        values: Iterable of float
+            The values to transform.
+
+        Returns
+        -------
+        list of float
+            The transformed values.
+        """
+        return list(map(self.__function, values))
+
+    def __call__(self, value: float) -> float:
+        return self.__function(value)
+
+
+@dataclass(frozen=True)
+class LinearTransform(Transform):
+    """
+    Scale and offset the value, i.e. `scale * value + offset`. Use it for shunts and voltage dividers. Consecutive
+    linear transforms are merged into one.
+    """
+
+    scale: float = 1.0
+    offset: float = 0.0
+
+    def compile(self) -> Callable[[float], float]:
+        scale, offset = self.scale, self.offset
+        if offset == 0:
+            return lambda value: scale * value
+        return lambda value: scale * value + offset
+
+    def batch(self, values: Iterable[float]) -> list[float]:
+        scale, offset = self.scale, self.offset
+        return [scale * value + offset for value in values]
+
+    def then(self, other: LinearTransform) -> LinearTransform:
+        """
+        Merge the transform with a subsequent linear transform.
+
+        Parameters
+        ----------
+        other: LinearTransform
+            The transform applied after this transform.
+
+        Returns
+        -------
+        LinearTransform
+            A single transform equivalent to both transforms.
+        """
+        return LinearTransform(scale=other.scale * self.scale, offset=other.scale * self.offset + other.offset)
+
+
+def steinhart_hart_temperature(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+    resistance: float, a: float, b: float, c: float, d: float, rt25: float
+) -> float:
+    """
+    Convert a resistance to temperature using the formula 1/T=a+b*Log(Rt/R25)+c*Log(Rt/R25)**2+d*Log(Rt/R25)**3.
+
+    Parameters
+    ----------
+    resistance: float
+        The resistance of the NTC in Ω.
+    a: float
+        The parameters of the NTC thermistor used
+    b: float
+        The parameters of the NTC thermistor used
+    c: float
+        The parameters of the NTC thermistor used
+    d: float
+        The parameters of the NTC thermistor used
+    rt25: float
+        The resistance of the NTC at 25 °C
+
+    Returns
+    -------
+    float
+        The temperature in K
+    """
+    x = log(resistance / rt25)  # pylint: disable=invalid-name
+    return 1 / (a + x * (b + x * (c + x * d)))
+
+
+@dataclass(frozen=True)
+class NtcTransform(Transform):
+    """
+    Convert the resistance of an NTC thermistor to a temperature in K using the Steinhart-Hart equation. See
+    :func:`HP_3478A.set_ntc_parameters() <hp3478a_async.HP_3478A.set_ntc_parameters>`.
+    """
+
+    parameters: NtcParameters
+
+    def compile(self) -> Callable[[float], float]:
+        parameters = self.parameters
+        return partial(
+            steinhart_hart_temperature,
+            a=parameters.a,
+            b=parameters.b,
+            c=parameters.c,
+            d=parameters.d,
+            rt25=parameters.rt25,
+        )
+
+
+@dataclass(frozen=True)
+class RtdTransform(Transform):
+    """
+    Convert the resistance of a platinum RTD to a temperature in K using the Callendar–Van Dusen equation. The default
+    coefficients are those of IEC 60751.
+
+    R(T) = R0 * (1 + A*T + B*T**2 + C*(T - 100 °C)*T**3) with T in °C, where C = 0 for T >= 0 °C.
+    """
+
+    r0: float = 100.0  # pylint: disable=invalid-name  # this is standard naming convention
+    a: float = 3.9083e-3  # pylint: disable=invalid-name  # this is standard naming convention
+    b: float = -5.775e-7  # pylint: disable=invalid-name  # this is standard naming convention
+    c: float = -4.183e-12  # pylint: disable=invalid-name  # this is standard naming convention
+
+    def compile(self) -> Callable[[float], float]:
+        r0, a, b, c = self.r0, self.a, self.b, self.c  # pylint: disable=invalid-name
+
+        def convert(resistance: float) -> float:
+            ratio = resistance / r0
+            # The closed form solution for T >= 0 °C
+            temperature = (-a + sqrt(a * a - 4 * b * (1 - ratio))) / (2 * b)
+            if ratio < 1:
+                # Below 0 °C, refine the quadratic solution using Newton's method
+                for _ in range(10):
+                    error = 1 + temperature * (a + temperature * (b + c * (temperature - 100) * temperature)) - ratio
+                    slope = a + temperature * (2 * b + c * temperature * (4 * temperature - 300))
+                    temperature -= error / slope
+            return temperature + ZERO_CELSIUS
+
+        return convert
+
+
+@dataclass(frozen=True)
+class CallableTransform(Transform):
+    """
+    Wrap a user supplied function. The function must be picklable, if the pipeline is run in a process pool.
+    """
+
+    function: Callable[[float], float]
+
+    def compile(self) -> Callable[[float], float]:
+        return self.function
+
+
+TransformLike = Union[Transform, Callable[[float], float]]
+
+# The transforms, that can be created by name, e.g. from a configuration file
+TRANSFORMS: dict[str, Callable[..., Transform]] = {
+    "linear": LinearTransform,
+    "rtd": RtdTransform,
+}
+
+
+def register_transform(name: str, factory: Callable[..., Transform]) -> None:
+    """
+    Register a transform, so it can be created using :func:`create_transform`.
+
+    Parameters
+    ----------
+    name: str
+        The name of the transform.
+    factory: Callable
+        A function or class returning the transform. It is called with the keyword arguments passed to
+        :func:`create_transform`.
+    """
+    TRANSFORMS[name] = factory
+
+
+def create_transform(name: str, **kwargs: Any) -> Transform:
+    """
+    Create a registered transform.
+
+    Parameters
+    ----------
+    name: str
+        The name of the transform, e.g. `linear` or `rtd`.
+    **kwargs:
+        The parameters of the transform.
+
+    Returns
+    -------
+    Transform
+        The transform
+
+    Raises
+    ------
+    ValueError
+        If the transform is not registered.
+    """
+    try:
+        factory = TRANSFORMS[name]
+    except KeyError:
+        raise ValueError(f"Unknown transform '{name}'. Use one of {', '.join(TRANSFORMS)}.") from None
+    return factory(**kwargs)
+
+
+def _compose(functions: list[Callable[[float], float]]) -> Callable[[float], float]:
+    if not functions:
+        return float
+    if len(functions) == 1:
+        return functions[0]
+    if len(functions) == 2:
+        first, second = functions
+        return lambda value: second(first(value))
+
+    def composed(value: float) -> float:
+        for function in functions:
+            value = function(value)
+        return value
+
+    return composed
+
+
+class TransformPipeline:
+    """
+    A sequence of transforms applied to each reading. The transforms are fused into a single function when the
+    pipeline is created. The pipeline can be pickled, so it can be run in a process pool.
+    """
+
+    def __init__(self, *transforms: TransformLike) -> None:
+        """
+        Create a pipeline.
+
+        Parameters
+        ----------
+        *transforms: Transform or Callable
+            The transforms in the order they are applied. Plain functions are wrapped in a :class:`CallableTransform`.
+        """
+        self.__transforms = tuple(
+            transform if isinstance(transform, Transform) else CallableTransform(transform) for transform in transforms
+        )
+        self.__function, self.__batch = self.__compile()
+
+    def __compile(self) -> tuple[Callable[[float], float], Callable[[Iterable[float]], list[float]] | None]:
+        # Merge consecutive linear transforms
+        merged: list[Transform] = []
+        for transform in self.__transforms:
+            if isinstance(transform, LinearTransform) and merged and isinstance(merged[-1], LinearTransform):
+                merged[-1] = merged[-1].then(transform)
+            else:
+                merged.append(transform)
+        # A single transform may provide a faster batch implementation
+        return _compose([transform.compile() for transform in merged]), merged[0].batch if len(merged) == 1 else None
+
+    def __getstate__(self) -> tuple[Transform, ...]:
+        # Compiled functions are closures, that cannot be pickled, so only the transforms are pickled
+        return self.__transforms
+
+    def __setstate__(self, state: tuple[Transform, ...]) -> None:
+        self.__transforms = state
+        self.__function, self.__batch = self.__compile()
+
+    def __len__(self) -> int:
+        return len(self.__transforms)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({', '.join(repr(transform) for transform in self.__transforms)})"
+
+    @property
+    def transforms(self) -> tuple[Transform, ...]:
+        """
+        The transforms in the order they are applied.
+        """
+        return self.__transforms
+
+    def __call__(self, value: float) -> float:
+        return self.__function(value)
+
+    def batch(self, values: Iterable[float]) -> list[float]:
+        """
+        Transform many values at once.
+
+        Parameters
+        ----------
+        values: Iterable of float
+            The values to transform.
+
+        Returns
+        -------
+        list of float
+            The transformed values.
+        """
+        if self.__batch is not None:
+            return self.__batch(values)
+        return list(map(self.__function, values))
+
+    def decimal(self, value: Decimal) -> Decimal:
+        """
+        Transform a reading returned by the DMM.
+
+        Parameters
+        ----------
+        value: Decimal
+            The reading
+
+        Returns
+        -------
+        Decimal
+            The transformed reading
+
+        Raises
+        ------
+        ValueError
+            If the reading cannot be transformed, e.g. a negative resistance of an NTC.
+        """
+        try:
+            return Decimal(self.__function(float(value)))
+        except (ValueError, ZeroDivisionError):
+            raise ValueError(f"Cannot transform the measurement. Measurement was: {value}.") from None
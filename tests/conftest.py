@@ -0,0 +1,17 @@
+"""Shared test configuration."""
+
+import pytest
+
+
+def pytest_collection_modifyitems(items):
+    """Move the slow tests to the end of the list, so that the fast tests fail first."""
+    items.sort(key=lambda item: item.get_closest_marker("slow") is not None)
+
+
+@pytest.fixture(autouse=True, scope="session")
+def cache_dir(tmp_path_factory):
+    """Keep the tests from writing to the cache directory of the user."""
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        path = tmp_path_factory.mktemp("cache")
+        monkeypatch.setenv("XDG_CACHE_HOME", str(path))
+        yield path
@@ -0,0 +1,103 @@
+"""Unit test for the bounded acquisition queue."""
+
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Copyright (C) 2020  Patrick Baus
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import asyncio
+from decimal import Decimal
+
+import pytest
+
+from hp3478a_async.acquisition import AcquisitionQueue, OverflowPolicy
+
+
+class _FakeDmm:  # pylint: disable=too-few-public-methods
+    """A stand-in for the DMM, that returns 10 readings as fast as possible."""
+
+    def __init__(self, error=None):
+        self.__error = error
+        self.kwargs = None
+
+    async def read_all(self, **kwargs):
+        """Return the readings and optionally raise an error at the end."""
+        self.kwargs = kwargs
+        for i in range(10):
+            await asyncio.sleep(0)
+            yield Decimal(i)
+        if self.__error is not None:
+            raise self.__error
+
+
+async def _consume_slowly(queue):
+    await asyncio.sleep(0.05)  # Let the acquisition finish, before reading
+    return [reading.value for reading in [reading async for reading in queue]]
+
+
+@pytest.mark.parametrize(
+    "policy, expected, dropped",
+    [
+        (OverflowPolicy.DROP_OLDEST, [7, 8, 9], 7),
+        (OverflowPolicy.DROP_NEWEST, [0, 1, 2], 7),
+        (OverflowPolicy.BLOCK, list(range(10)), 0),
+    ],
+)
+def test_overflow_policy(policy, expected, dropped):
+    """Test the overflow policies with a stalled consumer."""
+
+    async def run():
+        async with AcquisitionQueue(_FakeDmm(), maxsize=3, policy=policy) as queue:
+            values = await _consume_slowly(queue)
+        return values, queue
+
+    values, queue = asyncio.run(run())
+    assert values == expected
+    assert queue.dropped_samples == dropped
+
+
+def test_error_propagation():
+    """Test that errors of the acquisition are raised, once the queue is drained."""
+
+    async def run():
+        dmm = _FakeDmm(error=ConnectionError)
+        async with AcquisitionQueue(dmm, maxsize=20, nan_on_overload=True) as queue:
+            with pytest.raises(ConnectionError):
+                await _consume_slowly(queue)
+        return dmm
+
+    dmm = asyncio.run(run())
+    assert dmm.kwargs == {"nan_on_overload": True}
+
+
+def test_restart():
+    """Test that the acquisition can be started again after it was stopped."""
+
+    async def run():
+        queue = AcquisitionQueue(_FakeDmm(), maxsize=20)
+        queue.start()
+        await asyncio.sleep(0)
+        await queue.stop()
+        stopped = [reading.value async for reading in queue]
+        queue.start()
+        try:
+            return stopped, await _consume_slowly(queue)
+        finally:
+            await queue.stop()
+
+    stopped, values = asyncio.run(run())
+    assert len(stopped) < 10
+    assert values == list(range(10))
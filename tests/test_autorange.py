@@ -0,0 +1,107 @@
+"""Unit test for the software autorange."""
+
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Copyright (C) 2020  Patrick Baus
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import asyncio
+from decimal import Decimal
+
+import pytest
+
+from hp3478a_async import DmmConfiguration, FunctionType, Range
+from hp3478a_async.autorange import FUNCTION_RANGES, SoftwareAutorange, select_range
+
+DCV_RANGES = FUNCTION_RANGES[FunctionType.DCV]
+
+
+@pytest.mark.parametrize(
+    "current, magnitude, expected",
+    [
+        (Range.RANGE_3, 2.6, Range.RANGE_3),  # Within range
+        (Range.RANGE_3, 2.8, Range.RANGE_30),  # Above 90 % of full scale
+        (Range.RANGE_3, 200.0, Range.RANGE_300),  # Skip ranges
+        (Range.RANGE_300, 1000.0, Range.RANGE_300),  # Highest range
+        (Range.RANGE_30, 2.5, Range.RANGE_30),  # Hysteresis, 2.5 V does not fit below 80 % of the 3 V range
+        (Range.RANGE_30, 2.3, Range.RANGE_3),  # Below 80 % of the lower range
+        (Range.RANGE_300, 0.001, Range.RANGE_30M),  # Skip ranges
+    ],
+)
+def test_select_range(current, magnitude, expected):
+    """Test the range selection and its hysteresis."""
+    assert select_range(DCV_RANGES, current, magnitude, 0.9, 0.8) is expected
+
+
+class _FakeDmm:
+    """A stand-in for the DMM, that returns a list of values."""
+
+    def __init__(self, values):
+        self.values = values
+        self.ranges = []
+        self.configuration = DmmConfiguration(function=FunctionType.DCV, range=Range.RANGE_3)
+
+    async def set_range(self, value):
+        """Record the range changes."""
+        self.ranges.append(value)
+
+    async def read_all(self, **kwargs):
+        """Return the values as if they were read from the DMM."""
+        assert kwargs["nan_on_overload"]
+        for value in self.values:
+            yield Decimal(value)
+
+
+async def _read_autoranged(values):
+    dmm = _FakeDmm(values)
+    autorange = SoftwareAutorange(dmm)
+    results = [result async for result in autorange.read_all()]
+    return dmm, autorange, results
+
+
+def test_software_autorange():
+    """Test the trend prediction and the overload handling."""
+    values = ["1.0", "2.0", "2.5", "NaN", "20.0", "2.0", "0.1", "0.1"]
+    dmm, autorange, results = asyncio.run(_read_autoranged(values))
+    # The trend predicts 3.0 V after 2.0 V, so the range is increased before the reading is out of range. The overload
+    # is discarded and the range increased. Finally, the range is decreased step by step following the input.
+    assert dmm.ranges == [
+        Range.RANGE_3,
+        Range.RANGE_30,
+        Range.RANGE_300,
+        Range.RANGE_30,
+        Range.RANGE_3,
+        Range.RANGE_300M,
+    ]
+    assert [str(result) for result in results] == ["1.0", "2.0", "2.5", "20.0", "2.0", "0.1", "0.1"]
+    assert autorange.range_changes == 5
+    assert autorange.discarded_readings == 1
+
+
+def test_saved_range_changes():
+    """Test the hysteresis against the hardware autorange, that toggles between ranges."""
+    dmm, autorange, results = asyncio.run(_read_autoranged(["0.27", "0.35"] * 3))
+    assert dmm.ranges == [Range.RANGE_3]
+    assert len(results) == 6
+    assert autorange.range_changes == 0
+    assert autorange.hardware_range_changes == 6
+    assert autorange.saved_range_changes == 6
+
+
+def test_invalid_thresholds():
+    """Test that the lower threshold must be less than the upper threshold."""
+    with pytest.raises(ValueError):
+        SoftwareAutorange(_FakeDmm([]), upper_threshold=0.8, lower_threshold=0.9)
@@ -0,0 +1,79 @@
+"""Unit test for the calibration memory archive."""
+
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Copyright (C) 2020  Patrick Baus
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from hp3478a_async.calibration_archive import CalibrationArchive
+from hp3478a_async.hp_3478a_helper import decode_cal_data, encode_cal_data
+
+CALRAM_EXAMPLE = (Path(__file__).parent.parent / "examples" / "calram_example.bin").read_text(encoding="ascii")
+
+
+def test_deduplication(tmp_path):
+    """Test that identical dumps are stored once, but all snapshots are recorded."""
+    with CalibrationArchive(tmp_path) as archive:
+        first_hash = archive.add("meter1", CALRAM_EXAMPLE, datetime(2021, 1, 1))
+        second_hash = archive.add("meter1", CALRAM_EXAMPLE.replace("\n", ""), datetime(2021, 4, 1))
+        third_hash = archive.add("meter2", CALRAM_EXAMPLE, datetime(2021, 4, 1))
+        assert first_hash == second_hash == third_hash
+        assert len(list((tmp_path / "dumps").iterdir())) == 1
+        assert [snapshot.instrument for snapshot in archive.snapshots()] == ["meter1", "meter1", "meter2"]
+        assert len(archive.snapshots("meter2")) == 1
+        assert archive.get(first_hash) == CALRAM_EXAMPLE.replace("\n", "").encode("ascii")
+
+
+def test_history(tmp_path):
+    """Test the gain drift query against the decoded data."""
+    is_cal_enabled, entries = decode_cal_data(CALRAM_EXAMPLE.replace("\n", ""))
+    entries[3].gain = 1.0001
+    modified_dump = encode_cal_data(is_cal_enabled, entries)
+
+    with CalibrationArchive(tmp_path) as archive:
+        archive.add("meter1", CALRAM_EXAMPLE, datetime(2021, 1, 1))
+        archive.add("meter1", modified_dump, datetime(2021, 4, 1))
+        archive.add("meter2", CALRAM_EXAMPLE, datetime(2021, 2, 1))
+
+    # Reopen the archive to make sure the index is persisted
+    with CalibrationArchive(tmp_path) as archive:
+        history = archive.history(3)
+        assert [(record.instrument, record.timestamp.month) for record in history] == [
+            ("meter1", 1),
+            ("meter1", 4),
+            ("meter2", 2),
+        ]
+        _, original_entries = decode_cal_data(CALRAM_EXAMPLE.replace("\n", ""))
+        assert history[0].gain == original_entries[3].gain
+        assert history[1].gain == 1.0001
+        assert all(record.is_valid for record in history)
+        assert len(archive.history(3, instrument="meter2")) == 1
+
+
+def test_invalid_input(tmp_path):
+    """Test that invalid dumps and entries are rejected."""
+    with CalibrationArchive(tmp_path) as archive:
+        with pytest.raises(ValueError):
+            archive.add("meter1", b"@" * 255)
+        with pytest.raises(ValueError):
+            archive.history(19)
+        with pytest.raises(KeyError):
+            archive.get("0" * 64)
@@ -0,0 +1,82 @@
+"""Unit test for the rate limited display updater."""
+
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Copyright (C) 2020  Patrick Baus
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import asyncio
+
+import pytest
+
+from hp3478a_async.display import DisplayUpdater
+from hp3478a_async.enums import DisplayType
+
+
+class _FakeDmm:  # pylint: disable=too-few-public-methods
+    """A stand-in for the DMM, that records the display updates."""
+
+    def __init__(self):
+        self.updates = []
+
+    async def set_display(self, value, text=""):
+        """Record the display update."""
+        self.updates.append((value, text))
+
+
+def test_coalescing():
+    """Test that rapid updates are coalesced and the latest text is shown."""
+
+    async def run():
+        dmm = _FakeDmm()
+        async with DisplayUpdater(dmm, max_rate=20) as display:
+            for i in range(100):
+                display.update(f"T {i}")
+                await asyncio.sleep(0.001)
+            await asyncio.sleep(0.1)
+        return dmm, display
+
+    dmm, display = asyncio.run(run())
+    texts = [text for value, text in dmm.updates if value is DisplayType.SHOW_TEXT]
+    assert texts[-1] == "T 99"
+    assert len(texts) < 10
+    assert display.sent_updates == len(texts)
+    assert display.dropped_updates > 0
+    assert dmm.updates[-1] == (DisplayType.NORMAL, "")
+
+
+def test_duplicate_text():
+    """Test that unchanged text is not sent again."""
+
+    async def run():
+        dmm = _FakeDmm()
+        display = DisplayUpdater(dmm, max_rate=1000)
+        display.update("HELLO")
+        display.start()
+        await asyncio.sleep(0.01)
+        display.update("HELLO")
+        await asyncio.sleep(0.01)
+        await display.stop(restore=False)
+        return dmm
+
+    dmm = asyncio.run(run())
+    assert dmm.updates == [(DisplayType.SHOW_TEXT, "HELLO")]
+
+
+def test_invalid_rate():
+    """Test that the rate must be positive."""
+    with pytest.raises(ValueError):
+        DisplayUpdater(_FakeDmm(), max_rate=0)
@@ -0,0 +1,190 @@
+"""Unit test for the configuration drift detection."""
+
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Copyright (C) 2020  Patrick Baus
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import asyncio
+from dataclasses import replace
+from decimal import Decimal
+
+from hp3478a_async import HP_3478A, DmmConfiguration, DmmStatus, FunctionType, Range, TriggerType
+from hp3478a_async.drift import DriftDetector, SettingDrift, diff_configuration
+from hp3478a_async.flags import ErrorFlags, SerialPollFlags, SrqMask, StatusFlags
+
+CONFIGURATION = DmmConfiguration(
+    function=FunctionType.OHM,
+    range=Range.RANGE_30k,
+    ndigits=6,
+    trigger=TriggerType.INTERNAL,
+    autozero=True,
+    srq_mask=SrqMask.DATA_READY,
+)
+STATUS = DmmStatus(
+    function=FunctionType.OHM,
+    range=Range.RANGE_30k,
+    ndigits=6,
+    status=StatusFlags.INTERNAL_TRIGGER_ENABLED | StatusFlags.AUTO_ZERO_ENABLED | StatusFlags.FRONT_SWITCH_ENABLED,
+    srq_flags=SerialPollFlags.SRQ_ON_DATA_READY,
+    error_flags=ErrorFlags(0),
+    dac_value=0,
+)
+
+# The status bytes returned by a DMM in 2-wire ohms mode, that was configured like above
+STATUS_BYTES = bytes(
+    [
+        (FunctionType.OHM.value << 5) | ((Range.RANGE_30k.value - 1) << 2),
+        STATUS.status.value,
+        SrqMask.DATA_READY.value,
+        0,
+        0,
+    ]
+)
+
+
+class _FakeDmm:
+    """A stand-in for the DMM, whose status can be changed by a callback after each reading."""
+
+    def __init__(self, on_reading=None, reading_time=0.0, status_time=0.0):
+        self.configuration = CONFIGURATION
+        self.status = STATUS
+        self.__on_reading = on_reading
+        self.__reading_time = reading_time
+        self.__status_time = status_time
+
+    async def get_status(self):
+        """Return the status."""
+        await asyncio.sleep(self.__status_time)
+        return self.status
+
+    async def read_all(self, **_kwargs):
+        """Return readings forever."""
+        i = 0
+        while "not cancelled":
+            await asyncio.sleep(self.__reading_time)
+            if self.__on_reading is not None:
+                self.__on_reading(self, i)
+            yield Decimal(i)
+            i += 1
+
+
+class _FakeConnection:
+    """A stand-in for the GPIB connection, that returns the status or a resistance reading."""
+
+    def __init__(self):
+        self.__command = b""
+
+    async def write(self, data):
+        """Remember the command to answer the next read."""
+        self.__command = data
+
+    async def read(self, length=None):  # pylint: disable=unused-argument
+        """Return the status or a reading."""
+        command, self.__command = self.__command, b""
+        return STATUS_BYTES if command == b"B" else b"+5.00000E+3\r\n"
+
+    async def wait(self, _mask):
+        """Signal a finished conversion."""
+        await asyncio.sleep(0)
+        return (SerialPollFlags.SRQ_ON_DATA_READY | SerialPollFlags.SRQ_ON_HAS_SRQ).value
+
+
+async def _read(detector, count):
+    readings = []
+    async for reading in detector.read_all():
+        readings.append(reading)
+        if len(readings) == count:
+            break
+    return readings
+
+
+def test_diff_configuration():
+    """Test the comparison of the status with the configuration."""
+    assert not diff_configuration(CONFIGURATION, STATUS)
+    autorange = replace(STATUS, range=Range.RANGE_300k, status=STATUS.status | StatusFlags.AUTO_RANGE_ENABLED)
+    assert not diff_configuration(replace(CONFIGURATION, range=Range.RANGE_AUTO), autorange)
+    assert diff_configuration(CONFIGURATION, autorange) == [SettingDrift("range", Range.RANGE_30k, Range.RANGE_AUTO)]
+    assert not diff_configuration(DmmConfiguration(), replace(STATUS, function=FunctionType.DCV))
+
+
+def test_thermistor_function():
+    """Test that the thermistor functions match the resistance functions reported by the DMM."""
+    assert not diff_configuration(replace(CONFIGURATION, function=FunctionType.NTC), STATUS)
+    four_wire = replace(STATUS, function=FunctionType.OHMF)
+    assert not diff_configuration(replace(CONFIGURATION, function=FunctionType.NTCF), four_wire)
+    assert diff_configuration(replace(CONFIGURATION, function=FunctionType.NTC), four_wire) == [
+        SettingDrift("function", FunctionType.NTC, FunctionType.OHMF)
+    ]
+
+
+def test_thermistor_status():
+    """Test checking the status of a DMM measuring a thermistor."""
+    dmm = HP_3478A(_FakeConnection())
+
+    async def run():
+        await dmm.set_function(FunctionType.NTC)
+        await dmm.set_range(Range.RANGE_30k)
+        await dmm.set_number_of_digits(6)
+        await dmm.set_trigger(TriggerType.INTERNAL)
+        await dmm.set_autozero(True)
+        return await _read(DriftDetector(dmm, interval=2, max_overhead=None), 5)
+
+    readings = asyncio.run(run())
+    assert [reading.checked for reading in readings] == [True, False, True, False, True]
+    assert all(reading.is_valid for reading in readings)
+
+
+def test_drift_tagging():
+    """Test that a range change and the front/rear switch are detected at the next check."""
+
+    def turn_knob(dmm, i):
+        if i == 12:
+            dmm.status = replace(STATUS, range=Range.RANGE_3k, status=STATUS.status & ~StatusFlags.FRONT_SWITCH_ENABLED)
+
+    detector = DriftDetector(_FakeDmm(turn_knob), interval=5, max_overhead=None)
+    readings = asyncio.run(_read(detector, 20))
+    assert [reading.checked for reading in readings[:6]] == [True, False, False, False, False, True]
+    assert all(reading.is_valid for reading in readings[:15])
+    assert {drift.setting for drift in readings[15].drift} == {"range", "front_terminals"}
+    assert not readings[-1].is_valid
+
+
+def test_requested_check():
+    """Test that a check can be requested, e.g. after a front panel SRQ."""
+    detector = DriftDetector(_FakeDmm(), interval=100, max_overhead=None)
+
+    async def run():
+        readings = []
+        async for reading in detector.read_all():
+            readings.append(reading)
+            if len(readings) == 3:
+                detector.request_check()
+            if len(readings) == 5:
+                break
+        return readings
+
+    readings = asyncio.run(run())
+    assert [reading.checked for reading in readings] == [True, False, False, True, False]
+
+
+def test_adaptive_interval():
+    """Test that slow checks increase the interval to meet the overhead target."""
+    detector = DriftDetector(_FakeDmm(reading_time=0.001, status_time=0.01), interval=2, max_overhead=0.1)
+    asyncio.run(_read(detector, 200))
+    # A check takes about 10 readings, so the interval should be about 100 readings
+    assert detector.interval >= 20
+    assert detector.checks < 10
@@ -18,9 +18,27 @@
 #
 # ##### END GPL LICENSE BLOCK #####
 
+from pathlib import Path
+
 import pytest
 
-from hp3478a_async.hp_3478a_helper import _decode_gain_data, _encode_gain_data
+from hp3478a_async.hp_3478a_helper import (
+    _GAIN_MAX_PPM,
+    _GAIN_MIN_PPM,
+    _decode_gain_data,
+    _encode_gain_data,
+    _gain_table_path,
+    _get_gain_table,
+    _lookup_gain_data,
+    decode_cal_data,
+    decode_cal_data_batch,
+    diff_cal_data,
+    encode_cal_data,
+)
+
+CALRAM_EXAMPLE = (
+    (Path(__file__).parent.parent / "examples" / "calram_example.bin").read_text(encoding="ascii").replace("\n", "")
+)
 
 encoder_data = [
     (1.055555, [0x5, 0x5, 0x5, 0x5, 0x5]),  # Maximum
@@ -97,3 +115,76 @@ def test_gain_encoder_too_low(decoded_gain_data):
 def test_gain_decoder(decoded_gain_data, encoded_gain_data):
     """Test the gain decoder against known good data"""
     assert _decode_gain_data(encoded_gain_data) == decoded_gain_data
+
+
+@pytest.mark.parametrize("decoded_gain_data, encoded_gain_data", encoder_data)
+def test_gain_lookup(decoded_gain_data, encoded_gain_data):
+    """Test the gain lookup table again known good data."""
+    assert _lookup_gain_data(decoded_gain_data) == encoded_gain_data
+
+
+@pytest.mark.slow
+def test_gain_table_round_trip(tmp_path, monkeypatch):
+    """Test the gain lookup table against the encoder and decoder for all representable gains."""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    _get_gain_table.cache_clear()
+    try:
+        table = _get_gain_table()
+        assert _gain_table_path().is_file()
+        _get_gain_table.cache_clear()
+        assert _get_gain_table() == table  # Load the cached table from disk
+        for ppm in range(_GAIN_MIN_PPM, _GAIN_MAX_PPM + 1):
+            gain = 1.0 + ppm / 10**6
+            encoded_gain = _lookup_gain_data(gain)
+            assert encoded_gain == _encode_gain_data(gain)
+            assert _decode_gain_data(encoded_gain) == gain
+        with pytest.raises(OverflowError):
+            _lookup_gain_data(1.0 + (_GAIN_MAX_PPM + 1) / 10**6)
+        with pytest.raises(OverflowError):
+            _lookup_gain_data(1.0 + (_GAIN_MIN_PPM - 1) / 10**6)
+
+        # A corrupted cache must be regenerated
+        _gain_table_path().write_bytes(b"\x00" * 32 + table)
+        _get_gain_table.cache_clear()
+        assert _get_gain_table() == table
+    finally:
+        _get_gain_table.cache_clear()
+
+
+def test_batch_decoder():
+    """Test the batch decoder against the reference implementation."""
+    is_cal_enabled, entries = decode_cal_data(CALRAM_EXAMPLE)
+    entries[0].gain, entries[1].offset = 0.955556, -1234
+    modified_dump = encode_cal_data(not is_cal_enabled, entries)
+    corrupted_dump = CALRAM_EXAMPLE[:1] + "O" + CALRAM_EXAMPLE[2:]  # Invalid BCD digit in the first offset
+
+    table = decode_cal_data_batch([CALRAM_EXAMPLE, modified_dump, corrupted_dump.encode("ascii")])
+    assert len(table) == 3
+    for idx, dump in enumerate((CALRAM_EXAMPLE, modified_dump, corrupted_dump)):
+        is_cal_enabled, entries = decode_cal_data(dump)
+        assert table.is_cal_enabled[idx] == is_cal_enabled
+        assert table.offset[idx] == tuple(entry.offset for entry in entries)
+        assert table.gain[idx] == tuple(entry.gain for entry in entries)
+        assert table.checksum[idx] == tuple(entry.checksum for entry in entries)
+        assert table.is_valid[idx] == tuple(entry.is_valid for entry in entries)
+    assert not table.is_valid[2][0]
+
+
+def test_differ():
+    """Test the differ against a single dump and the fleet baseline."""
+    _, entries = decode_cal_data(CALRAM_EXAMPLE)
+    original_gain = entries[3].gain
+    entries[3].gain += 12e-6
+    entries[4].offset += 7
+    modified_dump = encode_cal_data(True, entries)
+
+    deltas = diff_cal_data(CALRAM_EXAMPLE, modified_dump)
+    assert [(delta.entry, delta.offset, delta.gain_ppm) for delta in deltas if delta.is_changed] == [
+        (3, 0, 12),
+        (4, 7, 0),
+    ]
+    assert all(delta.is_valid for delta in deltas)
+
+    table = decode_cal_data_batch([CALRAM_EXAMPLE, modified_dump, CALRAM_EXAMPLE])
+    assert table.baseline()[1][3] == original_gain
+    assert [[delta.entry for delta in row if delta.is_changed] for row in table.diff()] == [[], [3, 4], []]
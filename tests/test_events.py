@@ -0,0 +1,94 @@
+"""Unit test for the SRQ event stream."""
+
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Copyright (C) 2020  Patrick Baus
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import asyncio
+from decimal import Decimal
+
+import pytest
+
+from hp3478a_async import HP_3478A
+from hp3478a_async.errors import DeviceError
+from hp3478a_async.events import DmmEventType, EventStream
+from hp3478a_async.flags import SerialPollFlags, SrqMask
+
+DATA_READY = SerialPollFlags.SRQ_ON_DATA_READY | SerialPollFlags.SRQ_ON_HAS_SRQ
+BUTTON = SerialPollFlags.SRQ_ON_SRQ_BUTTON | SerialPollFlags.SRQ_ON_HAS_SRQ
+SYNTAX_ERROR = SerialPollFlags.SRQ_ON_SYNTAX_ERROR | SerialPollFlags.SRQ_ON_HAS_SRQ
+
+
+class _FakeConnection:
+    """A stand-in for the GPIB connection, that replays the serial poll register of each service request."""
+
+    def __init__(self, status_bytes):
+        self.__status_bytes = list(status_bytes)
+        self.writes = []
+
+    async def write(self, data):
+        """Record the command."""
+        self.writes.append(data)
+
+    async def read(self, length=None):  # pylint: disable=unused-argument
+        """Return a reading."""
+        return b"+1.00000E+0\r\n"
+
+    async def wait(self, _mask):
+        """Return the next status byte."""
+        await asyncio.sleep(0)
+        return self.__status_bytes.pop(0).value
+
+
+def test_demultiplexing():
+    """Test that the button and errors are reported as events without ending the readings."""
+    connection = _FakeConnection([DATA_READY, BUTTON, DATA_READY | SYNTAX_ERROR, DATA_READY])
+    stream = EventStream(HP_3478A(connection))
+
+    async def run():
+        values = []
+        async for value in stream.read_all():
+            values.append(value)
+            if len(values) == 3:
+                break
+        return values, [event async for event in _take(stream.events(), 2)]
+
+    values, events = asyncio.run(run())
+    assert values == [Decimal(1)] * 3
+    assert [event.kind for event in events] == [DmmEventType.FRONT_PANEL_SRQ, DmmEventType.SYNTAX_ERROR]
+    assert connection.writes[0] == b"M75"  # All SRQs enabled
+    assert connection.writes.count(b"K") == 2  # The serial poll register is cleared after each event
+
+
+async def _take(generator, count):
+    async for item in generator:
+        yield item
+        count -= 1
+        if count == 0:
+            break
+
+
+def test_unexpected_srq():
+    """Test that a service request, that was not enabled as an event, still raises an error."""
+
+    async def run():
+        dmm = HP_3478A(_FakeConnection([BUTTON]))
+        async for _ in dmm.read_all(events=SrqMask.SYNTAX_ERROR):
+            pass
+
+    with pytest.raises(DeviceError):
+        asyncio.run(run())
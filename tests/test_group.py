@@ -0,0 +1,136 @@
+"""Unit test for the synchronized group acquisition."""
+
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Copyright (C) 2020  Patrick Baus
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import asyncio
+from decimal import Decimal
+
+import pytest
+
+from hp3478a_async import TriggerType
+from hp3478a_async.flags import SrqMask
+from hp3478a_async.group import GroupAcquisition
+
+
+class _FakeDmm:
+    """A stand-in for the DMM, that converts for a fixed time after being triggered."""
+
+    def __init__(self, value, conversion_time=0.01, overload=False):
+        self.__value = value
+        self.__conversion_time = conversion_time
+        self.__overload = overload
+        self.__triggered = None
+        self.trigger_type = None
+        self.srq_mask = None
+        self.triggers = 0
+
+    async def set_trigger(self, value):
+        """Record the trigger type."""
+        self.trigger_type = value
+
+    async def set_srq_mask(self, value):
+        """Record the SRQ mask."""
+        self.srq_mask = value
+
+    async def clear(self):
+        """Clear the serial poll register."""
+
+    async def trigger(self):
+        """Start a conversion."""
+        self.triggers += 1
+        self.__triggered.set()
+
+    def external_trigger(self):
+        """Start a conversion using the external trigger input."""
+        self.__triggered.set()
+
+    async def wait_for_data_ready(self):
+        """Wait for the trigger and the conversion."""
+        if self.__triggered is None:
+            self.__triggered = asyncio.Event()
+        await self.__triggered.wait()
+        self.__triggered.clear()
+        await asyncio.sleep(self.__conversion_time)
+
+    async def read(self):
+        """Return the reading."""
+        if self.__overload:
+            raise OverflowError("DMM input overloaded")
+        return self.__value
+
+
+def test_bus_trigger():
+    """Test that all DMMs are armed, triggered via the bus and the rows are aligned."""
+    dmms = [_FakeDmm(Decimal(1), 0.01), _FakeDmm(Decimal(2), 0.03), _FakeDmm(Decimal(3), overload=True)]
+
+    async def group_execute_trigger():
+        for dmm in dmms:
+            await dmm.trigger()
+
+    group = GroupAcquisition(dmms, trigger=group_execute_trigger)
+
+    async def run():
+        return [row async for row in group.acquire_all(count=3)]
+
+    rows = asyncio.run(run())
+    assert [row.index for row in rows] == [0, 1, 2]
+    assert rows[0].values[:2] == (Decimal(1), Decimal(2))
+    assert rows[0].values[2].is_nan()
+    assert all(dmm.trigger_type == TriggerType.HOLD and dmm.srq_mask == SrqMask.DATA_READY for dmm in dmms)
+    assert all(dmm.triggers == 3 for dmm in dmms)
+    assert all(row.trigger_time <= min(row.timestamps) for row in rows)
+    statistics = group.skew_statistics
+    assert statistics.count == 3
+    assert statistics.max == pytest.approx(0.02, abs=0.015)
+    assert statistics.mean <= statistics.max
+
+
+def test_external_trigger():
+    """Test that an external trigger callback is used instead of the bus trigger."""
+    dmms = [_FakeDmm(Decimal(1)), _FakeDmm(Decimal(2))]
+
+    async def pulse():
+        for dmm in dmms:
+            dmm.external_trigger()
+
+    async def run():
+        group = GroupAcquisition(dmms, trigger=pulse, external=True)
+        return await group.acquire()
+
+    row = asyncio.run(run())
+    assert row.values == (Decimal(1), Decimal(2))
+    assert all(dmm.trigger_type == TriggerType.EXTERNAL and dmm.triggers == 0 for dmm in dmms)
+
+
+def test_overload():
+    """Test that an overload is raised, if requested."""
+
+    dmm = _FakeDmm(Decimal(1), overload=True)
+
+    async def run():
+        await GroupAcquisition([dmm], trigger=dmm.trigger, nan_on_overload=False).acquire()
+
+    with pytest.raises(OverflowError):
+        asyncio.run(run())
+
+
+def test_trigger_required():
+    """Test that the DMMs are not triggered one after another, if no group trigger is given."""
+    with pytest.raises(ValueError):
+        GroupAcquisition([_FakeDmm(Decimal(1)), _FakeDmm(Decimal(2))])
@@ -0,0 +1,152 @@
+"""Unit test for the background health monitor."""
+
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Copyright (C) 2020  Patrick Baus
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import asyncio
+
+from hp3478a_async import HP_3478A, DmmStatus, FrontRearSwitchPosition, FunctionType, Range
+from hp3478a_async.flags import ErrorFlags, SerialPollFlags, StatusFlags
+from hp3478a_async.health import HealthEventType, HealthMonitor
+from hp3478a_async.priority_lock import Priority
+
+
+class _FakeDmm:
+    """A stand-in for the DMM, whose state can be changed and whose queries take a fixed time."""
+
+    def __init__(self, query_time=0.0):
+        self.__query_time = query_time
+        self.error_flags = ErrorFlags(0)
+        self.cal_ram_enabled = False
+        self.switch = FrontRearSwitchPosition.FRONT
+        self.queries = []
+
+    async def __query(self, name, priority):
+        self.queries.append((name, priority))
+        await asyncio.sleep(self.__query_time)
+
+    async def get_error_register(self, priority):
+        """Return the error register."""
+        await self.__query("E", priority)
+        return self.error_flags
+
+    async def get_status(self, priority):
+        """Return the status with the calibration enable flag."""
+        await self.__query("B", priority)
+        return DmmStatus(
+            function=FunctionType.DCV,
+            range=Range.RANGE_3,
+            ndigits=6,
+            status=StatusFlags.CAL_RAM_ENABLED if self.cal_ram_enabled else StatusFlags(0),
+            srq_flags=SerialPollFlags(0),
+            error_flags=self.error_flags,
+            dac_value=0,
+        )
+
+    async def get_front_rear_switch_position(self, priority):
+        """Return the switch position."""
+        await self.__query("S", priority)
+        return self.switch
+
+
+class _FakeConnection:
+    """A stand-in for the GPIB connection of a DMM in 2-wire ohms mode with the calibration RAM enabled."""
+
+    def __init__(self):
+        self.__command = b""
+
+    async def write(self, data):
+        """Remember the command to answer the next read."""
+        self.__command = data
+
+    async def read(self, length=None):  # pylint: disable=unused-argument
+        """Return the reply to the last query."""
+        command, self.__command = self.__command, b""
+        if command == b"B":
+            # 2-wire ohms, 30 kOhm range
+            return bytes(
+                [
+                    (FunctionType.OHM.value << 5) | ((Range.RANGE_30k.value - 1) << 2),
+                    StatusFlags.CAL_RAM_ENABLED.value,
+                    0,
+                    0,
+                    0,
+                ]
+            )
+        if command == b"E":
+            return b"000\r\n"
+        return b"1\r\n"  # Front terminals
+
+
+def test_change_events():
+    """Test that changes are reported and the first reading is not."""
+    dmm = _FakeDmm()
+
+    async def run():
+        async with HealthMonitor(dmm, interval=0.03) as monitor:
+            await asyncio.sleep(0.05)
+            assert monitor.front_rear_switch is FrontRearSwitchPosition.FRONT
+            dmm.switch = FrontRearSwitchPosition.REAR
+            dmm.cal_ram_enabled = True
+            events = []
+            async for event in monitor.events():
+                events.append(event)
+                if len(events) == 2:
+                    break
+        return events, monitor
+
+    events, monitor = asyncio.run(run())
+    assert {event.kind for event in events} == {HealthEventType.FRONT_REAR_SWITCH, HealthEventType.CAL_RAM_ENABLED}
+    switch_event = next(event for event in events if event.kind is HealthEventType.FRONT_REAR_SWITCH)
+    assert switch_event.previous is FrontRearSwitchPosition.FRONT
+    assert switch_event.current is FrontRearSwitchPosition.REAR
+    assert monitor.cal_ram_enabled is True
+    assert monitor.error_flags == ErrorFlags(0)
+    assert all(priority is Priority.LOW for _, priority in dmm.queries)
+
+
+def test_rate_limit():
+    """Test that slow queries stretch the interval to stay within the bus time fraction."""
+    dmm = _FakeDmm(query_time=0.01)
+
+    async def run():
+        async with HealthMonitor(dmm, interval=0.001, max_bus_fraction=0.1) as monitor:
+            await asyncio.sleep(0.3)
+            return monitor.bus_fraction
+
+    bus_fraction = asyncio.run(run())
+    # Each query takes 10 ms, so there are at most 3 queries in 300 ms
+    assert 1 <= len(dmm.queries) <= 4
+    assert bus_fraction <= 0.15
+
+
+def test_thermistor():
+    """Test monitoring a DMM measuring a thermistor."""
+    dmm = HP_3478A(_FakeConnection())
+
+    async def run():
+        await dmm.set_function(FunctionType.NTC)
+        async with HealthMonitor(dmm, interval=0.03) as monitor:
+            await asyncio.sleep(0.05)
+            return monitor
+
+    monitor = asyncio.run(run())
+    assert monitor.failed_checks == 0
+    assert monitor.cal_ram_enabled is True
+    assert monitor.front_rear_switch is FrontRearSwitchPosition.FRONT
+    assert dmm.configuration.function is FunctionType.NTC
@@ -0,0 +1,376 @@
+"""Unit test for the driver against a stand-in GPIB connection."""
+
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Copyright (C) 2020  Patrick Baus
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import asyncio
+import logging
+import time
+from decimal import Decimal
+
+import pytest
+
+from hp3478a_async import HP_3478A, FunctionType, Range, TriggerType
+from hp3478a_async.enums import DisplayType
+from hp3478a_async.flags import ErrorFlags, SerialPollFlags
+
+DATA_READY = SerialPollFlags.SRQ_ON_DATA_READY | SerialPollFlags.SRQ_ON_HAS_SRQ
+
+
+class _FlakyConnection:
+    """A stand-in for the GPIB connection, that raises the scripted errors and records the commands."""
+
+    def __init__(self, failures=None):
+        self.__failures = failures or {}
+        self.writes = []
+
+    def __fail(self, method):
+        failures = self.__failures.get(method)
+        if failures:
+            error = failures.pop(0)
+            if error is not None:
+                raise error
+
+    async def connect(self):
+        """Connect to the device."""
+        self.__fail("connect")
+
+    async def disconnect(self):
+        """Disconnect from the device."""
+
+    async def ibloc(self):
+        """Go to local."""
+
+    async def write(self, data):
+        """Record the command."""
+        self.writes.append(data)
+
+    async def read(self, length=None):  # pylint: disable=unused-argument
+        """Return a reading."""
+        self.__fail("read")
+        return b"+1.00000E+4\r\n"
+
+    async def wait(self, _mask):
+        """Signal a finished conversion."""
+        await asyncio.sleep(0)
+        self.__fail("wait")
+        return DATA_READY.value
+
+
+async def _configure(dmm):
+    await dmm.set_function(FunctionType.NTC)
+    await dmm.set_range(Range.RANGE_30k)
+    await dmm.set_number_of_digits(5)
+    await dmm.set_autozero(True)
+    await dmm.set_trigger(TriggerType.INTERNAL)
+
+
+def test_reconnect(caplog):
+    """Test that the readings resume after a lost connection and a timeout with the configuration restored."""
+    connection = _FlakyConnection(
+        {
+            "wait": [None, ConnectionError("cable unplugged")],
+            "connect": [None, OSError("no route to host"), OSError("no route to host"), None, None],
+            "read": [None, None, asyncio.TimeoutError()],
+        }
+    )
+    dmm = HP_3478A(connection)
+
+    async def run():
+        values = []
+        async with dmm:
+            await _configure(dmm)
+            async for value in dmm.read_all(reconnect=True, reconnect_interval=0.01):
+                values.append(value)
+                if len(values) == 4:
+                    break
+        return values
+
+    started = time.monotonic()
+    with caplog.at_level(logging.WARNING, logger="hp3478a_async.hp_3478a"):
+        values = asyncio.run(run())
+    assert time.monotonic() - started >= 0.02  # Waited the reconnect interval after each failed attempt
+    assert len(values) == 4
+    assert dmm.reconnect_count == 2
+    assert dmm.last_reconnect_gap is not None and dmm.last_reconnect_gap < 0.02  # No failed attempt the second time
+    assert [record.message.startswith("Reconnect attempt") for record in caplog.records].count(True) == 2
+    configuration = [b"F3", b"R4", b"N4", b"Z1", b"T1", b"M01"]
+    assert connection.writes == [b"D1M00"] + configuration + 2 * ([b"D1M00"] + configuration)
+    assert dmm.configuration.function is FunctionType.NTC
+
+
+def test_reconnect_attempts():
+    """Test that the error is raised, once the number of reconnect attempts is exceeded."""
+    connection = _FlakyConnection({"wait": [ConnectionError()], "connect": [OSError(), OSError()]})
+
+    async def run():
+        async for _ in HP_3478A(connection).read_all(reconnect=True, reconnect_interval=0.01, reconnect_attempts=2):
+            pass
+
+    with pytest.raises(OSError):
+        asyncio.run(run())
+
+
+class _QueryConnection:
+    """
+    A stand-in for the GPIB connection, that answers the queries. It yields to the event loop in between, so that
+    transactions, that are not serialized, get interleaved.
+    """
+
+    def __init__(self, fail_writes=False, write_time=0.0):
+        self.__fail_writes = fail_writes
+        self.__write_time = write_time
+        self.__command = b""
+        self.writes = []
+
+    async def write(self, data):
+        """Record the command."""
+        await asyncio.sleep(self.__write_time)
+        if self.__fail_writes:
+            raise OSError("write failed")
+        self.writes.append(data)
+        self.__command = data
+
+    async def read(self, length=None):  # pylint: disable=unused-argument
+        """Return the reply to the last command or a reading."""
+        await asyncio.sleep(0)
+        command, self.__command = self.__command, b""
+        if command == b"B":
+            return bytes([0b00110001, 0b00000001, 0, 0, 0])  # DCV, 30 V range, 5.5 digits
+        if command == b"E":
+            return b"000\r\n"
+        return b"+1.00000E+0\r\n"
+
+
+def test_command_batching():
+    """Test that the settings issued concurrently are sent in a single write."""
+    connection = _QueryConnection()
+    dmm = HP_3478A(connection)
+
+    async def run():
+        await asyncio.gather(
+            dmm.set_function(FunctionType.DCV),
+            dmm.set_range(Range.RANGE_30),
+            dmm.set_number_of_digits(5),
+            dmm.set_autozero(True),
+        )
+
+    asyncio.run(run())
+    assert connection.writes == [b"F1R1N4Z1"]
+
+
+def test_failed_batch():
+    """Test that a failed write is raised in all tasks, that issued a command of the batch."""
+    dmm = HP_3478A(_QueryConnection(fail_writes=True))
+
+    async def run():
+        return await asyncio.gather(
+            dmm.set_function(FunctionType.DCV),
+            dmm.set_range(Range.RANGE_30),
+            dmm.set_autozero(True),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(run())
+    assert len(results) == 3
+    assert all(isinstance(result, OSError) for result in results)
+
+
+def test_cancelled_batch():
+    """Test that the other tasks of a batch fail, if the task sending the batch is cancelled during the write."""
+    connection = _QueryConnection(write_time=0.1)
+    dmm = HP_3478A(connection)
+
+    async def run():
+        sender = asyncio.create_task(dmm.set_function(FunctionType.DCV))
+        other = asyncio.create_task(dmm.set_range(Range.RANGE_30))
+        await asyncio.sleep(0.01)
+        sender.cancel()
+        with pytest.raises(ConnectionError):
+            await other
+        assert sender.cancelled()
+
+    asyncio.run(run())
+    assert not connection.writes
+
+
+def test_write_order():
+    """Test that raw writes and the display text are sent in the order they were issued."""
+    connection = _QueryConnection()
+    dmm = HP_3478A(connection)
+
+    async def run():
+        await asyncio.gather(
+            dmm.set_function(FunctionType.DCV),
+            dmm.write(b"T3"),
+            dmm.set_range(Range.RANGE_30),
+            dmm.set_display(DisplayType.SHOW_TEXT, "HELLO"),
+            dmm.set_autozero(True),
+        )
+
+    asyncio.run(run())
+    assert connection.writes == [b"F1", b"T3", b"R1D2HELLO\n", b"Z1"]
+
+
+def test_concurrent_queries():
+    """Test that concurrent queries always receive their own reply."""
+    dmm = HP_3478A(_QueryConnection())
+
+    async def run():
+        return await asyncio.gather(dmm.get_status(), dmm.read(), dmm.get_error_register(), dmm.get_status())
+
+    status, value, errors, _ = asyncio.run(run())
+    assert status.function is FunctionType.DCV and status.range is Range.RANGE_30
+    assert value == Decimal(1)
+    assert errors == ErrorFlags.NONE
+
+
+class _PrologixConnection(_QueryConnection):
+    """A stand-in for a Prologix adapter, that checks that the serial polls do not get between a query and its reply."""
+
+    def __init__(self, srq_period=2, poll_time=0.0):
+        super().__init__()
+        self.__srq_period = srq_period
+        self.__poll_time = poll_time
+        self.__polls = 0
+        self.__query_pending = False
+
+    async def set_eot(self, _value):
+        """Disable the EOT character."""
+
+    def get_connection_timeout(self):
+        """Return the timeout of the connection."""
+        return 1.0
+
+    async def write(self, data):
+        """Record the command."""
+        await super().write(data)
+        self.__query_pending = data in (b"B", b"E")
+
+    async def read(self, length=None):
+        """Return the reply to the last command or a reading."""
+        self.__query_pending = False
+        return await super().read(length)
+
+    async def test_srq(self):
+        """Assert the SRQ line every few polls."""
+        assert not self.__query_pending
+        await asyncio.sleep(self.__poll_time)
+        self.__polls += 1
+        return self.__polls % self.__srq_period == 0
+
+    async def serial_poll(self):
+        """Return data ready."""
+        assert not self.__query_pending
+        await asyncio.sleep(0)
+        return DATA_READY.value
+
+    async def wait(self, _mask):
+        """The driver must poll using test_srq() and serial_poll()."""
+        raise AssertionError("wait() polls outside the bus lock")
+
+
+def test_prologix_srq_polling():
+    """Test that waiting for a service request using a Prologix adapter is not interleaved with queries."""
+    dmm = HP_3478A(_PrologixConnection(), srq_poll_interval=0)
+
+    async def poll_status():
+        for _ in range(20):
+            await dmm.get_status()
+            await dmm.get_error_register()
+
+    async def read(count):
+        values = []
+        async for value in dmm.read_all():
+            values.append(value)
+            if len(values) == count:
+                return values
+        return values
+
+    async def run():
+        return await asyncio.wait_for(asyncio.gather(read(5), poll_status()), timeout=5)
+
+    values, _ = asyncio.run(run())
+    assert values == [Decimal(1)] * 5
+
+
+def test_prologix_srq_poll_interval():
+    """Test that the time taken by a serial poll is part of the poll interval."""
+    dmm = HP_3478A(_PrologixConnection(srq_period=4, poll_time=0.04), srq_poll_interval=0.05)
+    assert dmm.srq_poll_interval == 0.05
+    assert HP_3478A(_QueryConnection()).srq_poll_interval is None
+
+    started = time.monotonic()
+    asyncio.run(dmm.wait_for_srq())
+    # Three intervals followed by the poll, that detects the service request
+    assert 0.19 <= time.monotonic() - started < 0.26
+
+
+class _ReadingConnection:
+    """A stand-in for the GPIB connection, that returns the scripted readings."""
+
+    def __init__(self, readings):
+        self.__readings = list(readings)
+
+    async def write(self, data):
+        """Accept the command."""
+
+    async def read(self, length=None):  # pylint: disable=unused-argument
+        """Return the next reading."""
+        return self.__readings.pop(0)
+
+    async def wait(self, _mask):
+        """Signal a finished conversion."""
+        await asyncio.sleep(0)
+        return DATA_READY.value
+
+
+READINGS = [b"+1.00000E+0\r\n", b"+9.99999E+9\r\n", b"+2.00000E+0\r\n", b"+9.99999E+9\r\n", b"+3.00000E+0\r\n"]
+
+
+def test_overload():
+    """Test that overloaded readings yield NaN and are counted without ending the readings."""
+    dmm = HP_3478A(_ReadingConnection(READINGS))
+
+    async def run():
+        values = []
+        async for value in dmm.read_all(nan_on_overload=True):
+            values.append(value)
+            if len(values) == len(READINGS):
+                return values
+        return values
+
+    values = asyncio.run(run())
+    assert values[0::2] == [Decimal(1), Decimal(2), Decimal(3)]
+    assert all(value.is_nan() for value in values[1::2])
+    assert dmm.overload_count == 2
+
+
+def test_overload_raises():
+    """Test that an overloaded reading ends the readings, if NaN is not requested."""
+    dmm = HP_3478A(_ReadingConnection(READINGS))
+    values = []
+
+    async def run():
+        async for value in dmm.read_all():
+            values.append(value)
+
+    with pytest.raises(OverflowError):
+        asyncio.run(run())
+    assert values == [Decimal(1)]
+    assert dmm.overload_count == 1
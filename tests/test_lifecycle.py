@@ -0,0 +1,129 @@
+"""Unit test for connecting and disconnecting the DMM."""
+
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Copyright (C) 2020  Patrick Baus
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import asyncio
+import time
+
+from hp3478a_async import HP_3478A, FunctionType, Range, TriggerType
+from hp3478a_async.flags import StatusFlags
+
+# DCV, 30 V range, 4.5 digits, internal trigger and autozero at 60 Hz with the SRQ mask cleared
+STATUS = bytes(
+    [
+        (FunctionType.DCV.value << 5) | ((Range.RANGE_30.value + 3) << 2) | 2,
+        (StatusFlags.INTERNAL_TRIGGER_ENABLED | StatusFlags.AUTO_ZERO_ENABLED).value,
+        0,
+        0,
+        0,
+    ]
+)
+
+
+class _FakeConnection:
+    """A stand-in for the GPIB connection, that records the commands and returns the status."""
+
+    def __init__(self, status=STATUS):
+        self.__status = status
+        self.writes = []
+
+    async def connect(self):
+        """Connect to the device."""
+
+    async def disconnect(self):
+        """Disconnect from the device."""
+
+    async def ibloc(self):
+        """Go to local."""
+        self.writes.append(b"GTL")
+
+    async def write(self, data):
+        """Record the command."""
+        self.writes.append(data)
+
+    async def read(self, length=None):  # pylint: disable=unused-argument
+        """Return the status."""
+        return self.__status
+
+
+def test_warm_connect():
+    """Test that settings, that are already set on the DMM, are not written again."""
+    connection = _FakeConnection()
+
+    async def run():
+        async with HP_3478A(connection, warm_connect=True) as dmm:
+            await asyncio.gather(
+                dmm.set_function(FunctionType.DCV),
+                dmm.set_range(Range.RANGE_30),
+                dmm.set_number_of_digits(4),
+                dmm.set_autozero(True),
+                dmm.set_trigger(TriggerType.INTERNAL),
+            )
+            await dmm.set_range(Range.RANGE_300)
+            await dmm.set_range(Range.RANGE_300)
+            await dmm.set_function(FunctionType.OHM)
+            await dmm.set_range(Range.RANGE_300)  # The range must be sent again after a function change
+
+    asyncio.run(run())
+    assert connection.writes == [b"B", b"D1", b"R2", b"F3", b"R2", b"GTL"]
+
+
+def test_warm_connect_thermistor():
+    """Test that selecting the thermistor function does not rewrite the resistance function set on the DMM."""
+    # 2-wire ohms, 30 kOhm range
+    connection = _FakeConnection(
+        bytes([(FunctionType.OHM.value << 5) | ((Range.RANGE_30k.value - 1) << 2) | 2]) + STATUS[1:]
+    )
+
+    async def run():
+        async with HP_3478A(connection, warm_connect=True) as dmm:
+            await dmm.set_function(FunctionType.NTC)
+            await dmm.set_range(Range.RANGE_30k)
+            assert dmm.configuration.function is FunctionType.NTC
+
+    asyncio.run(run())
+    assert connection.writes == [b"B", b"D1", b"GTL"]
+
+
+def test_cold_connect():
+    """Test that all settings are written without warm connect."""
+    connection = _FakeConnection()
+
+    async def run():
+        async with HP_3478A(connection) as dmm:
+            await dmm.set_autozero(True)
+
+    asyncio.run(run())
+    assert connection.writes == [b"D1M00", b"Z1", b"GTL"]
+
+
+def test_disconnect_delay():
+    """Test that the disconnect only waits for the conversion in progress."""
+
+    async def disconnect(trigger):
+        dmm = HP_3478A(_FakeConnection(), warm_connect=True)
+        await dmm.connect()
+        await dmm.set_trigger(trigger)
+        started = time.monotonic()
+        await dmm.disconnect()
+        return time.monotonic() - started
+
+    assert asyncio.run(disconnect(TriggerType.HOLD)) < 0.005
+    # 0.1 PLC with autozero at 60 Hz
+    assert 0.01 < asyncio.run(disconnect(TriggerType.INTERNAL)) < 0.1
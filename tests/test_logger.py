@@ -0,0 +1,103 @@
+"""Unit test for the measurement logger."""
+
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Copyright (C) 2020  Patrick Baus
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import asyncio
+import io
+from decimal import Decimal
+
+import pytest
+
+from hp3478a_async.logger import BINARY_RECORD, BinarySink, CsvSink, Sink, _parse_args, log_readings, main
+
+
+class _FakeDmm:  # pylint: disable=too-few-public-methods
+    """A stand-in for the DMM, that returns a sequence of readings."""
+
+    def __init__(self, values):
+        self.__values = values
+
+    async def read_all(self, **_kwargs):
+        """Return the readings with a short delay."""
+        for value in self.__values:
+            await asyncio.sleep(0.001)
+            yield Decimal(value)
+
+
+def test_csv_logging():
+    """Test logging multiple DMMs to a CSV file with batched writes."""
+    file = io.BytesIO()
+    dmms = [_FakeDmm(["1.5", "2.5", "3.5"]), _FakeDmm(["300.15", "301.15", "302.15"])]
+    statistics = asyncio.run(log_readings(dmms, CsvSink(file, batch_size=2), count=2, flush_interval=10))
+    lines = file.getvalue().decode().splitlines()
+    assert lines[0] == "device,timestamp,value"
+    rows = sorted((int(device), value) for device, _, value in (line.split(",") for line in lines[1:]))
+    assert rows == [(0, "1.5"), (0, "2.5"), (1, "300.15"), (1, "301.15")]
+    assert statistics.readings == (2, 2)
+
+
+def test_binary_logging():
+    """Test the binary record format and the temperature conversion."""
+    file = io.BytesIO()
+    asyncio.run(log_readings([_FakeDmm(["273.15", "274.15"])], BinarySink(file), celsius=True))
+    records = list(BINARY_RECORD.iter_unpack(file.getvalue()))
+    assert [(device, value) for device, _, value in records] == [(0, 0.0), (0, 1.0)]
+
+
+@pytest.mark.parametrize("meter", ["prologix", "prologix:127.0.0.1:x", "serial:/dev/ttyUSB0:27"])
+def test_invalid_meter(meter, tmp_path):
+    """Test that invalid meter addresses are reported."""
+    assert main([meter, "--output", str(tmp_path / "log.csv")]) == 1
+
+
+def test_invalid_transform(tmp_path):
+    """Test that unknown transforms are rejected."""
+    with pytest.raises(SystemExit):
+        main(["prologix:127.0.0.1:27", "--output", str(tmp_path / "log.csv"), "--transform", "unknown:scale=1"])
+
+
+def test_ntc_requires_parameters(tmp_path):
+    """Test that the NTC function requires the thermistor parameters."""
+    with pytest.raises(SystemExit):
+        main(["prologix:127.0.0.1:27", "--output", str(tmp_path / "log.csv"), "--function", "NTC"])
+
+
+def test_celsius_requires_temperature(tmp_path):
+    """Test that readings, which are not temperatures in K, cannot be converted to °C."""
+    output = ["--output", str(tmp_path / "log.csv")]
+    with pytest.raises(SystemExit):
+        _parse_args(["prologix:127.0.0.1:27", *output, "--function", "DCV", "--celsius"])
+    with pytest.raises(SystemExit):
+        _parse_args(["prologix:127.0.0.1:27", *output, "--transform", "linear:scale=10", "--celsius"])
+    assert _parse_args(
+        ["prologix:127.0.0.1:27", *output, "--function", "OHM", "--transform", "rtd", "--celsius"]
+    ).celsius
+    assert _parse_args(
+        ["prologix:127.0.0.1:27", *output, "--function", "NTC", "--ntc", "10000", "1", "2", "3", "4", "--celsius"]
+    ).celsius
+
+
+def test_incomplete_sink():
+    """Test that a sink without an encoder cannot be created."""
+
+    class _IncompleteSink(Sink):  # pylint: disable=abstract-method,too-few-public-methods
+        """A sink, that does not implement encode()."""
+
+    with pytest.raises(TypeError):
+        _IncompleteSink(io.BytesIO())  # pylint: disable=abstract-class-instantiated
@@ -0,0 +1,125 @@
+"""Unit test for the metrics exporter."""
+
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Copyright (C) 2020  Patrick Baus
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import asyncio
+
+from hp3478a_async import HP_3478A
+from hp3478a_async.flags import SerialPollFlags
+from hp3478a_async.metrics import InstrumentMetrics, MetricsExporter
+
+DATA_READY = SerialPollFlags.SRQ_ON_DATA_READY | SerialPollFlags.SRQ_ON_HAS_SRQ
+
+
+class _FakeConnection:
+    """A stand-in for the GPIB connection, that returns an overload every third reading."""
+
+    def __init__(self):
+        self.__readings = 0
+
+    def __str__(self):
+        return "dmm"
+
+    async def write(self, data):
+        """Accept the command."""
+
+    async def read(self, length=None):  # pylint: disable=unused-argument
+        """Return a reading."""
+        self.__readings += 1
+        return b"+9.99999E+9\r\n" if self.__readings % 3 == 0 else b"+1.00000E+0\r\n"
+
+    async def wait(self, _mask):
+        """Signal a finished conversion."""
+        await asyncio.sleep(0)
+        return DATA_READY.value
+
+
+async def _read(dmm, count):
+    readings = 0
+    async for _ in dmm.read_all(nan_on_overload=True):
+        readings += 1
+        if readings == count:
+            break
+
+
+def test_render():
+    """Test that the readings, overloads and latencies are exported."""
+    exporter = MetricsExporter()
+    dmm = HP_3478A(_FakeConnection())
+    metrics = exporter.add_instrument(dmm, dropped_samples=lambda: 2)
+    asyncio.run(_read(dmm, 4))
+
+    text = exporter.render()
+    assert dmm.metrics is metrics
+    assert metrics.readings == 4
+    assert 'hp3478a_readings_total{instrument="dmm"} 4' in text
+    assert 'hp3478a_overloads_total{instrument="dmm"} 1' in text
+    assert 'hp3478a_dropped_samples_total{instrument="dmm"} 2' in text
+    assert 'hp3478a_srq_wait_seconds_count{instrument="dmm"} 4' in text
+    assert 'hp3478a_command_latency_seconds{instrument="dmm",command="read",quantile="0.99"}' in text
+    assert 'hp3478a_command_latency_seconds_count{instrument="dmm",command="command"} 1' in text
+    assert "# TYPE hp3478a_reading_rate gauge" in text
+
+    exporter.remove_instrument("dmm")
+    assert dmm.metrics is None
+    assert exporter.render() == "\n"
+
+
+def test_quantiles():
+    """Test the latency quantiles calculated from the most recent transactions."""
+    metrics = InstrumentMetrics(window=100)
+    for duration in range(200):
+        metrics.record_latency("B", duration / 1000)
+    assert metrics.commands == ("B",)
+    assert metrics.latency_quantiles("B") == [(0.5, 0.15), (0.9, 0.19), (0.99, 0.199)]
+    assert not metrics.latency_quantiles("S")
+
+
+def test_http_server():
+    """Test scraping the metrics via HTTP."""
+
+    async def get(path):
+        async with MetricsExporter() as exporter:
+            exporter.add_instrument(HP_3478A(_FakeConnection()), name='bench "1"')
+            port = await exporter.start_server(port=0)
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode("ascii"))
+            response = await reader.read()
+            writer.close()
+            return response
+
+    response = asyncio.run(get("/metrics"))
+    assert response.startswith(b"HTTP/1.0 200 OK\r\n")
+    assert b'hp3478a_readings_total{instrument="bench \\"1\\""} 0' in response
+    assert asyncio.run(get("/other")).startswith(b"HTTP/1.0 404 Not Found\r\n")
+
+
+def test_file_export(tmp_path):
+    """Test writing the metrics for the textfile collector."""
+    path = tmp_path / "hp3478a.prom"
+
+    async def run():
+        async with MetricsExporter() as exporter:
+            exporter.add_instrument(HP_3478A(_FakeConnection()))
+            exporter.start_file_export(str(path), interval=0.01)
+            await asyncio.sleep(0.05)
+
+    asyncio.run(run())
+    assert 'hp3478a_reconnects_total{instrument="dmm"} 0' in path.read_text(encoding="utf-8")
+    assert not (tmp_path / "hp3478a.prom.tmp").exists()
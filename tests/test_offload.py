@@ -0,0 +1,141 @@
+"""Unit test for the post-processing executor stage."""
+
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Copyright (C) 2020  Patrick Baus
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from decimal import Decimal
+
+import pytest
+
+from hp3478a_async import HP_3478A, NtcParameters
+from hp3478a_async.offload import OffloadedReader
+from hp3478a_async.transforms import NtcTransform, TransformPipeline
+
+NTC_PARAMETERS = NtcParameters(a=3.35318065e-03, b=2.93792361e-04, c=4.04412336e-06, d=1.88475068e-07, rt25=5000)
+PIPELINE = TransformPipeline(NtcTransform(NTC_PARAMETERS))
+
+
+class _FakeDmm:  # pylint: disable=too-few-public-methods
+    """A stand-in for a DMM measuring an NTC thermistor."""
+
+    def __init__(self, values):
+        self.__values = values
+        self.kwargs = None
+
+    @property
+    def post_processor(self):
+        """Convert the resistance of the thermistor."""
+        return PIPELINE.decimal
+
+    async def read_all(self, **kwargs):
+        """Return the raw readings."""
+        self.kwargs = kwargs
+        for value in self.__values:
+            await asyncio.sleep(0)
+            yield value
+
+
+async def _read(reader, **kwargs):
+    return [value async for value in reader.read_all(**kwargs)]
+
+
+@pytest.mark.parametrize("executor_type", [None, ThreadPoolExecutor, ProcessPoolExecutor])
+def test_order_and_post_processing(executor_type):
+    """Test that the readings are post-processed in the executor and returned in order."""
+    values = [Decimal(5000 + i) for i in range(25)] + [Decimal("NaN"), b"raw"]
+    executor = executor_type(max_workers=2) if executor_type is not None else None
+    try:
+        dmm = _FakeDmm(values)
+        results = asyncio.run(_read(OffloadedReader(dmm, executor=executor, batch_size=4), nan_on_overload=True))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    assert dmm.kwargs == {"post_process": False, "nan_on_overload": True}
+    assert results[:25] == [PIPELINE.decimal(value) for value in values[:25]]
+    assert results[25].is_nan()
+    assert results[26] == b"raw"
+
+
+def test_user_function():
+    """Test that the user function is applied after the post-processing of the DMM."""
+    results = asyncio.run(_read(OffloadedReader(_FakeDmm([Decimal(5000)]), function=float)))
+    assert results == [pytest.approx(298.2, abs=0.1)]
+
+
+def test_post_processor():
+    """Test that the driver exposes the post-processing of the special function only."""
+    assert HP_3478A(connection=None).post_processor is None
+
+
+class _StallingDmm(_FakeDmm):  # pylint: disable=too-few-public-methods
+    """A stand-in for a DMM, that stops returning readings or fails after a few readings."""
+
+    def __init__(self, values, error=None):
+        super().__init__(values)
+        self.__error = error
+
+    async def read_all(self, **kwargs):
+        """Return the raw readings, then stall or fail."""
+        async for value in super().read_all(**kwargs):
+            yield value
+        if self.__error is not None:
+            raise self.__error
+        await asyncio.Event().wait()
+
+
+def test_partial_batch_dropped():
+    """Test that the partial batch is not processed, once the reader is closed."""
+    processed = []
+
+    def process(value):
+        processed.append(value)
+        return value
+
+    async def run():
+        reader = OffloadedReader(
+            _StallingDmm([Decimal(5000 + i) for i in range(6)]), function=process, batch_size=4, max_delay=10
+        )
+        results = reader.read_all()
+        try:
+            for _ in range(4):
+                await results.__anext__()
+            await asyncio.sleep(0.01)  # Let the acquisition start the next batch
+        finally:
+            await results.aclose()
+        await asyncio.sleep(0.05)  # Give the executor the time to process a batch submitted by mistake
+
+    asyncio.run(run())
+    assert len(processed) == 4
+
+
+def test_partial_batch_on_error():
+    """Test that the readings of the partial batch are returned before the error of the acquisition is raised."""
+    results = []
+
+    async def run():
+        reader = OffloadedReader(
+            _StallingDmm([Decimal(5000 + i) for i in range(6)], ConnectionError()), batch_size=4, max_delay=10
+        )
+        async for result in reader.read_all():
+            results.append(result)
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(run())
+    assert len(results) == 6
@@ -0,0 +1,50 @@
+"""Unit test for the measurement settings planner."""
+
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Copyright (C) 2020  Patrick Baus
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import pytest
+
+from hp3478a_async.planner import MeasurementPlanner, WaitStrategy
+
+
+@pytest.mark.parametrize(
+    "line_frequency, target_rate, noise_floor, expected",
+    [
+        (50, 1, None, (6, True, WaitStrategy.SRQ)),  # 10 PLC with autozero takes 410 ms
+        (50, 3, None, (6, False, WaitStrategy.SRQ)),
+        (60, 5, None, (6, False, WaitStrategy.SRQ)),  # 10 PLC at 60 Hz takes 177 ms
+        (50, 20, None, (5, True, WaitStrategy.SRQ)),
+        (50, 30, None, (5, False, WaitStrategy.BLOCKING_READ)),  # 1 PLC takes 30 ms
+        (50, 40, None, (4, True, WaitStrategy.BLOCKING_READ)),
+        (50, None, 1e-4, (5, False, WaitStrategy.BLOCKING_READ)),
+        (50, None, 1e-3, (4, False, WaitStrategy.BLOCKING_READ)),
+        (50, 1, 1e-4, (6, True, WaitStrategy.SRQ)),
+    ],
+)
+def test_plan(line_frequency, target_rate, noise_floor, expected):
+    """Test the selection of the settings against the nominal conversion times."""
+    plan = MeasurementPlanner(line_frequency=line_frequency).plan(target_rate=target_rate, noise_floor=noise_floor)
+    assert (plan.ndigits, plan.autozero, plan.wait_strategy) == expected
+    assert target_rate is None or plan.readings_per_second >= target_rate
+
+
+def test_impossible_plan():
+    """Test that targets, that cannot be met, are rejected."""
+    with pytest.raises(ValueError):
+        MeasurementPlanner().plan(target_rate=10, noise_floor=1e-5)
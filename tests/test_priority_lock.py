@@ -0,0 +1,74 @@
+"""Unit test for the priority lock used to schedule the bus transactions."""
+
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Copyright (C) 2020  Patrick Baus
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import asyncio
+
+import pytest
+
+from hp3478a_async.priority_lock import Priority, PriorityLock
+
+
+async def _acquire_in_order(priorities):
+    lock = PriorityLock()
+    order = []
+
+    async def worker(idx, priority):
+        async with lock(priority):
+            order.append(idx)
+            await asyncio.sleep(0)
+
+    await lock.acquire()
+    tasks = [asyncio.create_task(worker(idx, priority)) for idx, priority in enumerate(priorities)]
+    await asyncio.sleep(0)  # Let all workers queue up
+    lock.release()
+    await asyncio.gather(*tasks)
+    assert not lock.locked()
+    return order
+
+
+def test_priority_order():
+    """Test that waiters are served by priority and first come, first served within the same priority."""
+    priorities = [Priority.LOW, Priority.NORMAL, Priority.URGENT, Priority.HIGH, Priority.NORMAL]
+    assert asyncio.run(_acquire_in_order(priorities)) == [2, 3, 1, 4, 0]
+
+
+async def _cancel_waiter():
+    lock = PriorityLock()
+    await lock.acquire()
+    waiter = asyncio.create_task(lock.acquire(Priority.URGENT))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    await asyncio.sleep(0)
+    lock.release()
+    assert not lock.locked()
+    await lock.acquire()  # Must not deadlock
+    lock.release()
+    return waiter.cancelled()
+
+
+def test_cancelled_waiter():
+    """Test that a cancelled waiter does not receive the lock."""
+    assert asyncio.run(_cancel_waiter())
+
+
+def test_release_unlocked():
+    """Test that releasing a free lock raises an error."""
+    with pytest.raises(RuntimeError):
+        PriorityLock().release()
@@ -0,0 +1,100 @@
+"""Unit test for the multiplexer scan engine."""
+
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Copyright (C) 2020  Patrick Baus
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import asyncio
+from decimal import Decimal
+
+from hp3478a_async import DmmConfiguration, FunctionType, Range
+from hp3478a_async.scanner import ScanChannel, Scanner
+
+
+class _FakeDmm:
+    """A stand-in for the DMM, that logs all calls."""
+
+    def __init__(self, log):
+        self.log = log
+        self.configuration = DmmConfiguration()
+
+    async def set_srq_mask(self, value):
+        """Set the SRQ mask."""
+        self.configuration.srq_mask = value
+
+    async def set_function(self, value):
+        """Set the function."""
+        self.log.append(("function", value))
+        self.configuration.function = value
+
+    async def set_range(self, value):
+        """Set the range."""
+        self.log.append(("range", value))
+        self.configuration.range = value
+
+    async def set_number_of_digits(self, value):
+        """Set the number of digits."""
+        self.configuration.ndigits = value
+
+    async def set_trigger(self, value):
+        """Trigger a conversion."""
+        self.log.append(("trigger", value))
+
+    async def wait_for_data_ready(self):
+        """Wait for the end of the conversion."""
+        await asyncio.sleep(0)
+
+    async def read(self):
+        """Read out the conversion, which takes longer than switching."""
+        self.log.append(("read_start", None))
+        await asyncio.sleep(0.01)
+        self.log.append(("read_end", None))
+        return Decimal(1)
+
+
+async def _scan():
+    log = []
+
+    async def switch(channel):
+        log.append(("switch", channel.channel))
+
+    channels = [
+        ScanChannel(channel=1, function=FunctionType.DCV, range=Range.RANGE_3, ndigits=5),
+        ScanChannel(channel=2, function=FunctionType.OHM, range=Range.RANGE_30k, ndigits=5, settle_time=0.001),
+        ScanChannel(channel=3, function=FunctionType.DCV, range=Range.RANGE_3, ndigits=5),
+    ]
+    scanner = Scanner(_FakeDmm(log), channels, switch)
+    results = [result async for result in scanner.scan_all(passes=1)][0]
+    return scanner, results, log
+
+
+def test_scanner():
+    """Test channel grouping and that switching overlaps with the readout."""
+    scanner, results, log = asyncio.run(_scan())
+    assert [channel.channel for channel in scanner.channels] == [1, 3, 2]
+    assert [result.channel for result in results] == [1, 3, 2]
+    # The DCV settings are only set once for channels 1 and 3
+    assert [entry for entry in log if entry[0] in ("function", "range")] == [
+        ("function", FunctionType.DCV),
+        ("range", Range.RANGE_3),
+        ("function", FunctionType.OHM),
+        ("range", Range.RANGE_30k),
+    ]
+    # Switching to the next channel happens during the readout of the previous one
+    read_ends = [idx for idx, entry in enumerate(log) if entry[0] == "read_end"]
+    assert read_ends[0] > log.index(("switch", 3)) > log.index(("read_start", None))
+    assert read_ends[1] > log.index(("switch", 2))
@@ -0,0 +1,255 @@
+"""
+Soak test of the driver against a simulated DMM. Readings, status polling and calibration memory reads run for hours of
+simulated time, while the memory usage and the latencies are sampled. The test fails, if they trend upward.
+
+Set the environment variable `HP3478A_SOAK_HOURS` to change the simulated duration.
+"""
+
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Copyright (C) 2020  Patrick Baus
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import asyncio
+import gc
+import heapq
+import itertools
+import os
+import statistics
+import time
+import tracemalloc
+from dataclasses import dataclass
+from decimal import Decimal
+
+import pytest
+
+from hp3478a_async import HP_3478A, FunctionType, Range, TriggerType
+from hp3478a_async.flags import SerialPollFlags, SrqMask, StatusFlags
+
+SOAK_HOURS = float(os.environ.get("HP3478A_SOAK_HOURS", "4"))
+CONVERSION_TIME = 0.5  # 10 PLC with autozero at 50 Hz
+STATUS_INTERVAL = 10.0
+CAL_RAM_INTERVAL = 1800.0
+WINDOW = 900.0  # The simulated time in seconds between two samples
+WARM_UP_WINDOWS = 2  # Caches and the allocator settle during the first windows
+
+DATA_READY = SerialPollFlags.SRQ_ON_DATA_READY | SerialPollFlags.SRQ_ON_HAS_SRQ
+STATUS = bytes(
+    [
+        (FunctionType.DCV.value << 5) | ((Range.RANGE_30.value + 3) << 2) | 1,
+        (StatusFlags.EXTERNAL_TRIGGER_ENABLED | StatusFlags.AUTO_ZERO_ENABLED).value,
+        SrqMask.DATA_READY.value,
+        0,
+        0,
+    ]
+)
+
+
+class _SimulatedClock:
+    """The simulated time. It is advanced by the conversions of the DMM."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.__sleepers = []
+        self.__counter = itertools.count()  # Breaks ties between sleepers with the same deadline
+
+    async def sleep(self, delay):
+        """Wait for the simulated time to pass."""
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.__sleepers, (self.now + delay, next(self.__counter), future))
+        await future
+
+    def advance(self, delay):
+        """Advance the time and wake up the sleepers, that are due."""
+        self.now += delay
+        while self.__sleepers and self.__sleepers[0][0] <= self.now:
+            _, _, future = heapq.heappop(self.__sleepers)
+            future.set_result(None)
+
+
+class _SimulatedConnection:
+    """A stand-in for the GPIB connection, that simulates the conversions, the status and the calibration memory."""
+
+    def __init__(self, clock):
+        self.__clock = clock
+        self.__last_command = b""
+        self.__readings = 0
+
+    async def connect(self):
+        """Connect to the device."""
+
+    async def disconnect(self):
+        """Disconnect from the device."""
+
+    async def ibloc(self):
+        """Go to local."""
+
+    async def write(self, data):
+        """Remember the command to answer the next read."""
+        self.__last_command = data
+
+    async def read(self, length=None):  # pylint: disable=unused-argument
+        """Return a reading, the status or a nibble of the calibration memory."""
+        command, self.__last_command = self.__last_command, b""  # Only the next read answers the query
+        if command == b"B":
+            return STATUS
+        if command[:1] == b"W":
+            return bytes([0x40 | (command[1] & 0x0F)])
+        self.__readings += 1
+        # Vary the readings to allocate new Decimals and include the occasional overload
+        if self.__readings % 1000 == 0:
+            return b"+9.99999E+9\r\n"
+        return f"+{self.__readings % 30000 / 1000:.5f}E+0\r\n".encode("ascii")
+
+    async def wait(self, _mask):
+        """Let a conversion pass and signal data ready."""
+        await asyncio.sleep(0)
+        self.__clock.advance(CONVERSION_TIME)
+        await asyncio.sleep(0)  # Let the pollers woken up use the bus first
+        return DATA_READY.value
+
+
+@dataclass(frozen=True)
+class _Sample:
+    """The resource usage and latencies of one window of simulated time."""
+
+    rss: int | None  # The resident set size in bytes, if available
+    traced_memory: int  # The size of the memory blocks allocated by Python
+    traced_blocks: int  # The number of memory blocks allocated by Python
+    reading_p50: float
+    reading_p99: float
+    status_p50: float
+    status_p99: float
+
+
+def _rss():
+    try:
+        with open("/proc/self/statm", encoding="ascii") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None  # Not on Linux
+
+
+def _percentile(values, quantile):
+    values = sorted(values)
+    return values[min(int(quantile * len(values)), len(values) - 1)]
+
+
+def _take_sample(reading_latencies, status_latencies):
+    gc.collect()
+    # Only count the allocations of the driver and the libraries it uses, not those of the harness
+    snapshot = tracemalloc.take_snapshot().filter_traces(
+        [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+    )
+    statistics_by_file = snapshot.statistics("filename")
+    return _Sample(
+        rss=_rss(),
+        traced_memory=sum(stat.size for stat in statistics_by_file),
+        traced_blocks=sum(stat.count for stat in statistics_by_file),
+        reading_p50=_percentile(reading_latencies, 0.5),
+        reading_p99=_percentile(reading_latencies, 0.99),
+        status_p50=_percentile(status_latencies, 0.5),
+        status_p99=_percentile(status_latencies, 0.99),
+    )
+
+
+def _is_rising(values, absolute_tolerance, relative_tolerance=0.0):
+    """
+    Compare the median of the last third of the values to the median of the first third. Using the medians makes the
+    test robust against single outliers, e.g. caused by the garbage collector or other processes.
+    """
+    third = max(len(values) // 3, 1)
+    first, last = statistics.median(values[:third]), statistics.median(values[-third:])
+    return last > first * (1 + relative_tolerance) + absolute_tolerance
+
+
+async def _soak(duration):
+    clock = _SimulatedClock()
+    dmm = HP_3478A(_SimulatedConnection(clock))
+    samples = []
+    reading_latencies, status_latencies = [], []
+    cal_ram_reads = 0
+
+    async def poll_status():
+        while "not cancelled":
+            await clock.sleep(STATUS_INTERVAL)
+            started = time.perf_counter()
+            await dmm.get_status()
+            status_latencies.append(time.perf_counter() - started)
+
+    async def read_cal_ram():
+        nonlocal cal_ram_reads
+        while "not cancelled":
+            await clock.sleep(CAL_RAM_INTERVAL)
+            assert len(await dmm.get_cal_ram()) == 256
+            cal_ram_reads += 1
+
+    async with dmm:
+        await dmm.set_function(FunctionType.DCV)
+        await dmm.set_range(Range.RANGE_30)
+        await dmm.set_number_of_digits(5)
+        await dmm.set_trigger(TriggerType.INTERNAL)
+        pollers = [asyncio.create_task(poll_status()), asyncio.create_task(read_cal_ram())]
+        try:
+            next_sample = WINDOW
+            last_reading = time.perf_counter()
+            async for value in dmm.read_all(nan_on_overload=True):
+                assert isinstance(value, Decimal)
+                now = time.perf_counter()
+                reading_latencies.append(now - last_reading)
+                if clock.now >= next_sample:
+                    samples.append(_take_sample(reading_latencies, status_latencies))
+                    reading_latencies.clear()
+                    status_latencies.clear()
+                    next_sample += WINDOW
+                    if clock.now >= duration:
+                        break
+                last_reading = time.perf_counter()  # The sampling is not part of the latency
+        finally:
+            for poller in pollers:
+                poller.cancel()
+            await asyncio.gather(*pollers, return_exceptions=True)
+    return samples, cal_ram_reads
+
+
+@pytest.mark.slow
+def test_soak():
+    """Test that the memory usage and the latencies do not grow over hours of simulated operation."""
+    tracemalloc.start()
+    try:
+        samples, cal_ram_reads = asyncio.run(_soak(SOAK_HOURS * 3600))
+    finally:
+        tracemalloc.stop()
+    assert cal_ram_reads == int(SOAK_HOURS * 3600 // CAL_RAM_INTERVAL)
+    samples = samples[WARM_UP_WINDOWS:]
+    assert len(samples) >= 3
+
+    def series(name):
+        return [getattr(sample, name) for sample in samples]
+
+    assert not _is_rising(series("traced_memory"), absolute_tolerance=64 * 1024), series("traced_memory")
+    assert not _is_rising(series("traced_blocks"), absolute_tolerance=500), series("traced_blocks")
+    if samples[0].rss is not None:
+        assert not _is_rising(series("rss"), absolute_tolerance=4 * 1024**2), series("rss")
+    for name in ("reading_p50", "reading_p99", "status_p50", "status_p99"):
+        assert not _is_rising(series(name), absolute_tolerance=0.001, relative_tolerance=1.0), (name, series(name))
+
+
+def test_trend_detection():
+    """Test that a steady growth is detected, while noise and single outliers are not."""
+    assert _is_rising([100, 110, 120, 130, 140, 150], absolute_tolerance=25)
+    assert not _is_rising([100, 102, 99, 500, 101, 100], absolute_tolerance=25)
+    assert not _is_rising([1.0, 1.5, 1.2, 1.4], absolute_tolerance=0, relative_tolerance=1.0)
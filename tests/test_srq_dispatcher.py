@@ -0,0 +1,193 @@
+"""Unit test for the SRQ dispatcher."""
+
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Copyright (C) 2020  Patrick Baus
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import asyncio
+import queue
+import threading
+
+import pytest
+
+from hp3478a_async import HP_3478A
+from hp3478a_async.errors import DeviceError
+from hp3478a_async.flags import SerialPollFlags
+from hp3478a_async.srq_dispatcher import SrqDispatcher
+
+DATA_READY = SerialPollFlags.SRQ_ON_DATA_READY | SerialPollFlags.SRQ_ON_HAS_SRQ
+
+
+class _FakeBoard:
+    """A stand-in for a linux-gpib board, that asserts the SRQ line or raises the errors put into its queue."""
+
+    def __init__(self):
+        self.events = queue.Queue()
+        self.threads = set()
+        self.is_open = False
+
+    def open(self):
+        """Open the board."""
+        self.is_open = True
+
+    def close(self):
+        """Close the board."""
+        self.is_open = False
+
+    def wait_for_srq(self):
+        """Wait up to 10 ms for the SRQ line."""
+        self.threads.add(threading.current_thread())
+        try:
+            event = self.events.get(timeout=0.01)
+        except queue.Empty:
+            return False
+        if isinstance(event, Exception):
+            raise event
+        return True
+
+
+class _FakeConnection:
+    """
+    A stand-in for the GPIB connection of a device, that returns its status byte once and checks, that the serial polls
+    do not get between a query and its reply.
+    """
+
+    def __init__(self):
+        self.status_byte = 0
+        self.__query_pending = False
+
+    async def write(self, data):
+        """Start a query."""
+        await asyncio.sleep(0)
+        self.__query_pending = data == b"B"
+
+    async def read(self, length=None):  # pylint: disable=unused-argument
+        """Return the status."""
+        await asyncio.sleep(0.01)
+        self.__query_pending = False
+        return bytes([0b00110001, 0b00000001, 0, 0, 0])
+
+    async def serial_poll(self):
+        """Return the status byte and clear the service request."""
+        assert not self.__query_pending
+        await asyncio.sleep(0)
+        status_byte, self.status_byte = self.status_byte, 0
+        return status_byte
+
+
+def test_fan_out():
+    """Test that the service requests of many devices are dispatched using a single thread."""
+    board = _FakeBoard()
+    connections = [_FakeConnection() for _ in range(8)]
+
+    async def run():
+        dmms = [HP_3478A(connection=connection) for connection in connections]
+        async with SrqDispatcher(board) as dispatcher:
+            for pad, dmm in enumerate(dmms):
+                dispatcher.register(dmm, pad)
+            waits = [asyncio.create_task(dmm.wait_for_data_ready()) for dmm in dmms]
+            await asyncio.sleep(0.02)
+            for connection in connections[:4]:
+                connection.status_byte = DATA_READY.value
+            board.events.put(True)
+            await asyncio.wait_for(asyncio.gather(*waits[:4]), timeout=1)
+            assert not any(wait.done() for wait in waits[4:])
+            for connection in connections[4:]:
+                connection.status_byte = DATA_READY.value
+            board.events.put(True)
+            await asyncio.wait_for(asyncio.gather(*waits), timeout=1)
+            assert board.is_open
+        assert not dispatcher.devices
+
+    asyncio.run(run())
+    assert not board.is_open
+    assert len(board.threads) == 1
+
+
+def test_early_srq():
+    """Test that a service request is kept for the next wait, if the device was not waited for."""
+    board = _FakeBoard()
+    connections = [_FakeConnection(), _FakeConnection()]
+
+    async def run():
+        dmms = [HP_3478A(connection=connection) for connection in connections]
+        async with SrqDispatcher(board) as dispatcher:
+            for pad, dmm in enumerate(dmms):
+                dispatcher.register(dmm, pad)
+            wait = asyncio.create_task(dmms[0].wait_for_data_ready())
+            await asyncio.sleep(0.02)
+            for connection in connections:
+                connection.status_byte = DATA_READY.value
+            board.events.put(True)
+            await asyncio.wait_for(wait, timeout=1)
+            await asyncio.wait_for(dmms[1].wait_for_data_ready(), timeout=0.1)
+
+    asyncio.run(run())
+
+
+def test_poll_locked():
+    """Test that the serial polls do not get between the command and the reply of a query."""
+    board = _FakeBoard()
+    connection = _FakeConnection()
+
+    async def query(dmm):
+        for _ in range(10):
+            await dmm.get_status()
+
+    async def run():
+        dmm = HP_3478A(connection=connection)
+        async with SrqDispatcher(board) as dispatcher:
+            dispatcher.register(dmm, 27)
+            for _ in range(10):
+                connection.status_byte = DATA_READY.value
+                board.events.put(True)
+                await asyncio.wait_for(asyncio.gather(dmm.wait_for_data_ready(), query(dmm)), timeout=1)
+
+    asyncio.run(run())
+
+
+def test_errors():
+    """Test that a device error is raised by the device and board errors are passed to all waiters."""
+    board = _FakeBoard()
+    connection = _FakeConnection()
+
+    async def run():
+        dmm = HP_3478A(connection=connection)
+        async with SrqDispatcher(board) as dispatcher:
+            dispatcher.register(dmm, 27)
+            connection.status_byte = (SerialPollFlags.SRQ_ON_SYNTAX_ERROR | SerialPollFlags.SRQ_ON_HAS_SRQ).value
+            board.events.put(True)
+            with pytest.raises(DeviceError):
+                await asyncio.wait_for(dmm.wait_for_data_ready(), timeout=1)
+            board.events.put(OSError("Board failure"))
+            with pytest.raises(OSError):
+                await asyncio.wait_for(dmm.wait_for_data_ready(), timeout=1)
+
+    asyncio.run(run())
+
+
+def test_not_open():
+    """Test that waiting requires an open dispatcher and a registered device."""
+    with pytest.raises(ConnectionError):
+        asyncio.run(SrqDispatcher(_FakeBoard()).wait(27))
+
+    async def run():
+        async with SrqDispatcher(_FakeBoard()) as dispatcher:
+            await dispatcher.wait(27)
+
+    with pytest.raises(ValueError):
+        asyncio.run(run())
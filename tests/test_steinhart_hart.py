@@ -0,0 +1,89 @@
+"""Unit test for the Steinhart-Hart coefficient fitting."""
+
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Copyright (C) 2020  Patrick Baus
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import random
+
+import pytest
+
+from hp3478a_async import NtcParameters
+from hp3478a_async.steinhart_hart import fit_steinhart_hart, fit_steinhart_hart_batch
+from hp3478a_async.transforms import NtcTransform, TransformPipeline, steinhart_hart_temperature
+
+# Amphenol DC95 (Material Type 10kY)
+REFERENCE = NtcParameters(a=3.3540153e-03, b=2.7867185e-04, c=4.0006637e-06, d=1.5575628e-07, rt25=10e3)
+RESISTANCES = [10e3 * 1.25**i for i in range(-10, 11)]
+
+
+def _temperatures(parameters, resistances):
+    return TransformPipeline(NtcTransform(parameters)).batch(resistances)
+
+
+def test_fit():
+    """Test that the coefficients of the driver's model are recovered."""
+    fit = fit_steinhart_hart(RESISTANCES, _temperatures(REFERENCE, RESISTANCES), rt25=REFERENCE.rt25)
+    assert fit.coefficients == pytest.approx((REFERENCE.a, REFERENCE.b, REFERENCE.c, REFERENCE.d), rel=1e-6)
+    assert fit.max_residual < 1e-6
+    assert fit.to_ntc_parameters().rt25 == REFERENCE.rt25
+
+
+def test_fit_rt25():
+    """Test that the resistance at 25 °C is determined, if it is not given."""
+    fit = fit_steinhart_hart(RESISTANCES, _temperatures(REFERENCE, RESISTANCES))
+    assert fit.temperature(fit.rt25) == pytest.approx(298.15, abs=1e-9)
+    assert fit.coefficients[0] == pytest.approx(1 / 298.15)
+    assert fit.max_residual < 1e-6
+    for resistance in (3e3, 10e3, 50e3):
+        assert fit.temperature(resistance) == pytest.approx(_temperatures(REFERENCE, [resistance])[0], abs=1e-6)
+
+
+def test_batch_fit():
+    """Test fitting multiple sensors with noisy reference temperatures."""
+    generator = random.Random(42)
+    sensors = []
+    for _ in range(100):
+        temperatures = [value + generator.gauss(0, 0.01) for value in _temperatures(REFERENCE, RESISTANCES)]
+        sensors.append((RESISTANCES, temperatures))
+    fits = fit_steinhart_hart_batch(sensors, rt25=10e3)
+    assert len(fits) == 100
+    assert all(fit.rms_residual < 0.02 for fit in fits)
+    assert all(len(fit.residuals) == len(RESISTANCES) for fit in fits)
+
+
+def test_invalid_data():
+    """Test that insufficient data is rejected."""
+    with pytest.raises(ValueError):
+        fit_steinhart_hart(RESISTANCES[:3], _temperatures(REFERENCE, RESISTANCES[:3]))
+    with pytest.raises(ValueError):
+        fit_steinhart_hart(RESISTANCES, _temperatures(REFERENCE, RESISTANCES[:-1]))
+    with pytest.raises(ValueError):
+        fit_steinhart_hart([10e3] * 4, [298.15] * 4)
+
+
+def test_negative_coefficient():
+    """Test that a fit with a negative coefficient cannot be converted to the parameters of the driver."""
+    temperatures = [
+        steinhart_hart_temperature(resistance, REFERENCE.a, REFERENCE.b, REFERENCE.c, -1e-7, rt25=REFERENCE.rt25)
+        for resistance in RESISTANCES
+    ]
+    fit = fit_steinhart_hart(RESISTANCES, temperatures, rt25=REFERENCE.rt25)
+    assert fit.coefficients[3] == pytest.approx(-1e-7, rel=1e-6)
+    assert fit.max_residual < 1e-6
+    with pytest.raises(ValueError, match="coefficients d"):
+        fit.to_ntc_parameters()
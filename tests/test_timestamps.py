@@ -0,0 +1,99 @@
+"""Unit test for the conversion timestamps."""
+
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Copyright (C) 2020  Patrick Baus
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import asyncio
+from decimal import Decimal
+
+import pytest
+
+from hp3478a_async import DmmConfiguration, DmmStatus, FunctionType, Range, ReadingTiming
+from hp3478a_async.flags import ErrorFlags, SerialPollFlags, StatusFlags
+from hp3478a_async.timestamps import ConversionTimestamper
+
+
+class _FakeDmm:
+    """A stand-in for the DMM, that replays recorded timings."""
+
+    def __init__(self, timings, configuration, srq_poll_interval=None):
+        self.__timings = timings
+        self.configuration = configuration
+        self.srq_poll_interval = srq_poll_interval
+        self.last_timing = None
+        self.status_queries = 0
+
+    async def get_status(self):
+        """Return the status of a DMM with 5.5 digits and autozero at 50 Hz."""
+        self.status_queries += 1
+        return DmmStatus(
+            function=FunctionType.DCV,
+            range=Range.RANGE_3,
+            ndigits=6,
+            status=StatusFlags.AUTO_ZERO_ENABLED | StatusFlags.LINE_FREQUENCY_50_HZ,
+            srq_flags=SerialPollFlags(0),
+            error_flags=ErrorFlags(0),
+            dac_value=0,
+        )
+
+    async def read_all(self, **_kwargs):
+        """Return a reading per timing."""
+        for timing in self.__timings:
+            self.last_timing = timing
+            yield Decimal(1)
+
+
+async def _read(timestamper):
+    return [reading async for reading in timestamper.read_all()]
+
+
+def test_srq_timestamps():
+    """Test that the midpoint is calculated from the SRQ and the measured latency."""
+    timings = [
+        ReadingTiming(srq=10.0 * i, read_started=10.0 * i + 0.001, read_completed=10.0 * i + 0.005) for i in range(5)
+    ]
+    dmm = _FakeDmm(timings, DmmConfiguration(ndigits=5, autozero=False))
+    timestamper = ConversionTimestamper(dmm, line_frequency=50, processing_time=0.01)
+    readings = asyncio.run(_read(timestamper))
+    assert timestamper.read_latency == pytest.approx(0.004)
+    # 1 PLC at 50 Hz is 20 ms
+    assert readings[-1].timestamp == pytest.approx(40.0 - 0.004 - 0.01 - 0.01)
+    assert readings[-1].uncertainty == pytest.approx(0.002 + 0.005)
+    assert dmm.status_queries == 0
+
+
+def test_polled_srq_timestamps():
+    """Test that a polled SRQ adds half the poll interval to the delay and the uncertainty."""
+    timings = [
+        ReadingTiming(srq=10.0 * i, read_started=10.0 * i + 0.001, read_completed=10.0 * i + 0.005) for i in range(5)
+    ]
+    dmm = _FakeDmm(timings, DmmConfiguration(ndigits=5, autozero=False), srq_poll_interval=0.1)
+    readings = asyncio.run(_read(ConversionTimestamper(dmm, line_frequency=50, processing_time=0.01)))
+    assert readings[-1].timestamp == pytest.approx(40.0 - 0.004 - 0.05 - 0.01 - 0.01)
+    assert readings[-1].uncertainty == pytest.approx(0.002 + 0.05 + 0.005)
+
+
+def test_blocking_read_timestamps():
+    """Test the timestamps of reads, that did not wait for the SRQ, using the settings read from the DMM."""
+    timings = [ReadingTiming(srq=None, read_started=1.0, read_completed=1.5)]
+    dmm = _FakeDmm(timings, DmmConfiguration())
+    (reading,) = asyncio.run(_read(ConversionTimestamper(dmm, processing_time=0)))
+    # 10 PLC at 50 Hz with autozero
+    assert reading.timestamp == pytest.approx(1.25 - 0.2)
+    assert reading.uncertainty == pytest.approx(0.25 + 0.1)
+    assert dmm.status_queries == 1
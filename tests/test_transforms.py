@@ -0,0 +1,120 @@
+"""Unit test for the transform pipeline."""
+
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Copyright (C) 2020  Patrick Baus
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import pickle
+from dataclasses import dataclass
+from decimal import Decimal
+
+import pytest
+
+from hp3478a_async import HP_3478A, NtcParameters
+from hp3478a_async.transforms import (
+    TRANSFORMS,
+    LinearTransform,
+    NtcTransform,
+    RtdTransform,
+    Transform,
+    TransformPipeline,
+    create_transform,
+    register_transform,
+)
+
+
+@pytest.mark.parametrize(
+    "resistance, temperature",
+    [
+        (100.0, 0.0),
+        (138.5055, 100.0),
+        (18.5201, -200.0),
+        (60.2558, -100.0),
+        (390.4811, 850.0),
+    ],
+)
+def test_rtd(resistance, temperature):
+    """Test the Callendar–Van Dusen equation against the IEC 60751 Pt100 table."""
+    assert RtdTransform()(resistance) == pytest.approx(temperature + 273.15, abs=1e-3)
+
+
+def test_linear_fusion():
+    """Test that consecutive linear transforms are merged and applied in order."""
+    pipeline = TransformPipeline(LinearTransform(scale=10), LinearTransform(offset=1), lambda value: value**2)
+    assert pipeline(2) == 441
+    assert pipeline.batch([1, 2]) == [121, 441]
+    assert TransformPipeline(LinearTransform(scale=2), LinearTransform(scale=3, offset=1)).batch([1, 2]) == [7, 13]
+
+
+def test_pickle():
+    """Test that the pipeline can be pickled for process pools."""
+    pipeline = TransformPipeline(RtdTransform(), LinearTransform(offset=-273.15))
+    assert pickle.loads(pickle.dumps(pipeline))(100.0) == pytest.approx(0)
+
+
+def test_registry(monkeypatch):
+    """Test creating transforms by name."""
+    monkeypatch.setattr("hp3478a_async.transforms.TRANSFORMS", dict(TRANSFORMS))
+    register_transform("shunt", lambda resistance: LinearTransform(scale=1 / resistance))
+    assert create_transform("shunt", resistance=10)(1.0) == pytest.approx(0.1)
+    assert create_transform("rtd", r0=1000) == RtdTransform(r0=1000)
+    with pytest.raises(ValueError):
+        create_transform("unknown")
+
+
+def test_driver_pipeline():
+    """Test that the transforms of the driver are exposed as its post-processing."""
+    dmm = HP_3478A(connection=None)
+    dmm.set_transforms(LinearTransform(offset=-273.15))
+    post_processor = dmm.post_processor
+    assert post_processor is not None
+    assert float(post_processor(Decimal(1))) == pytest.approx(-272.15)
+    parameters = NtcParameters(a=3.35318065e-03, b=2.93792361e-04, c=4.04412336e-06, d=1.88475068e-07, rt25=5000)
+    assert NtcTransform(parameters)(5000) == pytest.approx(1 / parameters.a)
+    dmm.set_transforms()
+    assert dmm.post_processor is None
+
+
+def test_compiled_once():
+    """Test that calling a transform compiles it only once and that it can still be pickled afterwards."""
+    compiled = []
+
+    @dataclass(frozen=True)
+    class _CountingTransform(Transform):
+        """A transform counting how often it is compiled."""
+
+        def compile(self):
+            compiled.append(self)
+            return lambda value: value + 1
+
+    transform = _CountingTransform()
+    assert [transform(value) for value in (1.0, 2.0)] == [2.0, 3.0]
+    assert transform.batch([3.0]) == [4.0]
+    assert len(compiled) == 1
+    rtd = RtdTransform()
+    rtd(100.0)
+    assert pickle.loads(pickle.dumps(rtd))(100.0) == pytest.approx(273.15)
+
+
+def test_incomplete_transform():
+    """Test that a transform without a compile() function cannot be created."""
+
+    class _IncompleteTransform(Transform):  # pylint: disable=abstract-method,too-few-public-methods
+        """A transform, that does not implement compile()."""
+
+    with pytest.raises(TypeError):
+        _IncompleteTransform()  # pylint: disable=abstract-class-instantiated